@@ -0,0 +1,334 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: artifact_store.py
+# Where video/transcript/translation/summary/embedding files live: local disk, or the bundled MinIO
+# (S3) with a size-bounded local read-through cache, so several ingest/query machines share one archive
+
+import io
+import os
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------- Artifact Store Configuration --------------------
+# "local": Milvus rows hold absolute paths under base_save_dir (single machine)
+# "s3": artifacts are uploaded to MinIO and rows hold s3://bucket/key references
+ARTIFACT_STORE = os.environ.get("MIRC_ARTIFACT_STORE", "local")
+
+# MinIO from docker-compose.yml (also used by snapshot.py for Milvus bulk insert)
+MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "minioadmin")
+MINIO_SECURE = os.environ.get("MINIO_SECURE", "0") == "1"
+MILVUS_BUCKET = os.environ.get("MILVUS_BUCKET", "a-bucket")  # Milvus standalone default bucket
+ARTIFACT_BUCKET = os.environ.get("MIRC_ARTIFACT_BUCKET", "mirc-artifacts")
+
+ARTIFACT_CACHE_DIR = os.environ.get("MIRC_ARTIFACT_CACHE_DIR", os.path.abspath("artifact_cache"))
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("MIRC_ARTIFACT_CACHE_MAX_BYTES", 50 * 1024**3))  # 50 GB
+DOWNLOAD_PART_SIZE = 16 * 1024 * 1024
+DOWNLOAD_WORKERS = 8
+UPLOAD_PART_SIZE = 64 * 1024 * 1024
+PRESIGNED_URL_TTL = timedelta(hours=2)
+
+S3_SCHEME = "s3://"
+
+
+def is_remote(ref):
+    return isinstance(ref, str) and ref.startswith(S3_SCHEME)
+
+
+def artifact_key(local_path):
+    """Object key of a working file: its artifact folder and name, e.g. "transcripts/<guid>_transcript.txt"."""
+    folder = os.path.basename(os.path.dirname(local_path))
+    return f"{folder}/{os.path.basename(local_path)}"
+
+
+def split_ref(ref):
+    bucket, _, key = ref[len(S3_SCHEME):].partition("/")
+    return bucket, key
+
+
+class ArtifactCache:
+    """Local copies of remote artifacts, named by a hash of their reference.
+
+    Least recently used entries are evicted once the cache grows past `max_bytes`,
+    the same policy as the audio cache.
+    """
+
+    def __init__(self, cache_dir=ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, ref):
+        # Keep the extension, players and OpenCV pick the demuxer from it
+        digest = hashlib.sha1(ref.encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest + os.path.splitext(ref)[1])
+
+    def lock_for(self, ref):
+        with self._lock:
+            return self._key_locks.setdefault(ref, threading.Lock())
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith(".part"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+class LocalArtifactStore:
+    """Artifacts stay where the pipeline wrote them; references are plain paths."""
+    remote = False
+
+    def ref_for(self, local_path, key=None):
+        return local_path
+
+    def publish(self, local_path, move=False, key=None):
+        return local_path
+
+
+class S3ArtifactStore:
+    """Artifacts in an S3-compatible bucket (the MinIO service from docker-compose.yml)."""
+    remote = True
+
+    def __init__(self, endpoint=MINIO_ENDPOINT, access_key=MINIO_ACCESS_KEY, secret_key=MINIO_SECRET_KEY,
+                 bucket=ARTIFACT_BUCKET, secure=MINIO_SECURE, cache=None):
+        from minio import Minio
+        self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        self.bucket = bucket
+        self.cache = cache or ArtifactCache()
+        self._bucket_checked = False
+
+    def _ensure_bucket(self):
+        if not self._bucket_checked:
+            if not self.client.bucket_exists(self.bucket):
+                self.client.make_bucket(self.bucket)
+            self._bucket_checked = True
+
+    def ref_for(self, local_path, key=None):
+        return f"{S3_SCHEME}{self.bucket}/{key or artifact_key(local_path)}"
+
+    def publish(self, local_path, move=False, key=None):
+        """Upload a working file (under `key`, default artifact_key) and return its reference.
+
+        With move=True the file becomes the cache entry for its reference (a rename, no copy),
+        so the ingest machine does not download what it just uploaded. A file that does not
+        exist yet (a translation still queued in multilingual mode) only gets its reference.
+        """
+        key = key or artifact_key(local_path)
+        ref = self.ref_for(local_path, key)
+        if not os.path.exists(local_path):
+            return ref
+        self._ensure_bucket()
+        self.client.fput_object(self.bucket, key, local_path, part_size=UPLOAD_PART_SIZE,
+                                num_parallel_uploads=4)
+        if move:
+            try:
+                os.replace(local_path, self.cache.path_for(ref))
+            except OSError:
+                pass  # different filesystem, the working file simply stays
+        logging.info(f"Published {local_path} as {ref}")
+        return ref
+
+    def put_text(self, ref, text):
+        self._ensure_bucket()
+        bucket, key = split_ref(ref)
+        data = text.encode("utf-8")
+        self.client.put_object(bucket, key, io.BytesIO(data), len(data), content_type="text/plain; charset=utf-8")
+        try:
+            os.remove(self.cache.path_for(ref))  # stale cached copy
+        except FileNotFoundError:
+            pass
+
+    def _download(self, bucket, key, size, path):
+        """Parallel ranged GETs into a preallocated .part file."""
+        part_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+
+        def fetch(offset):
+            response = self.client.get_object(bucket, key, offset=offset, length=min(DOWNLOAD_PART_SIZE, size - offset))
+            try:
+                with open(part_path, "r+b") as f:
+                    f.seek(offset)
+                    for chunk in response.stream(1024 * 1024):
+                        f.write(chunk)
+            finally:
+                response.close()
+                response.release_conn()
+
+        try:
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+                list(pool.map(fetch, range(0, size, DOWNLOAD_PART_SIZE)))
+            os.replace(part_path, path)
+        except BaseException:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+
+    def local_path(self, ref):
+        """Path of a local copy of the object, downloading it into the cache on a miss."""
+        path = self.cache.path_for(ref)
+        with self.cache.lock_for(ref):
+            if os.path.exists(path):
+                os.utime(path)  # mark as recently used
+                return path
+            bucket, key = split_ref(ref)
+            size = self.client.stat_object(bucket, key).size
+            logging.info(f"Artifact cache miss for {ref}, downloading {size} bytes")
+            self._download(bucket, key, size, path)
+        self.cache.evict(keep=path)
+        return path
+
+    def size(self, ref):
+        bucket, key = split_ref(ref)
+        return self.client.stat_object(bucket, key).size
+
+    def iter_chunks(self, ref, offset=0, chunk_size=DOWNLOAD_PART_SIZE):
+        """The object's bytes from `offset` on, from the cache when it holds a copy, else one streamed GET."""
+        path = self.cache.path_for(ref)
+        if os.path.exists(path):
+            yield from _iter_file_chunks(path, offset, chunk_size)
+            return
+        bucket, key = split_ref(ref)
+        response = self.client.get_object(bucket, key, offset=offset)
+        try:
+            yield from response.stream(chunk_size)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def exists(self, ref):
+        from minio.error import S3Error
+        bucket, key = split_ref(ref)
+        try:
+            self.client.stat_object(bucket, key)
+            return True
+        except S3Error:
+            return False
+
+    def delete(self, ref):
+        bucket, key = split_ref(ref)
+        self.client.remove_object(bucket, key)
+        try:
+            os.remove(self.cache.path_for(ref))
+        except FileNotFoundError:
+            pass
+
+    def list_refs(self, bucket=None):
+        """Every object reference in the bucket, one listing instead of a HEAD request per file."""
+        bucket = bucket or self.bucket
+        return {f"{S3_SCHEME}{bucket}/{obj.object_name}" for obj in self.client.list_objects(bucket, recursive=True)}
+
+    def url(self, ref):
+        """Presigned HTTP URL, for readers that can stream (OpenCV/FFmpeg read only the bytes they need)."""
+        bucket, key = split_ref(ref)
+        return self.client.presigned_get_object(bucket, key, expires=PRESIGNED_URL_TTL)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _get(kind):
+    with _stores_lock:
+        if kind not in _stores:
+            _stores[kind] = S3ArtifactStore() if kind == "s3" else LocalArtifactStore()
+        return _stores[kind]
+
+def get_artifact_store():
+    """The store new ingests publish to (MIRC_ARTIFACT_STORE)."""
+    return _get(ARTIFACT_STORE)
+
+
+# -------------------- Reference helpers for readers --------------------
+# Rows may hold local paths or s3:// references regardless of this machine's ARTIFACT_STORE
+# (e.g. an archive ingested elsewhere), so readers go through these.
+def fetch_local(ref):
+    """A local path for the artifact, downloaded into the cache if it is remote."""
+    return _get("s3").local_path(ref) if is_remote(ref) else ref
+
+def artifact_size(ref):
+    return _get("s3").size(ref) if is_remote(ref) else os.path.getsize(ref)
+
+def _iter_file_chunks(path, offset, chunk_size):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_artifact_chunks(ref, offset=0, chunk_size=DOWNLOAD_PART_SIZE):
+    """Stream an artifact from `offset` without copying it into the cache first (bulk export)."""
+    if is_remote(ref):
+        return _get("s3").iter_chunks(ref, offset, chunk_size)
+    return _iter_file_chunks(ref, offset, chunk_size)
+
+def artifact_exists(ref):
+    return _get("s3").exists(ref) if is_remote(ref) else os.path.exists(ref)
+
+def read_artifact_text(ref):
+    with open(fetch_local(ref), encoding="utf-8") as f:
+        return f.read()
+
+def write_artifact_text(ref, text, local_writer):
+    """Write a text artifact; local_writer(path, text) handles plain paths (pipeline.write_text)."""
+    if is_remote(ref):
+        _get("s3").put_text(ref, text)
+    else:
+        local_writer(ref, text)
+
+def delete_artifact(ref):
+    if is_remote(ref):
+        _get("s3").delete(ref)
+    else:
+        os.remove(ref)
+
+def stream_url(ref):
+    """Something OpenCV or a player can open directly: the path, or a presigned URL for remote objects."""
+    return _get("s3").url(ref) if is_remote(ref) else ref
+
+def store_for(ref):
+    """The store a row's artifacts belong to, so re-processing writes back where they came from."""
+    return _get("s3") if is_remote(ref) else get_artifact_store()
+
+def remote_store():
+    return _get("s3")
+
+def video_key(guid, local_path):
+    """Object key of a row's video. Always keyed by GUID: in "reference" storage mode the working
+    path is the user's original (e.g. Downloads/lecture.mp4), whose name other videos may share."""
+    return f"videos/{guid}{os.path.splitext(local_path)[1]}"
+
+def publish_row(row, fields, move_video=False, store=None):
+    """Publish the row's artifact files to the store (default: the configured one) and point the row at them."""
+    store = store or get_artifact_store()
+    for field_name in fields:
+        if row.get(field_name) and not is_remote(row[field_name]):
+            if field_name == "video_path":
+                row[field_name] = store.publish(row[field_name], move=move_video,
+                                                key=video_key(row["guid"], row[field_name]))
+            else:
+                row[field_name] = store.publish(row[field_name])
+    return row
@@ -0,0 +1,145 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: audio_cache.py
+# Decodes a video's audio to 16 kHz mono once and keeps it in a size-bounded, content-addressed cache
+
+import os
+import hashlib
+import logging
+import threading
+import subprocess
+import numpy as np
+
+SAMPLE_RATE = 16000  # what Whisper expects
+AUDIO_CACHE_DIR = os.environ.get("MIRC_AUDIO_CACHE_DIR", os.path.abspath("audio_cache"))
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("MIRC_AUDIO_CACHE_MAX_BYTES", 20 * 1024**3))  # 20 GB
+
+HASH_SAMPLE_SIZE = 4 * 1024 * 1024  # bytes read from the head, middle and tail of the file
+
+
+def content_key(video_path):
+    """Content address of a video.
+
+    Hashing a multi-GB file end to end would cost as much as copying it, so the key is
+    the file size plus SHA-256 of three 4 MB samples (head, middle, tail). Hardlinks,
+    copies and renames of the same file map to the same entry.
+    """
+    size = os.path.getsize(video_path)
+    h = hashlib.sha256(str(size).encode())
+    with open(video_path, "rb") as f:
+        for offset in (0, max(size // 2 - HASH_SAMPLE_SIZE // 2, 0), max(size - HASH_SAMPLE_SIZE, 0)):
+            f.seek(offset)
+            h.update(f.read(HASH_SAMPLE_SIZE))
+    return h.hexdigest()
+
+
+def decode_audio(video_path, sample_rate=SAMPLE_RATE, start=None, seconds=None):
+    """Decode to mono int16 PCM with ffmpeg (same conversion whisper.load_audio does).
+
+    `start`/`seconds` decode only that stretch; the seek happens before opening the input,
+    so a sample from the middle of a long file does not decode everything before it.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", video_path]
+    if seconds:
+        cmd += ["-t", f"{seconds:.3f}"]
+    cmd += ["-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16)
+
+
+def probe_duration(video_path):
+    """Duration in seconds from the container header (ffprobe, no decoding), or None."""
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", video_path]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True, text=True, timeout=30).stdout
+        return float(out.strip())
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        logging.warning(f"ffprobe could not read the duration of {video_path}: {e}")
+        return None
+
+
+class AudioCache:
+    """Stores decoded audio as int16 .npy files named by content key.
+
+    int16 is half the size of float32 and .npy can be memory-mapped, so later stages
+    (transcription, re-transcription, diarization ...) read the samples without
+    decoding the video again. Least recently used entries are evicted once the cache
+    grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get_pcm16(self, video_path):
+        """Memory-mapped int16 samples for the video, decoding it on a cache miss."""
+        key = content_key(video_path)
+        path = self._entry_path(key)
+        if os.path.exists(path):
+            os.utime(path)  # mark as recently used
+            logging.info(f"Audio cache hit for {video_path} ({key[:12]})")
+        else:
+            logging.info(f"Audio cache miss for {video_path}, decoding with ffmpeg")
+            samples = decode_audio(video_path)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, samples)
+            os.replace(tmp_path, path)
+            self.evict(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    def get_audio(self, video_path):
+        """float32 samples in [-1, 1], the format whisper's transcribe() accepts."""
+        return self.get_pcm16(video_path).astype(np.float32) / 32768.0
+
+    def duration(self, video_path):
+        return len(self.get_pcm16(video_path)) / SAMPLE_RATE
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    logging.info(f"Evicted {path} from audio cache")
+                except OSError as e:
+                    logging.warning(f"Could not evict {path}: {e}")
+
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+def get_audio_cache():
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
@@ -0,0 +1,332 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: audio_fingerprint.py
+# Perceptual audio fingerprints, so re-encoded, trimmed or re-muxed copies of a lecture are recognised
+# from a short sample before any transcription work is spent on them
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import argparse
+import numpy as np
+from audio_cache import decode_audio, probe_duration, get_audio_cache, SAMPLE_RATE
+
+# -------------------- Fingerprint Configuration --------------------
+FINGERPRINT_DIR = os.environ.get("MIRC_FINGERPRINT_DIR", os.path.abspath("fingerprints"))
+# What process_video does with a near-duplicate:
+# "link": skip the ingest and return the existing GUID (the file is recorded as an alias of it)
+# "reuse": store the new file under a new GUID, copying transcript, summary and embeddings from the existing one
+# "off": no duplicate check
+DUPLICATE_POLICY = os.environ.get("MIRC_DUPLICATE_POLICY", "reuse")
+
+SAMPLE_SECONDS = 30           # decoded from the middle of an incoming file for the lookup
+FP_DECIMATION = 3             # 16 kHz -> 5.3 kHz, the bands below only go up to 2 kHz
+FP_RATE = SAMPLE_RATE / FP_DECIMATION
+FRAME_SIZE = 2048             # ~0.38 s analysis window
+INDEX_HOP = 256               # ~48 ms between stored sub-fingerprints
+QUERY_HOP = 64                # the sample is hashed 4x denser, so some query frame lines up with every stored one
+LAG = 256                     # time step of the energy difference, the same for index and query
+BAND_EDGES = np.geomspace(300, 2000, 34)  # 33 log-spaced bands -> 32 bits per frame
+SILENCE_RMS = 1e-3            # frames quieter than this hash to noise and are skipped
+MAX_POSTINGS = 2000           # sub-fingerprints this common (hum, tones) carry no information
+MIN_MATCH_SCORE = 0.03        # match score (see DuplicateMatch) below which a lookup finds nothing
+DURATION_TOLERANCE = 1.05     # a copy may be at most this much (plus 5 s) longer than the indexed lecture
+SEGMENT_MERGE_COUNT = 16      # per-video segments searched separately before they are merged into one
+
+_band_matrix = None
+
+def _bands():
+    global _band_matrix
+    if _band_matrix is None:
+        freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / FP_RATE)
+        band = np.searchsorted(BAND_EDGES, freqs, side="right") - 1
+        matrix = np.zeros((len(freqs), len(BAND_EDGES) - 1), dtype=np.float32)
+        inside = (band >= 0) & (band < len(BAND_EDGES) - 1)
+        matrix[np.nonzero(inside)[0], band[inside]] = 1
+        _band_matrix = matrix
+    return _band_matrix
+
+
+def fingerprint(pcm16, hop=INDEX_HOP):
+    """32-bit sub-fingerprints of int16 16 kHz audio and their positions (in 5.3 kHz samples).
+
+    Each bit is the sign of the change, over LAG samples, of the energy difference between
+    two neighbouring bands (Haitsma & Kalker). Signs of differences survive gain changes,
+    EQ and lossy re-encoding far better than the spectrum itself.
+    """
+    usable = len(pcm16) // FP_DECIMATION * FP_DECIMATION
+    x = np.asarray(pcm16[:usable], dtype=np.float32).reshape(-1, FP_DECIMATION).mean(axis=1) / 32768.0
+    if len(x) < FRAME_SIZE + LAG:
+        return np.zeros(0, np.uint32), np.zeros(0, np.int64)
+    frames = np.lib.stride_tricks.sliding_window_view(x, FRAME_SIZE)[::hop]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    energies, loudness = [], []
+    for start in range(0, len(frames), 4096):  # bounded memory for hour-long files
+        block = frames[start:start + 4096]
+        energies.append((np.abs(np.fft.rfft(block * window, axis=1)) ** 2).astype(np.float32) @ _bands())
+        loudness.append(np.sqrt((block ** 2).mean(axis=1)))
+    energies = np.concatenate(energies)
+    loudness = np.concatenate(loudness)
+
+    lag = LAG // hop
+    diff = energies[:, :-1] - energies[:, 1:]
+    bits = (diff[lag:] - diff[:-lag]) > 0
+    hashes = (bits.astype(np.uint64) << np.arange(32, dtype=np.uint64)).sum(axis=1).astype(np.uint32)
+    positions = (np.arange(lag, len(energies)) * hop).astype(np.int64)
+    keep = (loudness[lag:] > SILENCE_RMS) & (hashes != 0) & (hashes != 0xFFFFFFFF)
+    return hashes[keep], positions[keep]
+
+
+def sample_fingerprint(video_path, seconds=SAMPLE_SECONDS):
+    """Fingerprint of a short stretch from the middle of the file, plus the file's duration."""
+    duration = probe_duration(video_path)
+    start = max(0.0, duration / 2 - seconds / 2) if duration else 0.0
+    return fingerprint(decode_audio(video_path, start=start, seconds=seconds), QUERY_HOP), duration
+
+
+class DuplicateMatch:
+    def __init__(self, guid, score, offset_seconds, duration):
+        self.guid = guid
+        # Votes for the best (video, offset) pair, two neighbouring offset bins merged, per stored frame
+        # the sample spans. Not a fraction: an exact copy scores about 2, unrelated audio below 0.01
+        self.score = score
+        self.offset_seconds = offset_seconds  # where the sample sits in the indexed lecture
+        self.duration = duration              # of the indexed lecture
+        self.copy_duration = None             # of the incoming file, when ffprobe could read it
+
+
+class FingerprintIndex:
+    """Inverted index from sub-fingerprint to (video, position), kept in RAM.
+
+    Every indexed video is one `<guid>.npz` file in FINGERPRINT_DIR (hashes, positions,
+    duration). The index is a few sorted segments searched with np.searchsorted; a lookup
+    votes on (video, time offset) pairs, which finds trimmed copies at any offset.
+    Aliases recorded by the "link" policy are kept in links.json.
+    """
+
+    def __init__(self, directory=FINGERPRINT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.guids = []        # video id -> GUID
+        self.durations = []
+        self._ids = {}
+        self._removed = set()
+        self._segments = []    # (sorted hashes, video ids, positions)
+        self.links = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _links_path(self):
+        return os.path.join(self.directory, "links.json")
+
+    def _load(self):
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".npz"):
+                try:
+                    with np.load(os.path.join(self.directory, name)) as data:
+                        self._add_segment(name[:-len(".npz")], data["hashes"], data["positions"], float(data["duration"]))
+                except (OSError, ValueError, KeyError) as e:
+                    logging.warning(f"Skipping unreadable fingerprint {name}: {e}")
+        self._merge()
+        try:
+            with open(self._links_path()) as f:
+                self.links = json.load(f)
+        except (OSError, ValueError):
+            pass
+        logging.info(f"Fingerprint index loaded with {len(self._ids)} videos")
+
+    def _add_segment(self, guid, hashes, positions, duration):
+        video_id = len(self.guids)
+        self.guids.append(guid)
+        self.durations.append(duration)
+        self._ids[guid] = video_id
+        order = np.argsort(hashes, kind="stable")
+        self._segments.append((hashes[order], np.full(len(hashes), video_id, np.int32), positions[order]))
+
+    def _merge(self):
+        if len(self._segments) <= 1:
+            return
+        hashes, ids, positions = (np.concatenate(parts) for parts in zip(*self._segments))
+        alive = ~np.isin(ids, list(self._removed)) if self._removed else slice(None)
+        hashes, ids, positions = hashes[alive], ids[alive], positions[alive]
+        order = np.argsort(hashes, kind="stable")
+        self._segments = [(hashes[order], ids[order], positions[order])]
+
+    def __contains__(self, guid):
+        return guid in self._ids
+
+    def add(self, guid, pcm16):
+        """Index a processed video from its full decoded audio (the audio cache entry)."""
+        hashes, positions = fingerprint(pcm16, INDEX_HOP)
+        duration = len(pcm16) / SAMPLE_RATE
+        path = os.path.join(self.directory, f"{guid}.npz")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, hashes=hashes, positions=positions, duration=duration)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if guid in self._ids:
+                self._removed.add(self._ids[guid])
+            self._add_segment(guid, hashes, positions, duration)
+            if len(self._segments) > SEGMENT_MERGE_COUNT:
+                self._merge()
+        logging.info(f"Fingerprinted GUID {guid}: {len(hashes)} sub-fingerprints")
+
+    def remove(self, guid):
+        with self._lock:
+            video_id = self._ids.pop(guid, None)
+            if video_id is not None:
+                self._removed.add(video_id)
+            self.links = {path: link for path, link in self.links.items() if link["guid"] != guid}
+            self._save_links()
+        try:
+            os.remove(os.path.join(self.directory, f"{guid}.npz"))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
+            self.guids, self.durations, self._ids, self._removed, self._segments = [], [], {}, set(), []
+            self.links = {}
+            self._save_links()
+
+    def match(self, hashes, positions, hop=QUERY_HOP):
+        """Best indexed video for a sample fingerprint, or None below MIN_MATCH_SCORE."""
+        if len(hashes) == 0:
+            return None
+        with self._lock:
+            segments = list(self._segments)
+            removed = set(self._removed)
+        video_ids, offsets = [], []
+        for seg_hashes, seg_ids, seg_positions in segments:
+            lo = np.searchsorted(seg_hashes, hashes, side="left")
+            hi = np.searchsorted(seg_hashes, hashes, side="right")
+            counts = hi - lo
+            counts[counts > MAX_POSTINGS] = 0
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Every posting of every query hash, flattened without a Python loop
+            index = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(total)
+            video_ids.append(seg_ids[index])
+            offsets.append(seg_positions[index] - np.repeat(positions, counts))
+        if not video_ids:
+            return None
+        video_ids, offsets = np.concatenate(video_ids), np.concatenate(offsets)
+        if removed:
+            alive = ~np.isin(video_ids, list(removed))
+            video_ids, offsets = video_ids[alive], offsets[alive]
+            if not len(video_ids):
+                return None
+
+        # A true match puts many hits in one (video, offset) bin, or two neighbouring ones
+        bins = video_ids.astype(np.int64) * (1 << 40) + (offsets // INDEX_HOP + (1 << 39))
+        keys, votes = np.unique(bins, return_counts=True)
+        neighbour = np.searchsorted(keys, keys + 1)
+        has_neighbour = neighbour < len(keys)
+        has_neighbour[has_neighbour] = keys[neighbour[has_neighbour]] == keys[has_neighbour] + 1
+        votes = votes + np.where(has_neighbour, votes[np.minimum(neighbour, len(keys) - 1)], 0)
+        best = int(np.argmax(votes))
+        score = votes[best] / max(1.0, len(hashes) * hop / INDEX_HOP)
+        if score < MIN_MATCH_SCORE:
+            return None
+        video_id = int(keys[best] >> 40)
+        offset_seconds = ((int(keys[best]) & ((1 << 40) - 1)) - (1 << 39)) * INDEX_HOP / FP_RATE
+        return DuplicateMatch(self.guids[video_id], float(score), offset_seconds, self.durations[video_id])
+
+    def find_duplicate(self, video_path):
+        """The indexed lecture `video_path` is a copy of, or None.
+
+        Only a short sample is decoded. A file that contains a known lecture but runs clearly
+        longer than it is not a duplicate, it has material the index has never seen.
+        """
+        if not self._ids:
+            return None
+        started = time.perf_counter()
+        (hashes, positions), duration = sample_fingerprint(video_path)
+        match = self.match(hashes, positions)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if match is None:
+            logging.info(f"No duplicate found for {video_path} ({elapsed_ms:.0f} ms)")
+            return None
+        if duration and duration > match.duration * DURATION_TOLERANCE + 5:
+            logging.info(f"{video_path} contains GUID {match.guid} but is longer ({duration:.0f}s vs "
+                         f"{match.duration:.0f}s), processing it as a new video")
+            return None
+        logging.info(f"{video_path} is a near-duplicate of GUID {match.guid} (score {match.score:.2f}, "
+                     f"{elapsed_ms:.0f} ms)")
+        match.copy_duration = duration
+        return match
+
+    def _save_links(self):
+        tmp_path = f"{self._links_path()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.links, f, indent=2)
+        os.replace(tmp_path, self._links_path())
+
+    def link(self, video_path, match):
+        """Record `video_path` as an alias of an indexed lecture."""
+        with self._lock:
+            self.links[os.path.abspath(video_path)] = {"guid": match.guid, "score": round(match.score, 3),
+                                                       "linked_at": int(time.time())}
+            self._save_links()
+
+
+_fingerprint_index = None
+_fingerprint_lock = threading.Lock()
+
+def get_fingerprint_index():
+    global _fingerprint_index
+    with _fingerprint_lock:
+        if _fingerprint_index is None:
+            _fingerprint_index = FingerprintIndex()
+        return _fingerprint_index
+
+
+def backfill():
+    """Fingerprint every row ingested before the index existed (decodes each video once, via the audio cache)."""
+    from pipeline import run_on_collection
+    from artifact_store import fetch_local
+    index = get_fingerprint_index()
+    rows = run_on_collection(lambda collection: collection.query(
+        expr="", output_fields=["guid", "video_path"], limit=16384
+    ), load=True)
+    added = 0
+    for row in rows:
+        if row["guid"] in index:
+            continue
+        try:
+            index.add(row["guid"], get_audio_cache().get_pcm16(fetch_local(row["video_path"])))
+            added += 1
+        except Exception as e:
+            logging.warning(f"Could not fingerprint GUID {row['guid']}: {e}")
+    print(f"Fingerprinted {added} of {len(rows)} videos")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio fingerprint index for duplicate detection")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="fingerprint every indexed video that has no fingerprint yet")
+    check = sub.add_parser("check", help="look up a file without ingesting it")
+    check.add_argument("video_path")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        backfill()
+    else:
+        match = get_fingerprint_index().find_duplicate(args.video_path)
+        if match is None:
+            print("No duplicate found")
+        else:
+            print(f"Duplicate of {match.guid} (score {match.score:.2f}, sample at {match.offset_seconds:.0f}s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
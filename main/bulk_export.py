@@ -0,0 +1,248 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: bulk_export.py
+# Background export of artifacts (videos, transcripts, translations, summaries) to a folder or a
+# zip archive: chunked streaming copies, several files at once, progress, cancellation and resume
+
+import os
+import json
+import time
+import logging
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from artifact_store import is_remote, split_ref, artifact_size, iter_artifact_chunks
+
+# -------------------- Export Configuration --------------------
+EXPORT_CHUNK_SIZE = int(os.environ.get("MIRC_EXPORT_CHUNK_MB", "8")) * 1024**2
+# Files copied at once in folder exports; a zip archive has a single writer
+EXPORT_WORKERS = int(os.environ.get("MIRC_EXPORT_WORKERS", "4"))
+
+# Artifact field -> folder inside the export
+EXPORT_FIELDS = {
+    "transcript_path": "transcripts",
+    "translation_path": "translations",
+    "summary_path": "summaries",
+    "video_path": "videos",
+}
+# Video is already compressed, deflating it only burns CPU
+ZIP_COMPRESSION = {"video_path": zipfile.ZIP_STORED}
+# What the resume manifest keeps of every finished zip entry to rebuild the central directory
+ZIP_INFO_FIELDS = ("filename", "date_time", "compress_type", "CRC", "compress_size", "file_size",
+                   "header_offset", "flag_bits", "external_attr", "create_version", "extract_version")
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportItem:
+    def __init__(self, ref, name, field_name=None):
+        self.ref = ref            # local path or s3:// reference
+        self.name = name          # relative path inside the export
+        self.field_name = field_name
+        self.size = None
+
+
+def export_items(rows, fields):
+    """One ExportItem per artifact of the given fields, laid out as <folder>/<file name>."""
+    items = []
+    for row in rows:
+        for field_name in fields:
+            ref = row.get(field_name)
+            if not ref:
+                continue
+            name = os.path.basename(split_ref(ref)[1] if is_remote(ref) else ref)
+            if not name.startswith(row["guid"]):
+                name = f"{row['guid']}_{name}"  # "reference" storage mode keeps the original file name
+            items.append(ExportItem(ref, f"{EXPORT_FIELDS[field_name]}/{name}", field_name))
+    return items
+
+
+class ExportJob:
+    """Copies a list of ExportItems into `destination`.
+
+    Folder exports copy `workers` files at once, each through a `<name>.part` file that is
+    renamed when complete. Running the same export again skips finished files and continues
+    every .part file where it stopped (remote artifacts with a ranged GET from that offset).
+
+    Zip exports (`as_zip=True`, destination is the .zip path) write `<zip>.part` and record
+    every finished entry in `<zip>.part.json`. A resumed export truncates the archive after
+    the last finished entry, restores those entries and appends the rest.
+    """
+
+    def __init__(self, items, destination, as_zip=False, workers=EXPORT_WORKERS, chunk_size=EXPORT_CHUNK_SIZE,
+                 on_progress=None):
+        self.items = items
+        self.destination = destination
+        self.as_zip = as_zip
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress  # on_progress(done_bytes, total_bytes), called from worker threads
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.exported, self.skipped, self.failed = 0, 0, []
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise ExportCancelled("Export cancelled")
+
+    def _advance(self, count):
+        with self._lock:
+            self.done_bytes += count
+            done = self.done_bytes
+        if self.on_progress:
+            self.on_progress(done, self.total_bytes)
+
+    def _count(self, outcome):
+        with self._lock:
+            if outcome == "skipped":
+                self.skipped += 1
+            else:
+                self.exported += 1
+
+    # -------------------- Sizing --------------------
+    def _measure(self):
+        """Stat every artifact (concurrently, remote ones are a HEAD request each); missing ones fail early."""
+        def size_of(item):
+            try:
+                item.size = artifact_size(item.ref)
+            except Exception as e:
+                return item, e
+            return item, None
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(size_of, self.items))
+        ready = []
+        for item, error in results:
+            if error is None:
+                ready.append(item)
+            else:
+                self.failed.append((item.name, str(error)))
+        self.total_bytes = sum(item.size for item in ready)
+        return ready
+
+    # -------------------- Folder export --------------------
+    def _copy_to_folder(self, item):
+        self._check_cancelled()
+        target = os.path.join(self.destination, item.name)
+        if os.path.exists(target) and os.path.getsize(target) == item.size:
+            self._advance(item.size)
+            return "skipped"
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        part_path = f"{target}.part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > item.size:
+            offset = 0  # the artifact changed since the interrupted export
+        self._advance(offset)
+        with open(part_path, "r+b" if offset else "wb") as out:
+            out.seek(offset)
+            out.truncate()
+            for chunk in iter_artifact_chunks(item.ref, offset, self.chunk_size):
+                self._check_cancelled()
+                out.write(chunk)
+                self._advance(len(chunk))
+        os.replace(part_path, target)
+        return "exported"
+
+    def _run_folder(self, items):
+        def copy(item):
+            try:
+                self._count(self._copy_to_folder(item))
+            except ExportCancelled:
+                pass
+            except Exception as e:
+                logging.error(f"Export of {item.ref} failed: {e}")
+                with self._lock:
+                    self.failed.append((item.name, str(e)))
+
+        os.makedirs(self.destination, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(copy, items))
+        self._check_cancelled()
+
+    # -------------------- Zip export --------------------
+    def _load_zip_manifest(self, part_path, manifest_path):
+        if not os.path.exists(part_path):
+            return {"end": 0, "entries": []}
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest["end"] <= os.path.getsize(part_path):
+                return manifest
+        except (OSError, ValueError, KeyError):
+            pass
+        return {"end": 0, "entries": []}  # unusable leftovers, start over
+
+    def _save_zip_manifest(self, manifest_path, manifest):
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    def _run_zip(self, items):
+        part_path = f"{self.destination}.part"
+        manifest_path = f"{part_path}.json"
+        manifest = self._load_zip_manifest(part_path, manifest_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.destination)), exist_ok=True)
+
+        with open(part_path, "r+b" if manifest["end"] else "wb") as fp:
+            fp.seek(manifest["end"])
+            fp.truncate()
+            with zipfile.ZipFile(fp, "w", allowZip64=True) as archive:
+                # ZipFile in "w" mode starts writing at the current offset; the entries already
+                # on disk only need to be listed again for the central directory
+                for entry in manifest["entries"]:
+                    zinfo = zipfile.ZipInfo(entry["filename"], tuple(entry["date_time"]))
+                    for field in ZIP_INFO_FIELDS[2:]:
+                        setattr(zinfo, field, entry[field])
+                    archive.filelist.append(zinfo)
+                    archive.NameToInfo[zinfo.filename] = zinfo
+                finished = {entry["filename"] for entry in manifest["entries"]}
+
+                for item in items:
+                    if item.name in finished:
+                        self._advance(item.size)
+                        self._count("skipped")
+                        continue
+                    self._check_cancelled()
+                    zinfo = zipfile.ZipInfo(item.name, time.localtime()[:6])
+                    zinfo.compress_type = ZIP_COMPRESSION.get(item.field_name, zipfile.ZIP_DEFLATED)
+                    zinfo.external_attr = 0o644 << 16
+                    zinfo.file_size = item.size  # lets zipfile decide on zip64 headers up front
+                    with archive.open(zinfo, "w") as out:
+                        for chunk in iter_artifact_chunks(item.ref, 0, self.chunk_size):
+                            self._check_cancelled()
+                            out.write(chunk)
+                            self._advance(len(chunk))
+                    manifest["end"] = fp.tell()
+                    manifest["entries"].append({field: getattr(zinfo, field) for field in ZIP_INFO_FIELDS})
+                    self._save_zip_manifest(manifest_path, manifest)
+                    self._count("exported")
+        os.replace(part_path, self.destination)
+        os.remove(manifest_path)
+
+    def run(self):
+        """Export everything, blocking. Raises ExportCancelled after cancel(); partial output is kept for resume."""
+        items = self._measure()
+        if self.on_progress:
+            self.on_progress(0, self.total_bytes)
+        if self.as_zip:
+            self._run_zip(items)
+        else:
+            self._run_folder(items)
+        return self
+
+    def summary(self):
+        text = f"Exported {self.exported} file(s)"
+        if self.skipped:
+            text += f", {self.skipped} already present"
+        if self.failed:
+            text += f", {len(self.failed)} failed:\n" + "\n".join(f"{name}: {error}" for name, error in self.failed[:20])
+        return text
@@ -4,38 +4,175 @@
 # File: chat_handler_service.py
 # Ranks top-k results from Milvus using a local LLM based on transcript relevance
 
-from llm_ranker import LocalLLMRanker
+import os
+import time
+import logging
+import threading
+from llm_ranker import LocalLLMRanker, LocalCrossEncoderRanker
+from score_cache import ScoreCache, text_hash
+from milvus_client import EMBEDDING_MODE
+from artifact_store import read_artifact_text
 
-ranker = LocalLLMRanker()
+# In multilingual mode sentences are ranked in the transcript's own language with a multilingual model
+RANKER_MODELS = {"english": "all-MiniLM-L6-v2", "multilingual": "paraphrase-multilingual-MiniLM-L12-v2"}
+RANKED_TEXT_FIELD = "translation_path" if EMBEDDING_MODE == "english" else "transcript_path"
 
-def rerank_top_matches(user_query, retrieved_matches):
-    # scored = []
-    all_scored_chunks = []
+ranker = LocalLLMRanker(RANKER_MODELS[EMBEDDING_MODE])
+
+# -------------------- Optional cross-encoder stage --------------------
+# Runs only on the best sentences that survive the bi-encoder, and stops once the latency budget is spent
+USE_CROSS_ENCODER = os.environ.get("MIRC_CROSS_ENCODER", "0") == "1"
+CROSS_ENCODER_TOP_N = 30
+CROSS_ENCODER_BUDGET_SECONDS = 0.5
+CROSS_ENCODER_BATCH_SIZE = 8
+# The MS MARCO cross-encoder only reads English; multilingual mode ranks source-language sentences
+CROSS_ENCODER_MODELS = {
+    "english": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    "multilingual": "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+}
+
+_cross_encoder = None
+_score_cache = None
+_cross_encoder_lock = threading.Lock()
+
+def get_cross_encoder():
+    global _cross_encoder, _score_cache
+    with _cross_encoder_lock:
+        if _cross_encoder is None:
+            _score_cache = ScoreCache()
+            _cross_encoder = LocalCrossEncoderRanker(CROSS_ENCODER_MODELS[EMBEDDING_MODE])
+        return _cross_encoder, _score_cache
+
+def cross_encoder_rerank(user_query, scored_chunks, top_n=CROSS_ENCODER_TOP_N, latency_budget=CROSS_ENCODER_BUDGET_SECONDS):
+    """Re-score the first `top_n` chunks (already sorted by bi-encoder score) with the cross-encoder.
+
+    Cached scores are used first; uncached sentences are scored in small batches until the
+    budget runs out. Cross-encoder and bi-encoder scores are on different scales, so the
+    cross-encoder order is only used when it scored at least RESULT_COUNT sentences (every
+    displayed result then carries a cross-encoder score); otherwise the bi-encoder order is
+    kept and this query's new scores only warm the cache. `score_source` tells which it is.
+    """
+    cross_encoder, cache = get_cross_encoder()
+    started = time.perf_counter()  # model loading on first use does not count against the budget
+    candidates, rest = scored_chunks[:top_n], scored_chunks[top_n:]
+
+    query_hash = text_hash(f"{cross_encoder.model_name}\n{user_query}")
+    sentence_hashes = [text_hash(c["sentence"]) for c in candidates]
+    scores = cache.get_many(query_hash, set(sentence_hashes))
+
+    pending = []
+    for h, c in zip(sentence_hashes, candidates):
+        if h not in scores and h not in pending:
+            pending.append(h)
+    sentence_by_hash = {h: c["sentence"] for h, c in zip(sentence_hashes, candidates)}
+
+    new_scores = {}
+    for start in range(0, len(pending), CROSS_ENCODER_BATCH_SIZE):
+        if time.perf_counter() - started > latency_budget:
+            logging.info(f"Cross-encoder budget spent, {len(pending) - start} sentences left unscored")
+            break
+        batch = pending[start:start + CROSS_ENCODER_BATCH_SIZE]
+        batch_scores = cross_encoder.score_sentences(user_query, [sentence_by_hash[h] for h in batch])
+        new_scores.update(zip(batch, batch_scores))
+    cache.put_many(query_hash, new_scores)
+    scores.update(new_scores)
+
+    rescored, unscored = [], []
+    for h, chunk in zip(sentence_hashes, candidates):
+        if h in scores:
+            rescored.append(dict(chunk, bi_encoder_score=chunk["score"], score=scores[h], score_source="cross_encoder"))
+        else:
+            unscored.append(chunk)
+    if len(rescored) < min(RESULT_COUNT, len(candidates)):
+        logging.info(f"Cross-encoder scored {len(rescored)} sentences, keeping the bi-encoder order")
+        return scored_chunks
+    rescored.sort(key=lambda x: x["score"], reverse=True)
+    return rescored + unscored + rest
+
+def rerank_single(user_query, item):
+    """Bi-encoder scores for the best sentences of one retrieved video."""
+    try:
+        # Local path or s3:// reference, remote text comes through the artifact cache
+        transcript = read_artifact_text(item[RANKED_TEXT_FIELD])
+    except:
+        transcript = ""
+
+    top_matches = ranker.score_pair(user_query, transcript, top_k=15)
+    return [
+        {
+            "guid": item["guid"],
+            "title": item["title"],
+            "video_path": item["video_path"],
+            "quality": item.get("quality"),
+            "score": match["score"],
+            "score_source": "bi_encoder",
+            "sentence": match["sentence"]
+        }
+        for match in top_matches
+    ]
+
+# -------------------- Early stopping --------------------
+# A heuristic, not a bound: candidates arrive best vector score first, but a video's best
+# sentence score does not fall in that order, so a later video can still hold the best
+# sentence. Reranking stops once the current top results beat the best sentence of the last
+# EARLY_STOP_PATIENCE videos by EARLY_STOP_MARGIN, and only while the next candidate's vector
+# score is EARLY_STOP_VECTOR_GAP below the first one; near-ties in vector score are always reranked.
+RESULT_COUNT = 5
+EARLY_STOP_MIN_VIDEOS = 3
+EARLY_STOP_PATIENCE = 2
+EARLY_STOP_MARGIN = float(os.environ.get("MIRC_EARLY_STOP_MARGIN", "0.05"))
+EARLY_STOP_VECTOR_GAP = float(os.environ.get("MIRC_EARLY_STOP_VECTOR_GAP", "0.05"))
+
+def can_stop_early(top_scores, recent_best_scores, reranked, margin=EARLY_STOP_MARGIN, next_vector_score=None,
+                   best_vector_score=None, vector_gap=EARLY_STOP_VECTOR_GAP):
+    """Guess whether the remaining candidates are unlikely to displace any of `top_scores`.
+
+    The recent videos' sentence scores only suggest what the rest hold; the guess is only
+    trusted once the vector scores of the rest have also dropped clearly below the best one.
+    """
+    if reranked < EARLY_STOP_MIN_VIDEOS or len(top_scores) < RESULT_COUNT or len(recent_best_scores) < EARLY_STOP_PATIENCE:
+        return False
+    if next_vector_score is not None and best_vector_score is not None \
+            and next_vector_score > best_vector_score - vector_gap:
+        return False
+    return min(top_scores) >= max(recent_best_scores[-EARLY_STOP_PATIENCE:]) + margin
+
+def rerank_top_matches(user_query, retrieved_matches, use_cross_encoder=None,
+                       cross_encoder_top_n=CROSS_ENCODER_TOP_N, latency_budget=CROSS_ENCODER_BUDGET_SECONDS,
+                       on_item_ranked=None, early_stop=False, stats=None):
+    """Rank sentences across all retrieved videos and return the top 5.
+
+    `on_item_ranked(item, chunks)` is called as soon as each video has been scored, so
+    callers can show partial results before the whole set is done. With early_stop=True the
+    remaining videos are skipped once they are unlikely to beat the current top 5; this can
+    miss a later video with a better sentence (see can_stop_early).
+    `stats`, if given, receives the reranked/skipped video counts and the seconds spent.
+    """
+    all_scored_chunks, recent_best_scores = [], []
+    reranked, started = 0, time.perf_counter()
+    best_vector_score = retrieved_matches[0].get("vector_score") if retrieved_matches else None
     for item in retrieved_matches:
-        guid = item["guid"]
-        transcript_path = item["transcript_path"]
-        translation_path = item["translation_path"]
-        title = item["title"]
-
-        try:
-            with open(translation_path, encoding="utf-8") as f:
-                transcript = f.read()
-        except:
-            transcript = ""
-
-        top_matches = ranker.score_pair(user_query, transcript, top_k=15)
-
-        for match in top_matches:
-            all_scored_chunks.append({
-                "guid": guid,
-                "title": title,
-                "video_path": item["video_path"],
-                "score": match["score"],
-                "sentence": match["sentence"]
-            })
-
-    # # Sort by the best sentence score in each result
-    # scored.sort(key=lambda x: x["matches"][0]["score"] if x["matches"] else 0, reverse=True)
+        if early_stop:
+            top_scores = sorted((c["score"] for c in all_scored_chunks), reverse=True)[:RESULT_COUNT]
+            if can_stop_early(top_scores, recent_best_scores, reranked, next_vector_score=item.get("vector_score"),
+                              best_vector_score=best_vector_score):
+                logging.info(f"Reranking stopped early after {reranked} of {len(retrieved_matches)} videos")
+                break
+        chunks = rerank_single(user_query, item)
+        reranked += 1
+        recent_best_scores.append(max((c["score"] for c in chunks), default=0.0))
+        all_scored_chunks.extend(chunks)
+        if on_item_ranked:
+            on_item_ranked(item, chunks)
+    if stats is not None:
+        stats.update(reranked=reranked, skipped=len(retrieved_matches) - reranked,
+                     rerank_seconds=time.perf_counter() - started)
+
     # Sort all matches across all videos
     all_scored_chunks.sort(key=lambda x: x["score"], reverse=True)
-    return all_scored_chunks[:5]  # return top 5
\ No newline at end of file
+
+    if use_cross_encoder is None:
+        use_cross_encoder = USE_CROSS_ENCODER
+    if use_cross_encoder:
+        all_scored_chunks = cross_encoder_rerank(user_query, all_scored_chunks, cross_encoder_top_n, latency_budget)
+    return all_scored_chunks[:RESULT_COUNT]
@@ -1,23 +1,19 @@
 # Bismillah
 # Starting project on 07-01-1447 - 03-07-2025
 
-from pymilvus import connections, Collection
-import shutil
-import os
+from milvus_client import get_milvus, MILVUS_COLLECTION_NAME
 
-connections.connect("default", host="127.0.0.1", port="19530")
-collection = Collection("video_embeddings_v8")
-collection.load()
+milvus = get_milvus()
 
 def fetch_all_entries():
-    results = collection.query(
+    results = milvus.run(MILVUS_COLLECTION_NAME, lambda collection: collection.query(
         expr="",
         output_fields=[
             "guid", "title", "video_path", "transcript_path", 
-            "translation_path", "summary_path"
+            "translation_path", "summary_path", "quality"
         ],
         limit=10000
-    )
+    ), load=True)
     return results
 
 def get_file_path(entry, key):
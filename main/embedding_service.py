@@ -0,0 +1,135 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: embedding_service.py
+# Embedding service shared by ingest (pipeline.py) and query (query_backend.py)
+
+import os
+import threading
+import numpy as np
+import torch
+from concurrent.futures import ProcessPoolExecutor
+from transformers import AutoTokenizer, AutoModel
+from milvus_client import EMBEDDING_MODE
+
+# Model and pooling per embedding mode, both 384-d so the collection schema is shared
+EMBEDDING_MODELS = {
+    "english": ("BAAI/bge-small-en", "cls"),
+    "multilingual": ("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2", "mean"),  # 50+ languages incl. ur/ar
+}
+EMBEDDING_MODEL = EMBEDDING_MODELS[EMBEDDING_MODE][0]
+POOLING = dict(EMBEDDING_MODELS.values())
+EMBEDDING_DIM = 384
+EMBED_BATCH_SIZE = 32
+EMBED_MAX_LENGTH = 512
+EMBED_WORKERS = int(os.environ.get("MIRC_EMBED_WORKERS", "0"))  # >1 spreads large jobs over a process pool
+
+
+def _encode(tokenizer, model, texts, max_length, pooling="cls"):
+    """CLS- or mean-pooled, L2-normalized float32 embeddings for one padded batch."""
+    inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=max_length)
+    with torch.no_grad():
+        outputs = model(**inputs)
+    if pooling == "mean":
+        mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+        pooled = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    else:
+        pooled = outputs.last_hidden_state[:, 0, :]
+    vectors = pooled.numpy().astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# -------------------- Process pool workers --------------------
+_worker_state = {}
+
+def _init_worker(model_name, max_length, threads):
+    torch.set_num_threads(threads)
+    _worker_state["tokenizer"] = AutoTokenizer.from_pretrained(model_name)
+    _worker_state["model"] = AutoModel.from_pretrained(model_name).eval()
+    _worker_state["max_length"] = max_length
+    _worker_state["pooling"] = POOLING.get(model_name, "cls")
+
+def _worker_encode(texts):
+    return _encode(_worker_state["tokenizer"], _worker_state["model"], texts, _worker_state["max_length"],
+                   _worker_state["pooling"])
+
+
+class EmbeddingService:
+    """Batched sentence embeddings (BGE, or the multilingual model in multilingual mode).
+
+    embed_many sorts inputs by token length so each fixed-size batch pads to a similar
+    length, runs the batches (optionally over a process pool) and returns one contiguous,
+    normalized float32 matrix in the original input order.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE, num_workers=EMBED_WORKERS,
+                 max_length=EMBED_MAX_LENGTH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.max_length = max_length
+        self.pooling = POOLING.get(model_name, "cls")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.dim = self.model.config.hidden_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.max_length, threads)
+            )
+        return self._pool
+
+    def embed_many(self, texts, batch_size=None, num_workers=None):
+        """Embed a list of strings into an (n, dim) float32 matrix with unit-length rows."""
+        texts = [t if t else "" for t in texts]
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        batch_size = batch_size or self.batch_size
+        num_workers = self.num_workers if num_workers is None else num_workers
+
+        # Length buckets: consecutive slices of the length-sorted order
+        lengths = [len(ids) for ids in self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]]
+        order = np.argsort(lengths, kind="stable")
+        batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+        output = np.empty((len(texts), self.dim), dtype=np.float32)
+        if num_workers > 1 and len(batches) > 1:
+            with self._lock:
+                pool = self._get_pool()
+            results = pool.map(_worker_encode, [[texts[i] for i in batch] for batch in batches])
+            for batch, vectors in zip(batches, results):
+                output[batch] = vectors
+        else:
+            with self._lock:  # the in-process model is shared by ingest and query threads
+                for batch in batches:
+                    output[batch] = _encode(self.tokenizer, self.model, [texts[i] for i in batch], self.max_length,
+                                           self.pooling)
+        return output
+
+    def embed(self, text):
+        """Single normalized float32 vector."""
+        return self.embed_many([text])[0]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+def get_embedding_service(model_name=EMBEDDING_MODEL):
+    """One loaded model per process and model name."""
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services[model_name]
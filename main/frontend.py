@@ -2,81 +2,66 @@
 # Starting project on 07-01-1447 - 03-07-2025
 
 import sys
-import shutil
 import os
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QPushButton, QFileDialog, QProgressBar, QMessageBox, QTabWidget,
     QLineEdit, QTableWidget, QTableWidgetItem, QListWidget, QListWidgetItem,
-    QSplitter, QHeaderView, QScrollArea, QFrame
+    QHeaderView, QCheckBox, QComboBox, QSpinBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QMimeData
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QPixmap, QImage
-import cv2
-import numpy as np
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QPixmap
 import torch
 import subprocess
 import platform
 from PyQt5.QtCore import QUrl
-from PyQt5.QtGui import QDesktopServices, QCursor
+from PyQt5.QtGui import QDesktopServices
 
-from pipeline import process_video
-from query_backend import search_similar
+from ingest_scheduler import IngestScheduler, SCHEDULE_POLICY
+from query_backend import search_similar, search_adaptive, ADAPTIVE_RETRIEVAL
 from chat_handler_service import rerank_top_matches
-from db_browser_backend import fetch_all_entries, get_file_path
+from db_browser_backend import fetch_all_entries
+from maintenance import delete_videos, reprocess_videos, check_consistency, remove_files
+from results_view import ResultListView, QUALITY_BADGES
+from artifact_store import is_remote, stream_url
+from bulk_export import ExportJob, ExportItem, ExportCancelled, export_items
+
+# Where the upload tab writes artifacts; also what "Check Files" compares with Milvus
+PROCESSED_VIDEOS_DIR = os.path.abspath("processed_videos")
 
 class VideoProcessingThread(QThread):
     progress_update = pyqtSignal(int)
+    eta_update = pyqtSignal(float)   # seconds left for the whole batch
     finished = pyqtSignal(str, str)  # guid, video_path
     failed = pyqtSignal(str, str)    # error_msg, video_path
     all_finished = pyqtSignal()
     video_started = pyqtSignal(str)  # video_path
 
-    def __init__(self, video_paths, base_dir):
+    def __init__(self, video_paths, base_dir, tier="final", policy=SCHEDULE_POLICY):
         super().__init__()
         self.video_paths = video_paths
         self.base_dir = base_dir
+        self.tier = tier
+        self.policy = policy
 
     def run(self):
-        total_videos = len(self.video_paths)
+        # Jobs are probed, ordered and admitted by the scheduler (ingest_scheduler.py);
+        # the list order doubles as user priority, first file highest
+        scheduler = IngestScheduler(self.base_dir, self.tier, policy=self.policy)
         for i, video_path in enumerate(self.video_paths):
-            try:
-                self.video_started.emit(video_path)
-                
-                # Calculate base progress for this video
-                base_progress = int((i / total_videos) * 100)
-                
-                # Create a progress callback that handles the pipeline's progress updates
-                # The pipeline calls progress_callback.emit(value), so we need to create an object with emit method
-                class ProgressCallback:
-                    def __init__(self, thread_signal, base_prog, total_vids):
-                        self.thread_signal = thread_signal
-                        self.base_progress = base_prog
-                        self.total_videos = total_vids
-                    
-                    def emit(self, progress):
-                        # Individual video progress (0-100) mapped to overall progress
-                        video_progress = int((progress / 100) * (100 / total_videos))
-                        overall_progress = self.base_progress + video_progress
-                        self.thread_signal.emit(min(overall_progress, 100))
-                
-                progress_callback = ProgressCallback(self.progress_update, base_progress, total_videos)
-                
-                # Set initial progress for this video
-                self.progress_update.emit(base_progress)
-                
-                # Process the video - pass the progress callback directly
-                guid = process_video(video_path, self.base_dir, progress_callback)
-                
-                # Ensure progress shows completion for this video
-                completion_progress = int(((i + 1) / total_videos) * 100)
-                self.progress_update.emit(completion_progress)
-                
-                self.finished.emit(guid, video_path)
-                
-            except Exception as e:
-                self.failed.emit(str(e), video_path)
-        
+            scheduler.submit(video_path, priority=len(self.video_paths) - i if self.policy == "fifo" else 0)
+        self.eta_update.emit(scheduler.eta())
+
+        def on_progress(progress, eta):
+            self.progress_update.emit(min(progress, 100))
+            self.eta_update.emit(eta)
+
+        scheduler.run(
+            on_started=lambda job: self.video_started.emit(job.video_path),
+            on_finished=lambda job: self.finished.emit(job.guid, job.video_path),
+            on_failed=lambda job: self.failed.emit(job.error, job.video_path),
+            on_progress=on_progress
+        )
         self.all_finished.emit()
 
 class VideoUploadTab(QWidget):
@@ -133,6 +118,21 @@ class VideoUploadTab(QWidget):
         button_layout.addWidget(self.clear_btn)
         button_layout.addWidget(self.process_btn)
 
+        # Draft mode: searchable within minutes, upgraded to full quality in the background
+        self.draft_checkbox = QCheckBox("Fast draft (upgrade to full quality in background)")
+        self.draft_checkbox.setToolTip("Uses a tiny Whisper model and an extractive summary first, "
+                                       "then re-processes each video at full quality when the pipeline is idle.")
+
+        # Job order: short videos first, or the list order as priority
+        order_layout = QHBoxLayout()
+        order_layout.addWidget(QLabel("Order:"))
+        self.order_combo = QComboBox()
+        self.order_combo.addItem("Shortest first", "shortest")
+        self.order_combo.addItem("List order", "fifo")
+        self.order_combo.setCurrentIndex(max(0, self.order_combo.findData(SCHEDULE_POLICY)))
+        order_layout.addWidget(self.order_combo)
+        order_layout.addStretch()
+
         # Progress bar
         self.progress = QProgressBar()
         self.progress.setValue(0)
@@ -149,6 +149,8 @@ class VideoUploadTab(QWidget):
         layout.addWidget(instructions)
         layout.addWidget(self.file_list)
         layout.addLayout(button_layout)
+        layout.addWidget(self.draft_checkbox)
+        layout.addLayout(order_layout)
         layout.addWidget(self.progress)
         layout.addWidget(self.status_label)
         layout.addWidget(QLabel("Processing Results:"))
@@ -201,7 +203,7 @@ class VideoUploadTab(QWidget):
             return
 
         video_paths = [self.file_list.item(i).text() for i in range(self.file_list.count())]
-        base_dir = os.path.abspath("processed_videos")
+        base_dir = PROCESSED_VIDEOS_DIR
 
         self.process_btn.setEnabled(False)
         self.add_btn.setEnabled(False)
@@ -210,8 +212,10 @@ class VideoUploadTab(QWidget):
         self.status_label.setText(f"Starting processing of {len(video_paths)} videos...")
         self.results_list.clear()
 
-        self.thread = VideoProcessingThread(video_paths, base_dir)
+        tier = "draft" if self.draft_checkbox.isChecked() else "final"
+        self.thread = VideoProcessingThread(video_paths, base_dir, tier, self.order_combo.currentData())
         self.thread.progress_update.connect(self.progress.setValue)
+        self.thread.eta_update.connect(self.on_eta_update)
         self.thread.finished.connect(self.on_video_success)
         self.thread.failed.connect(self.on_video_failure)
         self.thread.all_finished.connect(self.on_all_finished)
@@ -222,6 +226,12 @@ class VideoUploadTab(QWidget):
         filename = os.path.basename(video_path)
         self.status_label.setText(f"Processing: {filename}")
 
+    def on_eta_update(self, seconds):
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        eta = f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {secs:02d}s"
+        self.progress.setFormat(f"%p% - about {eta} left")
+
     def on_video_success(self, guid, video_path):
         filename = os.path.basename(video_path)
         self.results_list.addItem(f"✓ {filename} - GUID: {guid}")
@@ -237,12 +247,49 @@ class VideoUploadTab(QWidget):
         self.add_btn.setEnabled(True)
         self.clear_btn.setEnabled(True)
         self.progress.setValue(100)
+        self.progress.setFormat("%p%")
         self.status_label.setText("All videos processed!")
         QMessageBox.information(self, "Complete", "All videos have been processed!")
 
+class QueryThread(QThread):
+    """Runs search + rerank off the GUI thread and streams results as they become available."""
+    candidates_ready = pyqtSignal(list)       # raw vector hits from search_similar
+    video_ranked = pyqtSignal(str, list)      # guid, scored sentences for that video
+    ranking_finished = pyqtSignal(list)       # final top results, same as rerank_top_matches
+    stats_ready = pyqtSignal(dict)            # adaptive mode: candidates searched/kept, videos reranked/skipped
+    failed = pyqtSignal(str)
+
+    def __init__(self, query, top_k=10, filters=None, adaptive=ADAPTIVE_RETRIEVAL):
+        super().__init__()
+        self.query = query
+        self.top_k = top_k
+        self.filters = filters
+        self.adaptive = adaptive
+
+    def run(self):
+        try:
+            stats = {}
+            if self.adaptive:
+                matches = search_adaptive(self.query, top_k=self.top_k, filters=self.filters, stats=stats)
+            else:
+                matches = search_similar(self.query, top_k=self.top_k, filters=self.filters)
+            self.candidates_ready.emit(matches)
+            ranked_results = rerank_top_matches(
+                self.query, matches,
+                on_item_ranked=lambda item, chunks: self.video_ranked.emit(item["guid"], chunks),
+                early_stop=self.adaptive, stats=stats
+            )
+            self.ranking_finished.emit(ranked_results)
+            if self.adaptive:
+                self.stats_ready.emit(stats)
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class QueryTab(QWidget):
     def __init__(self):
         super().__init__()
+        self.query_thread = None
+        self.running_query_threads = set()
         self.setup_ui()
 
     def setup_ui(self):
@@ -262,207 +309,58 @@ class QueryTab(QWidget):
         self.search_btn = QPushButton("Search")
         self.search_btn.clicked.connect(self.run_query)
 
+        # Language filter (language is the Milvus partition key, so this also narrows the scan)
+        self.language_filter = QComboBox()
+        for label, code in [("All languages", None), ("English", "en"), ("Urdu", "ur"), ("Arabic", "ar")]:
+            self.language_filter.addItem(label, code)
+
+        # Number of videos retrieved; the list view only renders what is on screen, so large values stay cheap
+        self.top_k_input = QSpinBox()
+        self.top_k_input.setRange(1, 200)
+        self.top_k_input.setValue(10)
+        self.top_k_input.setPrefix("Top ")
+
+        # Adaptive: Top N is only the starting depth, widened for flat score distributions and
+        # narrowed for clear winners; reranking stops once the rest cannot reach the top 5
+        self.adaptive_check = QCheckBox("Adaptive")
+        self.adaptive_check.setChecked(ADAPTIVE_RETRIEVAL)
+
         query_layout.addWidget(QLabel("Question:"))
         query_layout.addWidget(self.query_input)
+        query_layout.addWidget(self.language_filter)
+        query_layout.addWidget(self.top_k_input)
+        query_layout.addWidget(self.adaptive_check)
         query_layout.addWidget(self.search_btn)
 
-        # Results scroll area
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        
-        # Container widget for results
-        self.results_container = QWidget()
-        self.results_layout = QVBoxLayout()
-        self.results_layout.setSpacing(10)
-        self.results_container.setLayout(self.results_layout)
-        self.scroll_area.setWidget(self.results_container)
+        # Virtualized results list (results_view.py): cards are painted on demand, thumbnails load in the background
+        self.results_view = ResultListView()
+        self.results_view.open_requested.connect(self.open_video)
+
+        # Empty-result and error messages
+        self.status_label = QLabel()
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setWordWrap(True)
+        self.status_label.hide()
 
         layout.addWidget(title_label)
         layout.addLayout(query_layout)
         layout.addWidget(QLabel("Search Results:"))
-        layout.addWidget(self.scroll_area)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results_view)
 
         self.setLayout(layout)
 
-    def get_video_thumbnail(self, video_path):
-        """Extract a frame from the video to use as thumbnail"""
-        try:
-            # Check if video file exists
-            if not os.path.exists(video_path):
-                return self.create_placeholder_thumbnail("File Not Found")
-            
-            # Open video file
-            cap = cv2.VideoCapture(video_path)
-            
-            if not cap.isOpened():
-                return self.create_placeholder_thumbnail("Cannot Open Video")
-            
-            # Get video properties
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            
-            # Seek to 10% into the video (usually gives a good representative frame)
-            # Avoid the very beginning which might be black or logos
-            target_frame = min(int(total_frames * 0.1), int(fps * 5))  # Max 5 seconds in
-            cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-            
-            # Read the frame
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret or frame is None:
-                return self.create_placeholder_thumbnail("No Frame Available")
-            
-            # Convert BGR to RGB (OpenCV uses BGR, Qt uses RGB)
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Get frame dimensions
-            height, width, channels = frame_rgb.shape
-            bytes_per_line = channels * width
-            
-            # Create QImage from the frame
-            q_image = QImage(frame_rgb.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            
-            # Convert to QPixmap and scale
-            pixmap = QPixmap.fromImage(q_image)
-            scaled_pixmap = pixmap.scaled(120, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            
-            return scaled_pixmap
-            
-        except Exception as e:
-            print(f"Error extracting thumbnail from {video_path}: {str(e)}")
-            return self.create_placeholder_thumbnail("Extraction Error")
-    
-    def create_placeholder_thumbnail(self, message="No Preview"):
-        """Create a placeholder thumbnail with a message"""
-        pixmap = QPixmap(120, 80)
-        pixmap.fill(Qt.lightGray)
-        
-        # You could add text to the placeholder here if needed
-        # This creates a simple gray rectangle placeholder
-        return pixmap
-
-    def create_result_card(self, item):
-        """Create a card widget for each search result"""
-        card = QFrame()
-        card.setFrameStyle(QFrame.StyledPanel)
-        card.setStyleSheet("""
-            QFrame {
-                border: 1px solid #ddd;
-                border-radius: 8px;
-                background-color: white;
-                margin: 2px;
-            }
-            QFrame:hover {
-                border: 2px solid #3498db;
-                background-color: #f8f9fa;
-            }
-        """)
-        
-        card_layout = QHBoxLayout()
-        card_layout.setContentsMargins(10, 10, 10, 10)
-        card_layout.setSpacing(15)
-        
-        # Thumbnail - Make it clickable
-        thumbnail_label = QLabel()
-        thumbnail_pixmap = self.get_video_thumbnail(item['video_path'])
-        thumbnail_label.setPixmap(thumbnail_pixmap)
-        thumbnail_label.setFixedSize(120, 80)
-        thumbnail_label.setStyleSheet("""
-            border: 1px solid #ccc; 
-            border-radius: 4px;
-            cursor: pointer;
-        """)
-        thumbnail_label.setScaledContents(True)
-        
-        # Make thumbnail clickable - capture video_path in closure
-        video_path = item['video_path']
-        thumbnail_label.mousePressEvent = lambda event, path=video_path: self.open_video(path)
-        thumbnail_label.setCursor(QCursor(Qt.PointingHandCursor))
-        
-        # Content area
-        content_layout = QVBoxLayout()
-        content_layout.setSpacing(5)
-        
-        # Title and Score
-        title_score_layout = QHBoxLayout()
-        title_label = QLabel(item['title'])
-        title_label.setStyleSheet("""
-            font-weight: bold; 
-            font-size: 14px; 
-            color: #2c3e50;
-            cursor: pointer;
-        """)
-        title_label.setWordWrap(True)
-        title_label.setCursor(QCursor(Qt.PointingHandCursor))
-        
-        # Make title clickable
-        title_label.mousePressEvent = lambda event, path=video_path: self.open_video(path)
-        
-        score_label = QLabel(f"Score: {item['score']:.2f}")
-        score_label.setStyleSheet("font-weight: bold; color: #e74c3c; font-size: 12px;")
-        score_label.setAlignment(Qt.AlignRight | Qt.AlignTop)
-        score_label.setFixedWidth(80)
-        
-        title_score_layout.addWidget(title_label, 1)
-        title_score_layout.addWidget(score_label, 0)
-        
-        # Best match text
-        match_label = QLabel("Best Match:")
-        match_label.setStyleSheet("font-weight: bold; font-size: 11px; color: #7f8c8d; margin-top: 5px;")
-        
-        sentence_label = QLabel(item['sentence'])
-        sentence_label.setWordWrap(True)
-        sentence_label.setStyleSheet("font-size: 11px; color: #34495e; background-color: #ecf0f1; padding: 5px; border-radius: 3px;")
-        sentence_label.setMaximumHeight(60)
-        
-        # Video path with play button
-        path_layout = QHBoxLayout()
-        path_label = QLabel(f"📁 {os.path.basename(item['video_path'])}")
-        path_label.setStyleSheet("font-size: 10px; color: #95a5a6; margin-top: 3px;")
-        
-        # Add a small play button
-        play_button = QPushButton("▶️ Play")
-        play_button.setStyleSheet("""
-            QPushButton {
-                background-color: #3498db;
-                color: white;
-                border: none;
-                border-radius: 3px;
-                padding: 3px 8px;
-                font-size: 10px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-            QPushButton:pressed {
-                background-color: #21618c;
-            }
-        """)
-        play_button.setMaximumSize(60, 25)
-        play_button.clicked.connect(lambda checked, path=video_path: self.open_video(path))
-        
-        path_layout.addWidget(path_label)
-        path_layout.addStretch()
-        path_layout.addWidget(play_button)
-        
-        content_layout.addLayout(title_score_layout)
-        content_layout.addWidget(match_label)
-        content_layout.addWidget(sentence_label)
-        content_layout.addLayout(path_layout)
-        content_layout.addStretch()
-        
-        card_layout.addWidget(thumbnail_label)
-        card_layout.addLayout(content_layout, 1)
-        
-        card.setLayout(card_layout)
-        return card
+    def show_status(self, text, style):
+        self.status_label.setText(text)
+        self.status_label.setStyleSheet(style)
+        self.status_label.show()
 
     def open_video(self, video_path):
         """Open the video file using the default system video player"""
+        if is_remote(video_path):
+            # Archive in object storage: hand the player a presigned URL instead of downloading first
+            QDesktopServices.openUrl(QUrl(stream_url(video_path)))
+            return
         try:
             if not os.path.exists(video_path):
                 QMessageBox.warning(self, "File Not Found", f"Video file not found:\n{video_path}")
@@ -490,6 +388,10 @@ class QueryTab(QWidget):
             except:
                 QMessageBox.critical(self, "Error", f"Could not open video file:\n{str(e)}")
 
+    def clear_results(self):
+        self.results_view.clear()
+        self.status_label.hide()
+
     def run_query(self):
         query = self.query_input.text().strip()
         if not query:
@@ -497,38 +399,115 @@ class QueryTab(QWidget):
             return
 
         # Clear previous results
-        while self.results_layout.count():
-            child = self.results_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        self.clear_results()
+
+        # A newer query supersedes the one still running; its signals are ignored from here on
+        language = self.language_filter.currentData()
+        filters = {"language": language} if language else None
+        self.query_thread = QueryThread(query, top_k=self.top_k_input.value(), filters=filters,
+                                        adaptive=self.adaptive_check.isChecked())
+        self.query_thread.candidates_ready.connect(self.on_candidates_ready)
+        self.query_thread.video_ranked.connect(self.on_video_ranked)
+        self.query_thread.ranking_finished.connect(self.on_ranking_finished)
+        self.query_thread.stats_ready.connect(self.on_stats_ready)
+        self.query_thread.failed.connect(self.on_query_failed)
+        # Keep superseded threads referenced until they finish, Qt aborts if a running QThread is collected
+        self.running_query_threads.add(self.query_thread)
+        self.query_thread.finished.connect(lambda t=self.query_thread: self.running_query_threads.discard(t))
+        self.query_thread.start()
+
+    def on_candidates_ready(self, matches):
+        """Show raw vector hits straight away; rerank results refine them afterwards."""
+        if self.sender() is not self.query_thread:
+            return
+        self.results_view.show_results(matches)
+
+    def on_video_ranked(self, guid, chunks):
+        if self.sender() is not self.query_thread:
+            return
+        self.results_view.results.update_ranked(guid, chunks)
+
+    def on_ranking_finished(self, ranked_results):
+        if self.sender() is not self.query_thread:
+            return
+        # Final view is the same top-5 sentence list as before; thumbnails come from the cache
+        self.results_view.show_results(ranked_results)
+        if not ranked_results:
+            self.show_status("No results found for your query.", "color: #7f8c8d; font-style: italic; padding: 20px;")
+
+    def on_stats_ready(self, stats):
+        if self.sender() is not self.query_thread or not stats.get("reranked"):
+            return
+        self.show_status(
+            f"Reranked {stats['reranked']} of {stats['searched']} candidate videos in {stats['rerank_seconds']:.1f}s "
+            f"({stats['searched'] - stats['kept']} cut by score, {stats['skipped']} skipped early)",
+            "color: #7f8c8d; font-size: 11px; padding: 2px;")
+
+    def on_query_failed(self, error_msg):
+        if self.sender() is not self.query_thread:
+            return
+        self.clear_results()
+        self.show_status(f"Search failed: {error_msg}",
+                         "color: #e74c3c; padding: 10px; background-color: #fadbd8; border-radius: 4px;")
+
 
+class MaintenanceThread(QThread):
+    """Runs delete / re-process jobs for the selected GUIDs, and consistency checks, off the GUI thread."""
+    done = pyqtSignal(str)
+    report_ready = pyqtSignal(dict)  # "check": the sweep report, nothing deleted yet
+    failed = pyqtSignal(str)
+
+    def __init__(self, action, guids=None, paths=None):
+        super().__init__()
+        self.action = action
+        self.guids = guids
+        self.paths = paths
+
+    def run(self):
         try:
-            matches = search_similar(query, top_k=10)
-            ranked_results = rerank_top_matches(query, matches)
-
-            if not ranked_results:
-                no_results_label = QLabel("No results found for your query.")
-                no_results_label.setAlignment(Qt.AlignCenter)
-                no_results_label.setStyleSheet("color: #7f8c8d; font-style: italic; padding: 20px;")
-                self.results_layout.addWidget(no_results_label)
+            if self.action == "check":
+                self.report_ready.emit(check_consistency(PROCESSED_VIDEOS_DIR))
+            elif self.action == "remove_orphans":
+                self.done.emit(f"Removed {remove_files(self.paths)} orphaned file(s).")
+            elif self.action == "delete":
+                deleted = delete_videos(self.guids)
+                self.done.emit(f"Deleted {deleted} video(s).")
             else:
-                for item in ranked_results:
-                    result_card = self.create_result_card(item)
-                    self.results_layout.addWidget(result_card)
-            
-            # Add stretch to push results to top
-            self.results_layout.addStretch()
-
+                reprocess_videos(self.guids)
+                self.done.emit(f"Re-processed {len(self.guids)} video(s).")
         except Exception as e:
-            error_label = QLabel(f"Search failed: {str(e)}")
-            error_label.setStyleSheet("color: #e74c3c; padding: 10px; background-color: #fadbd8; border-radius: 4px;")
-            self.results_layout.addWidget(error_label)
+            self.failed.emit(str(e))
 
+class ExportThread(QThread):
+    """Runs one ExportJob off the GUI thread; several can run at the same time."""
+    progress_update = pyqtSignal(float, float)  # done bytes, total bytes (floats, files pass 2 GB)
+    done = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, items, destination, as_zip=False):
+        super().__init__()
+        self.job = ExportJob(items, destination, as_zip=as_zip,
+                             on_progress=lambda done, total: self.progress_update.emit(done, total))
+
+    def cancel(self):
+        self.job.cancel()
+
+    def run(self):
+        try:
+            self.job.run()
+            self.done.emit(self.job.summary())
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
 
 # For Third tab of Database Browser
 class DatabaseBrowserTab(QWidget):
     def __init__(self):
         super().__init__()
+        self.records = []
+        self.export_threads = []
         self.init_ui()
 
     def init_ui(self):
@@ -544,12 +523,51 @@ class DatabaseBrowserTab(QWidget):
         search_layout.addWidget(search_button)
         layout.addLayout(search_layout)
 
+        # --- Maintenance (acts on the selected rows) ---
+        maintenance_layout = QHBoxLayout()
+        self.reprocess_btn = QPushButton("Re-process Selected")
+        self.reprocess_btn.clicked.connect(lambda: self.run_maintenance("reprocess"))
+        self.delete_btn = QPushButton("Delete Selected")
+        self.delete_btn.clicked.connect(lambda: self.run_maintenance("delete"))
+        # Report-only check of processed_videos/ against Milvus; orphans are only deleted after confirmation
+        self.check_btn = QPushButton("Check Files")
+        self.check_btn.clicked.connect(self.check_files)
+        maintenance_layout.addWidget(self.check_btn)
+        maintenance_layout.addStretch()
+        maintenance_layout.addWidget(self.reprocess_btn)
+        maintenance_layout.addWidget(self.delete_btn)
+        layout.addLayout(maintenance_layout)
+
+        # --- Export (acts on the selected rows, runs in the background) ---
+        export_layout = QHBoxLayout()
+        export_layout.addWidget(QLabel("Export:"))
+        self.export_checks = {}
+        for field_name, label in [("transcript_path", "Transcripts"), ("translation_path", "Translations"),
+                                  ("summary_path", "Summaries"), ("video_path", "Videos")]:
+            check = QCheckBox(label)
+            check.setChecked(field_name != "video_path")
+            self.export_checks[field_name] = check
+            export_layout.addWidget(check)
+        self.export_zip_check = QCheckBox("As .zip")
+        export_layout.addWidget(self.export_zip_check)
+        export_layout.addStretch()
+        export_btn = QPushButton("Export Selected...")
+        export_btn.clicked.connect(self.export_selected)
+        export_layout.addWidget(export_btn)
+        layout.addLayout(export_layout)
+
+        # One row (label, progress bar, cancel) per running export
+        self.exports_layout = QVBoxLayout()
+        layout.addLayout(self.exports_layout)
+
         # --- Table Display ---
         self.table = QTableWidget()
         self.table.setColumnCount(6)
         self.table.setHorizontalHeaderLabels(["GUID", "Title", "Transcript", "Translation", "Summary", "Video"])
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.ExtendedSelection)
         layout.addWidget(self.table)
 
         self.setLayout(layout)
@@ -563,11 +581,13 @@ class DatabaseBrowserTab(QWidget):
         if filter_text:
             filter_text = filter_text.lower()
             records = [r for r in records if filter_text in r["guid"].lower() or filter_text in r["title"].lower()]
+        self.records = records
 
         self.table.setRowCount(len(records))
         for row, item in enumerate(records):
             self.table.setItem(row, 0, QTableWidgetItem(item["guid"]))
-            self.table.setItem(row, 1, QTableWidgetItem(item["title"]))
+            title = item["title"] + (f" [{item['quality']}]" if item.get("quality") in QUALITY_BADGES else "")
+            self.table.setItem(row, 1, QTableWidgetItem(title))
 
             for i, key in enumerate(["transcript_path", "translation_path", "summary_path", "video_path"], start=2):
                 button = QPushButton("Download")
@@ -578,34 +598,154 @@ class DatabaseBrowserTab(QWidget):
         query = self.search_bar.text()
         self.load_data(query)
 
+    def selected_guids(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        return [self.table.item(row, 0).text() for row in rows]
+
+    def run_maintenance(self, action):
+        guids = self.selected_guids()
+        if not guids:
+            QMessageBox.warning(self, "Warning", "Select one or more rows first.")
+            return
+        if action == "delete":
+            reply = QMessageBox.question(
+                self, "Delete Videos",
+                f"Delete {len(guids)} video(s) and all their files? This cannot be undone.",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+        self.reprocess_btn.setEnabled(False)
+        self.delete_btn.setEnabled(False)
+        self.maintenance_thread = MaintenanceThread(action, guids)
+        self.maintenance_thread.done.connect(self.on_maintenance_done)
+        self.maintenance_thread.failed.connect(self.on_maintenance_failed)
+        self.maintenance_thread.start()
+
+    def check_files(self):
+        self.check_btn.setEnabled(False)
+        self.check_thread = MaintenanceThread("check")
+        self.check_thread.report_ready.connect(self.on_check_report)
+        self.check_thread.done.connect(self.on_check_done)
+        self.check_thread.failed.connect(self.on_check_failed)
+        self.check_thread.start()
+
+    def on_check_report(self, report):
+        orphans = report["orphans"]
+        message = (f"Checked {report['checked_rows']} rows.\n"
+                   f"{len(report['rows_missing_files'])} row(s) are missing files (see video_pipeline.log).\n"
+                   f"{len(orphans)} orphaned file(s) from failed ingests ({report['orphan_bytes'] / 1024**2:,.1f} MB).")
+        if not orphans:
+            self.check_btn.setEnabled(True)
+            QMessageBox.information(self, "Check Files", message)
+            return
+        listing = "\n".join(orphans[:15]) + (f"\n... and {len(orphans) - 15} more" if len(orphans) > 15 else "")
+        reply = QMessageBox.question(
+            self, "Check Files", f"{message}\n\n{listing}\n\nDelete these orphaned files? This cannot be undone.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            self.check_btn.setEnabled(True)
+            return
+        self.check_thread = MaintenanceThread("remove_orphans", paths=orphans)
+        self.check_thread.done.connect(self.on_check_done)
+        self.check_thread.failed.connect(self.on_check_failed)
+        self.check_thread.start()
+
+    def on_check_done(self, message):
+        self.check_btn.setEnabled(True)
+        QMessageBox.information(self, "Check Files", message)
+
+    def on_check_failed(self, error_msg):
+        self.check_btn.setEnabled(True)
+        QMessageBox.critical(self, "Error", f"Check failed:\n{error_msg}")
+
+    def on_maintenance_done(self, message):
+        self.reprocess_btn.setEnabled(True)
+        self.delete_btn.setEnabled(True)
+        self.load_data(self.search_bar.text())
+        QMessageBox.information(self, "Done", message)
+
+    def on_maintenance_failed(self, error_msg):
+        self.reprocess_btn.setEnabled(True)
+        self.delete_btn.setEnabled(True)
+        self.load_data(self.search_bar.text())
+        QMessageBox.critical(self, "Error", f"Operation failed:\n{error_msg}")
+
+    def selected_records(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        return [self.records[row] for row in rows]
+
+    def export_selected(self):
+        records = self.selected_records()
+        fields = [field_name for field_name, check in self.export_checks.items() if check.isChecked()]
+        if not records or not fields:
+            QMessageBox.warning(self, "Warning", "Select one or more rows and at least one file type first.")
+            return
+        if self.export_zip_check.isChecked():
+            destination, _ = QFileDialog.getSaveFileName(self, "Export to Zip", "mirc_export.zip", "Zip archives (*.zip)")
+        else:
+            # Choosing the folder of an interrupted export resumes it
+            destination = QFileDialog.getExistingDirectory(self, "Export to Folder")
+        if destination:
+            self.start_export(export_items(records, fields), destination, self.export_zip_check.isChecked(),
+                              f"{len(records)} video(s) -> {os.path.basename(destination) or destination}")
+
+    def start_export(self, items, destination, as_zip, description):
+        row = QWidget()
+        row_layout = QHBoxLayout(row)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        label = QLabel(description)
+        progress_bar = QProgressBar()
+        cancel_btn = QPushButton("Cancel")
+        row_layout.addWidget(label)
+        row_layout.addWidget(progress_bar, 1)
+        row_layout.addWidget(cancel_btn)
+        self.exports_layout.addWidget(row)
+
+        thread = ExportThread(items, destination, as_zip)
+
+        def on_progress(done, total):
+            progress_bar.setValue(int(100 * done / total) if total else 100)
+            progress_bar.setFormat(f"%p%  ({done / 1024**2:,.0f} / {total / 1024**2:,.0f} MB)")
+
+        def on_finished(title, message, icon):
+            row.deleteLater()
+            icon(self, title, message)
+
+        def on_cancel():
+            cancel_btn.setEnabled(False)
+            cancel_btn.setText("Cancelling...")
+            thread.cancel()
+
+        thread.progress_update.connect(on_progress)
+        thread.done.connect(lambda summary: on_finished("Export Finished", f"{summary}\n\nSaved to {destination}",
+                                                        QMessageBox.information))
+        thread.cancelled.connect(lambda: on_finished(
+            "Export Cancelled", "Export cancelled. Export to the same destination again to resume.",
+            QMessageBox.information))
+        thread.failed.connect(lambda error: on_finished(
+            "Export Failed", f"Export failed:\n{error}\n\nExport to the same destination again to resume.",
+            QMessageBox.critical))
+        cancel_btn.clicked.connect(on_cancel)
+        # Keep the thread referenced until run() has returned, Qt aborts if a running QThread is collected
+        thread.finished.connect(lambda: self.export_threads.remove(thread))
+        self.export_threads.append(thread)
+        thread.start()
+
     def download_file(self, path):
-        import shutil
-        from PyQt5.QtWidgets import QFileDialog, QMessageBox
-        if not os.path.exists(path):
+        if not path or (not is_remote(path) and not os.path.exists(path)):
             QMessageBox.critical(self, "File Not Found", f"Path does not exist:\n{path}")
             return
-        save_path, _ = QFileDialog.getSaveFileName(self, "Save File", os.path.basename(path))
-        if save_path:
-            try:
-                shutil.copy(path, save_path)
-                QMessageBox.information(self, "Success", f"Saved to {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to save:\n{str(e)}")
-
-
-# Helper function to download files
-def download_file(self, source_path):
-    if not os.path.exists(source_path):
-        QMessageBox.critical(self, "Error", f"File not found:\n{source_path}")
-        return
+        name = os.path.basename(path)
+        save_path, _ = QFileDialog.getSaveFileName(self, "Save File", name)
+        if not save_path or os.path.abspath(save_path) == os.path.abspath(path):
+            return
+        if os.path.exists(save_path):
+            os.remove(save_path)  # the dialog already confirmed the overwrite
+        item = ExportItem(path, os.path.basename(save_path))
+        self.start_export([item], os.path.dirname(save_path), False, name)
 
-    save_path, _ = QFileDialog.getSaveFileName(self, "Save File As", os.path.basename(source_path))
-    if save_path:
-        try:
-            shutil.copy(source_path, save_path)
-            QMessageBox.information(self, "Success", "File downloaded successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to download file:\n{e}")
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -0,0 +1,242 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: ingest_scheduler.py
+# Duration-aware ingest scheduling: probe, order, admit by RAM/CPU budget, and estimate time left from past runs
+
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+from pipeline import process_video, WHISPER_MODELS
+from audio_cache import probe_duration
+from transcription import TRANSCRIPTION_BACKEND
+
+# -------------------- Scheduler Configuration --------------------
+# "shortest" runs short videos first (user priority still wins), "fifo" keeps the order they were added
+SCHEDULE_POLICY = os.environ.get("MIRC_INGEST_POLICY", "shortest")
+# Whisper already uses several cores per job. The openai backend shares one model per process and
+# transcribes one file at a time, so extra workers would only queue on it (and hold their audio in RAM)
+DEFAULT_INGEST_WORKERS = 1 if TRANSCRIPTION_BACKEND == "openai" else max(1, (os.cpu_count() or 1) // 4)
+INGEST_WORKERS = int(os.environ.get("MIRC_INGEST_WORKERS", DEFAULT_INGEST_WORKERS))
+# RAM the concurrent jobs may use; defaults to 80% of what is available when the batch starts
+RAM_BUDGET_BYTES = int(float(os.environ.get("MIRC_INGEST_RAM_BUDGET_GB", "0")) * 1024**3)
+INGEST_HISTORY_PATH = os.environ.get("MIRC_INGEST_HISTORY", "ingest_history.json")
+
+JOB_BASE_RAM = 512 * 1024**2          # decoder, tokenizers, intermediate text
+AUDIO_BYTES_PER_SECOND = 16000 * 4 * 2  # float32 samples at 16 kHz plus Whisper's working copy
+WHISPER_MODEL_RAM = {"tiny": 1, "base": 1, "small": 2, "medium": 5, "large": 10}  # GB, loaded once per process
+
+# Stage boundaries are the progress values process_video emits; the last stage ends when it returns
+STAGES = [("store", 20), ("transcribe", 40), ("translate", 60), ("summarize", 80), ("embed_insert", 100)]
+# Seconds of work per second of video until the history has real numbers
+DEFAULT_STAGE_RATES = {
+    "draft": {"store": 0.002, "transcribe": 0.05, "translate": 0.01, "summarize": 0.005, "embed_insert": 0.01},
+    "final": {"store": 0.002, "transcribe": 0.3, "translate": 0.01, "summarize": 0.05, "embed_insert": 0.01},
+}
+HISTORY_SMOOTHING = 0.3  # weight of the newest run in the moving average
+
+
+def available_memory():
+    """Bytes of RAM available right now, or None if it cannot be measured."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class ThroughputHistory:
+    """Per-tier, per-stage processing rates (seconds per video second), learned from past runs."""
+
+    def __init__(self, path=INGEST_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.rates = {tier: dict(rates) for tier, rates in DEFAULT_STAGE_RATES.items()}
+        try:
+            with open(path) as f:
+                for tier, rates in json.load(f).items():
+                    self.rates.setdefault(tier, {}).update(rates)
+        except (OSError, ValueError):
+            pass
+
+    def estimate(self, tier, duration, stages=None):
+        rates = self.rates.get(tier, DEFAULT_STAGE_RATES["final"])
+        return sum(rates[name] for name, _ in STAGES if stages is None or name in stages) * duration
+
+    def record(self, tier, stage_seconds, duration):
+        if not duration:
+            return
+        with self._lock:
+            rates = self.rates.setdefault(tier, dict(DEFAULT_STAGE_RATES["final"]))
+            for name, seconds in stage_seconds.items():
+                rates[name] = (1 - HISTORY_SMOOTHING) * rates[name] + HISTORY_SMOOTHING * seconds / duration
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.rates, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class IngestJob:
+    def __init__(self, video_path, duration, priority, order):
+        self.video_path = video_path
+        self.duration = duration
+        self.priority = priority   # higher runs earlier
+        self.order = order         # position in the batch, breaks ties
+        self.stage_index = 0       # index into STAGES of the stage currently running
+        self.stage_started = None
+        self.stage_seconds = {}
+        self.guid = None
+        self.duplicate_of = None   # GUID of the indexed lecture when the job was linked or reused
+        self.streamed = False      # indexed window by window (pipeline streaming ingest)
+        self.error = None
+
+
+class IngestScheduler:
+    """Runs a batch of ingests concurrently within a worker and RAM budget.
+
+    Every file is probed with ffprobe when it is added. Jobs are ordered by user priority,
+    then shortest first (or insertion order with policy="fifo"), and a job is only
+    admitted while the estimated RAM of the running jobs stays inside the budget, so one
+    two-hour lecture does not hold up twenty short clips or push the machine into swap.
+    Stage timings of finished jobs are fed back into ThroughputHistory for the ETA.
+    """
+
+    def __init__(self, base_dir, tier="final", policy=SCHEDULE_POLICY, max_workers=INGEST_WORKERS,
+                 ram_budget=RAM_BUDGET_BYTES, history=None, process_fn=process_video):
+        self.base_dir = base_dir
+        self.tier = tier
+        self.policy = policy
+        self.max_workers = max(1, max_workers)
+        self.history = history or ThroughputHistory()
+        self.process_fn = process_fn
+        if not ram_budget:
+            available = available_memory()
+            model_ram = WHISPER_MODEL_RAM.get(WHISPER_MODELS[tier], 2) * 1024**3
+            ram_budget = max(0, int(available * 0.8) - model_ram) if available else None
+        self.ram_budget = ram_budget
+        self.jobs = []
+        self._pending = []
+        self._running = set()
+        self._cond = threading.Condition()
+
+    # -------------------- Jobs --------------------
+    def submit(self, video_path, priority=0):
+        duration = probe_duration(video_path)
+        if duration is None:
+            # Rough guess from the file size (~1 MB per 8 s of lecture video)
+            duration = os.path.getsize(video_path) / (1024**2) * 8
+        job = IngestJob(video_path, duration, priority, len(self.jobs))
+        self.jobs.append(job)
+        key = (-priority, duration if self.policy == "shortest" else 0, job.order)
+        with self._cond:
+            heapq.heappush(self._pending, (key, job.order, job))
+        return job
+
+    def job_ram(self, job):
+        return JOB_BASE_RAM + job.duration * AUDIO_BYTES_PER_SECOND
+
+    def _can_admit(self, job):
+        if not self._running:
+            return True  # a job bigger than the budget still has to run, just on its own
+        if len(self._running) >= self.max_workers:
+            return False
+        if self.ram_budget is None:
+            return True
+        return sum(self.job_ram(j) for j in self._running) + self.job_ram(job) <= self.ram_budget
+
+    # -------------------- Progress and ETA --------------------
+    def _job_remaining(self, job):
+        """Estimated seconds of work left for one job."""
+        if job.guid is not None or job.error is not None:
+            return 0.0
+        remaining_stages = {name for name, _ in STAGES[job.stage_index:]}
+        remaining = self.history.estimate(self.tier, job.duration, remaining_stages)
+        if job.stage_started is not None:
+            remaining -= min(time.time() - job.stage_started,
+                             self.history.estimate(self.tier, job.duration, {STAGES[job.stage_index][0]}))
+        return max(remaining, 0.0)
+
+    def eta(self):
+        """Estimated seconds until the whole batch is done."""
+        with self._cond:
+            remaining = sum(self._job_remaining(job) for job in self.jobs)
+            parallel = max(1, min(self.max_workers, len(self._running) + len(self._pending)))
+        return remaining / parallel
+
+    def progress(self):
+        """Percent of the batch's estimated work that is done."""
+        with self._cond:
+            total = sum(self.history.estimate(self.tier, job.duration) for job in self.jobs)
+            remaining = sum(self._job_remaining(job) for job in self.jobs)
+        return 100 if total <= 0 else int(100 * (1 - remaining / total))
+
+    def _stage_callback(self, job, on_progress):
+        scheduler = self
+
+        class StageCallback:
+            """The pipeline's progress_callback; each emitted value closes a stage."""
+            def emit(self, value):
+                now = time.time()
+                with scheduler._cond:
+                    while job.stage_index < len(STAGES) - 1 and STAGES[job.stage_index][1] <= value:
+                        job.stage_seconds[STAGES[job.stage_index][0]] = now - job.stage_started
+                        job.stage_index += 1
+                        job.stage_started = now
+                if on_progress:
+                    on_progress(scheduler.progress(), scheduler.eta())
+        return StageCallback()
+
+    # -------------------- Execution --------------------
+    def _run_job(self, job, on_started, on_finished, on_failed, on_progress):
+        if on_started:
+            on_started(job)
+        job.stage_started = time.time()
+        try:
+            guid, details = self.process_fn(job.video_path, self.base_dir,
+                                            self._stage_callback(job, on_progress), tier=self.tier,
+                                            return_details=True)
+            with self._cond:
+                job.stage_seconds[STAGES[-1][0]] = time.time() - job.stage_started
+                job.guid = guid
+                job.duplicate_of = details["duplicate_of"]
+                job.streamed = details["streamed"]
+            # Linked or reused copies skip the expensive stages, and streaming ingests transcribe and
+            # translate window by window, so neither has per-stage timings that fit the rates
+            if job.duplicate_of is None and not job.streamed:
+                self.history.record(self.tier, job.stage_seconds, job.duration)
+            if on_finished:
+                on_finished(job)
+        except Exception as e:
+            logging.error(f"Ingest of {job.video_path} failed: {e}")
+            with self._cond:
+                job.error = str(e)
+            if on_failed:
+                on_failed(job)
+        finally:
+            with self._cond:
+                self._running.discard(job)
+                self._cond.notify_all()
+            if on_progress:
+                on_progress(self.progress(), self.eta())
+
+    def run(self, on_started=None, on_finished=None, on_failed=None, on_progress=None):
+        """Process every submitted job, blocking until all are done. Callbacks run on worker threads."""
+        with self._cond:
+            while self._pending or self._running:
+                while self._pending and self._can_admit(self._pending[0][2]):
+                    _, _, job = heapq.heappop(self._pending)
+                    self._running.add(job)
+                    threading.Thread(target=self._run_job, daemon=True,
+                                     args=(job, on_started, on_finished, on_failed, on_progress)).start()
+                self._cond.wait()
@@ -4,7 +4,7 @@
 # File: llm_ranker.py
 # Uses a local LLM to rank query relevance to transcript
 
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer, CrossEncoder, util
 import nltk
 import torch
 nltk.download('punkt')
@@ -34,4 +34,19 @@ class LocalLLMRanker:
             for idx in top_indices
         ]
 
-        return top_results
\ No newline at end of file
+        return top_results
+
+
+class LocalCrossEncoderRanker:
+    """Scores (query, sentence) pairs jointly. Much slower than the bi-encoder, so only run it on a short list."""
+
+    def __init__(self, model_name='cross-encoder/ms-marco-MiniLM-L-6-v2'):
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name)
+
+    def score_sentences(self, query, sentences, batch_size=8):
+        if not sentences:
+            return []
+        logits = self.model.predict([(query, s) for s in sentences], batch_size=batch_size)
+        # Squash the raw logits into 0..1 so they display like the cosine scores
+        return torch.sigmoid(torch.as_tensor(logits, dtype=torch.float32)).tolist()
@@ -0,0 +1,326 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: local_index.py
+# In-process mirror of the Milvus collection for sub-millisecond local search and an offline fallback
+
+import os
+import math
+import time
+import logging
+import threading
+import numpy as np
+from milvus_client import get_milvus, MILVUS_COLLECTION_NAME
+
+# -------------------- Local Index Configuration --------------------
+# "auto" -> NumPy brute force up to BRUTE_FORCE_MAX_ROWS, HNSW graph (hnswlib) above that
+# "numpy" / "hnsw" force one backend, "off" always searches Milvus
+LOCAL_INDEX_MODE = os.environ.get("MIRC_LOCAL_INDEX", "auto")
+BRUTE_FORCE_MAX_ROWS = 200_000
+REFRESH_SECONDS = 15 * 60          # full resync picks up rows written by other ingest nodes
+SYNC_BATCH_SIZE = 1000
+
+VECTOR_FIELDS = ["embedding", "title_embedding", "transcript_embedding"]
+# Scalar fields kept as NumPy columns so filters are evaluated without a Python loop
+SCALAR_COLUMNS = {"language": object, "quality": object, "duration": np.float32, "ingested_at": np.int64,
+                  "file_size": np.int64}
+METADATA_FIELDS = ["guid", "title", "video_path", "transcript_path", "translation_path", "summary_path", "quality",
+                   "language", "duration", "ingested_at", "file_size"]
+
+
+def l2_to_similarity(distance):
+    """Same normalization Milvus' WeightedRanker applies to L2 distances."""
+    return 1.0 - 2.0 * np.arctan(distance) / math.pi
+
+
+def filter_mask(columns, filters):
+    """Evaluate the filter dict accepted by query_backend.build_filter_expr over the scalar columns."""
+    mask = np.ones(len(columns["language"]), dtype=bool)
+    language = filters.get("language")
+    if isinstance(language, (list, tuple, set)):
+        mask &= np.isin(columns["language"], list(language))
+    elif language:
+        mask &= columns["language"] == language
+    if filters.get("quality"):
+        mask &= columns["quality"] == filters["quality"]
+    ranges = [
+        ("min_duration", "duration", np.greater_equal), ("max_duration", "duration", np.less_equal),
+        ("ingested_after", "ingested_at", np.greater_equal), ("ingested_before", "ingested_at", np.less_equal),
+        ("min_file_size", "file_size", np.greater_equal), ("max_file_size", "file_size", np.less_equal),
+    ]
+    for key, field_name, op in ranges:
+        if filters.get(key) is not None:
+            mask &= op(columns[field_name], filters[key])
+    return mask
+
+
+class _HnswField:
+    """hnswlib graph for one vector field (only used for large corpora)."""
+
+    def __init__(self, dim, capacity):
+        import hnswlib
+        self.index = hnswlib.Index(space="l2", dim=dim)
+        self.index.init_index(max_elements=max(capacity, 1024), ef_construction=200, M=16, allow_replace_deleted=True)
+        self.index.set_ef(128)
+
+    def add(self, vectors, ids):
+        needed = self.index.get_current_count() + len(ids)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(needed * 2)
+        self.index.add_items(vectors, ids, replace_deleted=True)
+
+    def delete(self, position):
+        self.index.mark_deleted(position)
+
+    def search(self, vector, k):
+        k = min(k, self.index.get_current_count())
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        labels, distances = self.index.knn_query(vector, k=k)
+        return labels[0].astype(np.int64), distances[0]
+
+
+class LocalVectorIndex:
+    """All rows of the collection held in RAM.
+
+    Vectors live in growable float32 matrices (one per vector field); deleted rows are
+    masked out and compacted on the next rebuild. Searches reproduce Milvus' hybrid
+    search: top_k per field, L2 distances normalized the way WeightedRanker does it,
+    then a weighted sum.
+    """
+
+    def __init__(self, mode=LOCAL_INDEX_MODE):
+        self.mode = mode
+        self.ready = False
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # the periodic resync and notify_resync never build at once
+        # Changes notified while build_from_collection runs, replayed onto the fresh copy before the swap
+        self._changes = None
+        self._reset(capacity=1024)
+
+    def _reset(self, capacity):
+        self.rows = []
+        self.positions = {}   # guid -> row position
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.vectors = {f: np.zeros((capacity, 384), dtype=np.float32) for f in VECTOR_FIELDS}
+        self.sq_norms = {f: np.zeros(capacity, dtype=np.float32) for f in VECTOR_FIELDS}
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in SCALAR_COLUMNS.items()}
+        self.graphs = None
+
+    def backend(self):
+        if self.mode == "hnsw" or (self.mode == "auto" and len(self.positions) > BRUTE_FORCE_MAX_ROWS):
+            try:
+                import hnswlib  # noqa: F401
+                return "hnsw"
+            except ImportError:
+                logging.warning("hnswlib is not installed, local index stays on NumPy brute force")
+        return "numpy"
+
+    # -------------------- Sync --------------------
+    def _record(self, change):
+        if self._changes is not None:
+            self._changes.append(change)
+
+    def build_from_collection(self):
+        """Load every row (vectors included) from Milvus and swap it in atomically.
+
+        Upserts and deletes notified while the rows stream in are applied to the live copy as
+        usual and also recorded; the query iterator may have read those rows before they changed,
+        so the recorded changes are replayed onto the fresh copy before it replaces the live one.
+        """
+        with self._build_lock:
+            self._build_from_collection()
+
+    def _build_from_collection(self):
+        started = time.perf_counter()
+        fresh = LocalVectorIndex(self.mode)
+        with self._lock:
+            self._changes = []
+
+        def load(collection):
+            iterator = collection.query_iterator(batch_size=SYNC_BATCH_SIZE, expr="",
+                                                 output_fields=METADATA_FIELDS + VECTOR_FIELDS)
+            try:
+                while True:
+                    batch = iterator.next()
+                    if not batch:
+                        break
+                    fresh.upsert_many(batch, rebuild_graph=False)
+            finally:
+                iterator.close()
+        try:
+            get_milvus().run(MILVUS_COLLECTION_NAME, load, load=True)
+            fresh._build_graphs()
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+
+        with self._lock:
+            for kind, payload in self._changes:
+                if kind == "upsert":
+                    fresh.upsert_many(payload)
+                elif kind == "delete":
+                    fresh.delete(payload)
+                else:
+                    fresh.clear()
+            self._changes = None
+            self.rows, self.positions, self.alive = fresh.rows, fresh.positions, fresh.alive
+            self.vectors, self.sq_norms, self.graphs = fresh.vectors, fresh.sq_norms, fresh.graphs
+            self.columns = fresh.columns
+            self.ready = True
+        logging.info(f"Local index built with {len(self.positions)} rows ({self.backend()}) "
+                     f"in {time.perf_counter() - started:.1f}s")
+
+    def _build_graphs(self):
+        if self.backend() != "hnsw":
+            self.graphs = None
+            return
+        n = len(self.rows)
+        live = np.flatnonzero(self.alive[:n])
+        self.graphs = {}
+        for f in VECTOR_FIELDS:
+            graph = _HnswField(self.vectors[f].shape[1], n * 2)
+            if len(live):
+                graph.add(self.vectors[f][live], live)
+            self.graphs[f] = graph
+
+    def _grow(self, needed):
+        capacity = len(self.alive)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        self.alive = np.concatenate([self.alive, np.zeros(new_capacity - capacity, dtype=bool)])
+        for f in VECTOR_FIELDS:
+            grown = np.zeros((new_capacity, self.vectors[f].shape[1]), dtype=np.float32)
+            grown[:capacity] = self.vectors[f]
+            self.vectors[f] = grown
+            self.sq_norms[f] = np.concatenate([self.sq_norms[f], np.zeros(new_capacity - capacity, dtype=np.float32)])
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate([column, np.zeros(new_capacity - capacity, dtype=column.dtype)])
+
+    def upsert_many(self, rows, rebuild_graph=True):
+        with self._lock:
+            self._record(("upsert", list(rows)))
+            self._grow(len(self.rows) + len(rows))
+            for row in rows:
+                old = self.positions.get(row["guid"])
+                if old is not None:
+                    self.alive[old] = False
+                    if self.graphs:
+                        for graph in self.graphs.values():
+                            graph.delete(old)
+                position = len(self.rows)
+                self.rows.append({f: row.get(f) for f in METADATA_FIELDS})
+                self.positions[row["guid"]] = position
+                self.alive[position] = True
+                for name in SCALAR_COLUMNS:
+                    self.columns[name][position] = row.get(name)
+                for f in VECTOR_FIELDS:
+                    self.vectors[f][position] = np.asarray(row[f], dtype=np.float32)
+                    self.sq_norms[f][position] = self.vectors[f][position] @ self.vectors[f][position]
+                if self.graphs and rebuild_graph:
+                    for f, graph in self.graphs.items():
+                        graph.add(self.vectors[f][position:position + 1], np.array([position]))
+
+    def upsert(self, row):
+        self.upsert_many([row])
+
+    def clear(self):
+        with self._lock:
+            self._record(("clear", None))
+            self._reset(capacity=1024)
+
+    def delete(self, guid):
+        with self._lock:
+            self._record(("delete", guid))
+            position = self.positions.pop(guid, None)
+            if position is None:
+                return
+            self.alive[position] = False
+            if self.graphs:
+                for graph in self.graphs.values():
+                    graph.delete(position)
+
+    # -------------------- Search --------------------
+    def _field_topk(self, field_name, vector, k, candidates):
+        """(positions, squared L2 distances) of the k nearest live rows for one field."""
+        if self.graphs and candidates is None:
+            return self.graphs[field_name].search(vector, k)
+        n = len(self.rows)
+        ids = np.flatnonzero(self.alive[:n]) if candidates is None else candidates
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        # Squared L2 like Milvus' L2 metric, as |x|^2 + |q|^2 - 2 x.q so it is one matrix-vector product
+        if candidates is None:
+            distances = self.sq_norms[field_name][:n] - 2.0 * (self.vectors[field_name][:n] @ vector)
+            distances = distances[ids]
+        else:
+            distances = self.sq_norms[field_name][ids] - 2.0 * (self.vectors[field_name][ids] @ vector)
+        distances = np.maximum(distances + vector @ vector, 0.0)
+        k = min(k, len(ids))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return ids[top], distances[top]
+
+    def search(self, vector, top_k, field_weights, filters=None):
+        """Weighted multi-field search; returns [(row, fused_score)] best first."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            candidates = None
+            if filters:
+                n = len(self.rows)
+                columns = {name: column[:n] for name, column in self.columns.items()}
+                candidates = np.flatnonzero(self.alive[:n] & filter_mask(columns, filters))
+            fused = {}
+            for field_name, weight in field_weights.items():
+                positions, distances = self._field_topk(field_name, vector, top_k, candidates)
+                for position, similarity in zip(positions.tolist(), l2_to_similarity(distances).tolist()):
+                    fused[position] = fused.get(position, 0.0) + weight * similarity
+            best = sorted(fused.items(), key=lambda x: x[1], reverse=True)[:top_k]
+            return [(self.rows[position], score) for position, score in best]
+
+    def __len__(self):
+        return len(self.positions)
+
+
+# -------------------- Process-wide mirror --------------------
+_local_index = None
+_local_index_lock = threading.Lock()
+
+def _sync_loop(index):
+    while True:
+        try:
+            index.build_from_collection()
+        except Exception as e:
+            logging.warning(f"Local index sync failed, searches use Milvus until the next attempt: {e}")
+        time.sleep(REFRESH_SECONDS)
+
+def get_local_index():
+    """The mirror, or None when disabled. The first call starts building it in the background."""
+    global _local_index
+    if LOCAL_INDEX_MODE == "off":
+        return None
+    with _local_index_lock:
+        if _local_index is None:
+            _local_index = LocalVectorIndex()
+            threading.Thread(target=_sync_loop, args=(_local_index,), daemon=True).start()
+        return _local_index
+
+def notify_upsert(row):
+    """Called by the pipeline after a Milvus insert/upsert so the mirror stays in sync."""
+    if _local_index is not None:
+        _local_index.upsert(row)
+
+def notify_delete(guid):
+    if _local_index is not None:
+        _local_index.delete(guid)
+
+def notify_clear():
+    if _local_index is not None:
+        _local_index.clear()
+
+def notify_resync():
+    """Rows were written without passing through this process (bulk insert): rebuild the mirror now."""
+    if _local_index is not None:
+        threading.Thread(target=_local_index.build_from_collection, daemon=True).start()
@@ -0,0 +1,276 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: maintenance.py
+# Delete / re-process videos by GUID, sweep orphaned artifacts and compact Milvus after large deletes
+
+import os
+import re
+import time
+import logging
+import threading
+from pipeline import (
+    run_on_collection, fetch_row, reprocess_video, artifact_dirs, _ingest_activity, read_ingest_manifest,
+    discard_upgrade
+)
+from local_index import notify_delete
+from audio_fingerprint import get_fingerprint_index
+from artifact_store import is_remote, split_ref, delete_artifact, remote_store, S3_SCHEME
+
+# -------------------- Maintenance Configuration --------------------
+SWEEP_INTERVAL_SECONDS = 60 * 60       # one consistency pass per hour
+ORPHAN_GRACE_SECONDS = 6 * 60 * 60     # never touch files younger than this, a long ingest may still own them
+COMPACT_AFTER_DELETES = 100            # trigger Milvus compaction once this many rows were deleted
+QUERY_BATCH_SIZE = 500
+
+GUID_RE = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})")
+
+_deletes_since_compaction = 0
+_compaction_lock = threading.Lock()
+
+
+def artifact_paths(row):
+    """Every file (local path or s3:// reference) that belongs to a row.
+
+    The video is only included when it is our own copy, named after the GUID: in the
+    videos/ folder locally, or the videos/<guid> object for published rows (the upload of a
+    "reference" mode original is keyed by GUID too). In "reference" storage mode the local
+    video is the user's original file and must not be deleted.
+    """
+    if is_remote(row["transcript_path"]):
+        bucket, _ = split_ref(row["transcript_path"])
+        paths = [row["transcript_path"], row["translation_path"], row["summary_path"],
+                 f"{S3_SCHEME}{bucket}/embeddings/{row['guid']}_embedding_vector.txt"]
+        # Rows published before videos were keyed by GUID may share an object named after the original file
+        if is_remote(row["video_path"]) and os.path.basename(split_ref(row["video_path"])[1]).startswith(row["guid"]):
+            paths.append(row["video_path"])
+        return paths
+    base_dir = os.path.dirname(os.path.dirname(row["transcript_path"]))
+    dirs = artifact_dirs(base_dir)
+    paths = [
+        row["transcript_path"],
+        row["translation_path"],
+        row["summary_path"],
+        os.path.join(dirs['embeddings'], f"{row['guid']}_embedding_vector.txt"),
+    ]
+    video_path = row["video_path"]
+    if os.path.dirname(os.path.abspath(video_path)) == os.path.abspath(dirs['video']) \
+            and os.path.basename(video_path).startswith(row["guid"]):
+        paths.append(video_path)
+    return paths
+
+
+def remove_files(paths):
+    removed = 0
+    for path in paths:
+        try:
+            delete_artifact(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"Could not remove {path}: {e}")
+    return removed
+
+
+def compact_collection(wait=False):
+    """Merge segments and purge deleted rows."""
+    global _deletes_since_compaction
+    with _compaction_lock:
+        _deletes_since_compaction = 0
+    print("Compacting Milvus collection...")
+    def compact(collection):
+        collection.compact()
+        if wait:
+            collection.wait_for_compaction_completed()
+    run_on_collection(compact)
+    logging.info("Milvus compaction triggered")
+
+
+def _record_deletes(count):
+    global _deletes_since_compaction
+    with _compaction_lock:
+        _deletes_since_compaction += count
+        due = _deletes_since_compaction >= COMPACT_AFTER_DELETES
+    if due:
+        compact_collection()
+
+
+def delete_video(guid):
+    """Remove a video's Milvus row together with all of its artifacts. Returns False if the GUID is unknown."""
+    row = fetch_row(guid)
+    if row is None:
+        logging.warning(f"Delete requested for unknown GUID {guid}")
+        return False
+    run_on_collection(lambda collection: (collection.delete(f'guid == "{guid}"'), collection.flush()))
+    notify_delete(guid)
+    discard_upgrade(guid)  # a running upgrade or re-process checks for the row before its upsert
+    get_fingerprint_index().remove(guid)
+    removed = remove_files(artifact_paths(row))
+    logging.info(f"Deleted GUID {guid} and {removed} artifact files")
+    print(f"Deleted GUID {guid} ({removed} files removed)")
+    _record_deletes(1)
+    return True
+
+
+def delete_videos(guids):
+    deleted = 0
+    for guid in guids:
+        if delete_video(guid):
+            deleted += 1
+    return deleted
+
+
+def reprocess_videos(guids, tier="final"):
+    for guid in guids:
+        reprocess_video(guid, tier)
+
+
+def check_consistency(base_save_dir):
+    """One report-only sweep (see ConsistencySweeper)."""
+    return ConsistencySweeper(base_save_dir).sweep(delete_orphans=False)
+
+
+# -------------------- Consistency sweeper --------------------
+class ConsistencySweeper(threading.Thread):
+    """Periodically reconciles files under base_save_dir with the rows in Milvus.
+
+    Orphans are files of GUIDs that the ingest manifest records as started but never
+    stored (failed or killed ingests), plus stale .part/.tmp files, once they are older
+    than the grace period. Files of GUIDs the manifest does not know (an archive from
+    older collections) or that were stored (possibly in the other embedding mode's
+    collection) are never orphans. Sweeps only report orphans unless delete_orphans=True;
+    rows whose files are missing are always only reported.
+    """
+
+    def __init__(self, base_save_dir, interval=SWEEP_INTERVAL_SECONDS, grace=ORPHAN_GRACE_SECONDS,
+                 delete_orphans=False):
+        super().__init__(daemon=True)
+        self.base_save_dir = base_save_dir
+        self.interval = interval
+        self.grace = grace
+        self.delete_orphans = delete_orphans
+        self.stop_event = threading.Event()
+        self.last_report = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.last_report = self.sweep(self.delete_orphans)
+            except Exception as e:
+                logging.error(f"Consistency sweep failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _scan(self):
+        """Map GUID -> files, plus unfinished temporary files."""
+        files_by_guid, temp_files = {}, []
+        for d in artifact_dirs(self.base_save_dir).values():
+            if not os.path.isdir(d):
+                continue
+            for entry in os.scandir(d):
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith((".part", ".tmp")):
+                    temp_files.append(entry.path)
+                    continue
+                match = GUID_RE.match(entry.name)
+                if match:
+                    files_by_guid.setdefault(match.group(1), []).append(entry.path)
+        return files_by_guid, temp_files
+
+    def _all_rows(self):
+        """Every row in the collection, streamed in batches."""
+        def collect(collection):
+            rows = {}
+            iterator = collection.query_iterator(
+                batch_size=QUERY_BATCH_SIZE, expr="",
+                output_fields=["guid", "video_path", "transcript_path", "translation_path", "summary_path"]
+            )
+            try:
+                while True:
+                    batch = iterator.next()
+                    if not batch:
+                        break
+                    for row in batch:
+                        rows[row["guid"]] = row
+            finally:
+                iterator.close()
+            return rows
+        return run_on_collection(collect, load=True)
+
+    def _old_enough(self, path, now):
+        try:
+            return now - os.path.getmtime(path) > self.grace
+        except FileNotFoundError:
+            return False
+
+    def sweep(self, delete_orphans=False):
+        """Check files against rows. Orphans are listed in the report and only deleted with delete_orphans=True."""
+        now = time.time()
+        files_by_guid, temp_files = self._scan()
+        rows = self._all_rows()
+        manifest = read_ingest_manifest(self.base_save_dir)
+        in_flight = _ingest_activity.in_flight()
+
+        orphans = []
+        for guid, paths in files_by_guid.items():
+            if guid in rows or guid in in_flight or manifest.get(guid) in (None, "stored"):
+                continue
+            orphans.extend(p for p in paths if self._old_enough(p, now))
+        orphans.extend(
+            p for p in temp_files
+            if self._old_enough(p, now) and not any(os.path.basename(p).startswith(g) for g in in_flight)
+        )
+        orphan_bytes = sum(os.path.getsize(p) for p in orphans if os.path.exists(p))
+        removed = remove_files(orphans) if delete_orphans else 0
+
+        # Remote artifacts are checked against one bucket listing per bucket
+        remote_refs = {}
+        def exists(path):
+            if not is_remote(path):
+                return os.path.exists(path)
+            bucket, _ = split_ref(path)
+            if bucket not in remote_refs:
+                remote_refs[bucket] = remote_store().list_refs(bucket)
+            return path in remote_refs[bucket]
+
+        missing = {}
+        for guid, row in rows.items():
+            lost = [p for p in artifact_paths(row) if not exists(p)]
+            if lost:
+                missing[guid] = lost
+                logging.warning(f"GUID {guid} is missing artifacts: {lost}")
+
+        report = {
+            "checked_rows": len(rows),
+            "checked_guids_on_disk": len(files_by_guid),
+            "orphans": orphans,
+            "orphan_bytes": orphan_bytes,
+            "orphans_removed": removed,
+            "rows_missing_files": missing,
+        }
+        logging.info(f"Consistency sweep: {len(orphans)} orphaned files ({orphan_bytes} bytes), {removed} removed, "
+                     f"{len(missing)} rows with missing files")
+
+        # Segment clean-up after a batch of deletes
+        with _compaction_lock:
+            due = _deletes_since_compaction >= COMPACT_AFTER_DELETES
+        if due:
+            compact_collection()
+        return report
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+def start_sweeper(base_save_dir, delete_orphans=False):
+    """Background hourly sweeps. Not started by the GUI, which runs report-only checks on request."""
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = ConsistencySweeper(base_save_dir, delete_orphans=delete_orphans)
+            _sweeper.start()
+        return _sweeper
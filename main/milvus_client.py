@@ -0,0 +1,172 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: milvus_client.py
+# Single shared Milvus connection manager: lazy connect, alias pool, health checks, retry with backoff
+
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from pymilvus import Collection, connections, utility
+from pymilvus.exceptions import MilvusException
+
+# -------------------- Milvus Configuration --------------------
+MILVUS_HOST = os.environ.get("MILVUS_HOST", "127.0.0.1")
+MILVUS_PORT = os.environ.get("MILVUS_PORT", "19530")
+MILVUS_ALIAS = os.environ.get("MILVUS_ALIAS", "default")
+MILVUS_POOL_SIZE = int(os.environ.get("MILVUS_POOL_SIZE", "4"))
+# "english": BGE over the English translation. "multilingual": a multilingual model over the
+# source-language transcript, no translation on the ingest path. Vectors from the two models do
+# not mix, so each mode has its own collection.
+EMBEDDING_MODE = os.environ.get("MIRC_EMBEDDING_MODE", "english")
+MILVUS_COLLECTION_NAME = "video_embeddings_v11" if EMBEDDING_MODE == "english" else "video_embeddings_v11_multilingual"
+
+CONNECT_TIMEOUT = 10      # seconds per connection attempt
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5        # seconds, doubled after every failed attempt
+BACKOFF_MAX = 8.0
+
+
+class MilvusConnectionManager:
+    """Pool of Milvus connection aliases shared by the ingest, query and browser code.
+
+    Nothing connects until the first call. Each alias is its own gRPC channel, so
+    concurrent ingest and query threads each borrow one instead of queueing on a
+    single channel. When a call fails the server is health-checked; if it is down
+    the alias is reconnected and the call retried with exponential backoff.
+    """
+
+    def __init__(self, host=MILVUS_HOST, port=MILVUS_PORT, alias=MILVUS_ALIAS, pool_size=MILVUS_POOL_SIZE):
+        self.host = host
+        self.port = port
+        # The first alias keeps the plain name so code that uses "default" keeps working
+        self.aliases = [alias] + [f"{alias}_{i}" for i in range(1, max(pool_size, 1))]
+        self._pool = queue.Queue()
+        for a in self.aliases:
+            self._pool.put(a)
+        self._lock = threading.Lock()
+        self._connected = set()
+        self._loaded = set()
+
+    # -------------------- Connections --------------------
+    # An alias is only ever used by the thread that borrowed it from the pool, so the lock
+    # guards the shared sets and is never held while a connect blocks on the network
+    def _connect(self, alias):
+        with self._lock:
+            if alias in self._connected:
+                return
+        connections.connect(alias, host=self.host, port=self.port, timeout=CONNECT_TIMEOUT)
+        with self._lock:
+            self._connected.add(alias)
+        logging.info(f"Connected to Milvus at {self.host}:{self.port} as '{alias}'")
+
+    def _reset(self, alias):
+        try:
+            connections.disconnect(alias)
+        except Exception as e:
+            logging.warning(f"Disconnect of Milvus alias '{alias}' failed: {e}")
+        with self._lock:
+            self._connected.discard(alias)
+            # A restarted server may have released collections, so re-issue load() next time
+            self._loaded.clear()
+
+    def _backoff(self, attempt):
+        return min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+
+    def _connect_with_retry(self, alias):
+        """Connect an alias, retrying a refused or timed-out connect with exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                self._connect(alias)
+                return
+            except (MilvusException, ConnectionError) as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"Connecting to Milvus as '{alias}' failed ({e}), retrying in {delay:.1f}s")
+                self._reset(alias)
+                attempt += 1
+            time.sleep(delay)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connected alias from the pool."""
+        alias = self._pool.get()
+        try:
+            self._connect_with_retry(alias)
+            yield alias
+        finally:
+            self._pool.put(alias)
+
+    def health_check(self, alias=None):
+        """Return True if the Milvus server answers on the given (or any pooled) alias."""
+        try:
+            if alias is None:
+                with self.connection() as a:
+                    utility.get_server_version(using=a)
+            else:
+                self._connect(alias)
+                utility.get_server_version(using=alias)
+            return True
+        except Exception as e:
+            logging.warning(f"Milvus health check failed: {e}")
+            return False
+
+    # -------------------- Collections --------------------
+    def ensure_loaded(self, collection):
+        """Load a collection once per process instead of once per module."""
+        with self._lock:
+            if collection.name in self._loaded:
+                return
+        collection.load()
+        with self._lock:
+            self._loaded.add(collection.name)
+
+    def invalidate(self, collection_name):
+        """Forget the cached load state, e.g. after a drop or a new index."""
+        with self._lock:
+            self._loaded.discard(collection_name)
+
+    def run(self, collection_name, fn, load=False, schema=None):
+        """Call fn(collection) on a pooled connection, retrying while the server is unavailable.
+
+        Pass `schema` to create the collection if it does not exist yet, and
+        `load=True` for searches/queries that need it loaded into memory.
+        """
+        attempt = 0
+        while True:
+            alias = self._pool.get()
+            try:
+                # Connecting is part of the retried block, so a refused connect backs off like a failed call
+                self._connect(alias)
+                collection = Collection(collection_name, schema=schema, using=alias)
+                if load:
+                    self.ensure_loaded(collection)
+                return fn(collection)
+            except (MilvusException, ConnectionError) as e:
+                # Errors from a healthy server (bad expr, schema mismatch ...) are not retried
+                if attempt >= MAX_RETRIES or self.health_check(alias):
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"Milvus call on '{collection_name}' failed ({e}), retrying in {delay:.1f}s")
+                self._reset(alias)
+                attempt += 1
+            finally:
+                self._pool.put(alias)
+            time.sleep(delay)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_milvus():
+    """Process-wide connection manager, created on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = MilvusConnectionManager()
+        return _manager
@@ -4,17 +4,30 @@
 # This file contains the backend logic for Part A (transcription, translation, summarization, embedding)
 
 import os
-import shutil
+import re
+import json
+import time
 import uuid
-import torch
+import queue
 import logging
-import shutil
-from datetime import datetime
-from transformers import pipeline, AutoTokenizer, AutoModel
-import whisper
+import threading
+import numpy as np
+from contextlib import contextmanager
 from deep_translator import GoogleTranslator
 from langdetect import detect
-from pymilvus import Collection, connections, FieldSchema, CollectionSchema, DataType
+from pymilvus import FieldSchema, CollectionSchema, DataType
+from milvus_client import get_milvus, MILVUS_COLLECTION_NAME, EMBEDDING_MODE
+from video_storage import store_video
+from audio_cache import get_audio_cache, SAMPLE_RATE
+from embedding_service import get_embedding_service
+from local_index import notify_upsert, notify_delete, notify_clear
+from artifact_store import (
+    get_artifact_store, publish_row, store_for, is_remote, fetch_local, read_artifact_text, write_artifact_text,
+    artifact_exists
+)
+from summarization import summarize_text, split_into_sentences
+from transcription import get_backend
+from audio_fingerprint import get_fingerprint_index, DUPLICATE_POLICY
 
 # -------------------- Setup logging --------------------
 logging.basicConfig(
@@ -24,14 +37,12 @@ logging.basicConfig(
 )
 
 # -------------------- Milvus Configuration --------------------
-MILVUS_COLLECTION_NAME = "video_embeddings_v8"
-# connections.connect("default", host="localhost", port="19530")
-connections.connect("default", host="127.0.0.1", port="19530")
+# Connection settings and pooling live in milvus_client.py
+milvus = get_milvus()
 
-def clear_database():
-    """Drop and recreate the Milvus collection to clear all data."""
-    collection = Collection(MILVUS_COLLECTION_NAME)
-    collection.drop()
+PARTITION_COUNT = 16  # hash buckets for the language partition key
+
+def build_schema():
     fields = [
         FieldSchema(name="guid", dtype=DataType.VARCHAR, max_length=36, is_primary=True, auto_id=False),
         FieldSchema(name="title", dtype=DataType.VARCHAR, max_length=500),  # New title field
@@ -39,66 +50,93 @@ def clear_database():
         FieldSchema(name="transcript_path", dtype=DataType.VARCHAR, max_length=500),
         FieldSchema(name="translation_path", dtype=DataType.VARCHAR, max_length=500),
         FieldSchema(name="summary_path", dtype=DataType.VARCHAR, max_length=500),
-        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=384)
+        FieldSchema(name="quality", dtype=DataType.VARCHAR, max_length=16),  # "draft" or "final"
+        # Scalar metadata for filtered search; language is the partition key so language filters only touch matching partitions
+        FieldSchema(name="language", dtype=DataType.VARCHAR, max_length=16, is_partition_key=True),
+        FieldSchema(name="duration", dtype=DataType.FLOAT),  # seconds
+        FieldSchema(name="ingested_at", dtype=DataType.INT64),  # unix timestamp
+        FieldSchema(name="file_size", dtype=DataType.INT64),  # bytes
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=384),  # summary embedding
+        FieldSchema(name="title_embedding", dtype=DataType.FLOAT_VECTOR, dim=384),
+        FieldSchema(name="transcript_embedding", dtype=DataType.FLOAT_VECTOR, dim=384)  # mean of chunk embeddings
     ]
-    schema = CollectionSchema(fields)
-    collection = Collection(name=MILVUS_COLLECTION_NAME, schema=schema)
-    logging.info("Milvus database cleared and recreated with new schema.")
+    return CollectionSchema(fields, num_partitions=PARTITION_COUNT)
+
+# Every vector field needs an index before the collection can be loaded
+VECTOR_FIELDS = ["embedding", "title_embedding", "transcript_embedding"]
 
-# New fields
-fields = [
-    FieldSchema(name="guid", dtype=DataType.VARCHAR, max_length=36, is_primary=True, auto_id=False),
-    FieldSchema(name="title", dtype=DataType.VARCHAR, max_length=500),  # New title field
-    FieldSchema(name="video_path", dtype=DataType.VARCHAR, max_length=500),
-    FieldSchema(name="transcript_path", dtype=DataType.VARCHAR, max_length=500),
-    FieldSchema(name="translation_path", dtype=DataType.VARCHAR, max_length=500),
-    FieldSchema(name="summary_path", dtype=DataType.VARCHAR, max_length=500),
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=384)
-]
-schema = CollectionSchema(fields)
-collection = Collection(name=MILVUS_COLLECTION_NAME, schema=schema)
+def clear_database():
+    """Drop and recreate the Milvus collection to clear all data."""
+    global _index_checked
+    milvus.run(MILVUS_COLLECTION_NAME, lambda collection: collection.drop())
+    milvus.invalidate(MILVUS_COLLECTION_NAME)
+    _index_checked = False
+    notify_clear()
+    get_fingerprint_index().clear()
+    run_on_collection(lambda collection: None)
+    logging.info("Milvus database cleared and recreated with new schema.")
 
 # -------------------- Ensure Index Exists --------------------
 def ensure_index(collection):
-    """Ensure the embedding field has an index, create one if missing."""
-    has_index = False
+    """Ensure every vector field has an index, create the missing ones."""
+    indexed_fields = set()
     try:
-        indexes = collection.indexes
-        if indexes:  # If there's already an index
-            has_index = True
+        indexed_fields = {index.field_name for index in collection.indexes}
     except Exception as e:
         logging.warning(f"Index check failed: {e}")
 
-    if not has_index:
-        print(f"🔧 Creating index on 'embedding' field for collection '{collection.name}'...")
+    for field_name in VECTOR_FIELDS:
+        if field_name in indexed_fields:
+            continue
+        print(f"🔧 Creating index on '{field_name}' field for collection '{collection.name}'...")
         collection.create_index(
-            field_name="embedding",
+            field_name=field_name,
             index_params={
                 "metric_type": "L2",   # or "COSINE" if you want semantic similarity
                 "index_type": "IVF_FLAT",
                 "params": {"nlist": 128}
             }
         )
+        milvus.invalidate(collection.name)
         print("✅ Index created.")
 
-# Ensure index right after collection initialization
-ensure_index(collection)
+_index_checked = False
+
+def run_on_collection(fn, load=False):
+    """Run fn(collection) on the video collection, creating it and its index on first use."""
+    def wrapped(collection):
+        global _index_checked
+        if not _index_checked:
+            ensure_index(collection)
+            _index_checked = True
+        return fn(collection)
+    return milvus.run(MILVUS_COLLECTION_NAME, wrapped, load=load, schema=build_schema())
 
 # -------------------- Step 1: Transcribe video using Whisper --------------------
-def transcribe_video(video_path):
-    print("Loading Whisper model...")
-    model = whisper.load_model("base") # Use "medium" for better accuracy, can be changed to "base" or "large" as needed
+# Whisper model per ingest tier: "draft" is for fast indexing, "final" is what the upgrade worker re-runs with
+WHISPER_MODELS = {
+    "draft": "tiny",
+    "final": os.environ.get("MIRC_WHISPER_MODEL", "base")  # Use "medium" for better accuracy, can be changed to "base" or "large" as needed
+}
+
+def transcribe_video(video_path, audio_cache=None, model_size=None, backend=None):
+    # Audio is decoded once into the audio cache; re-transcriptions read the cached samples
+    audio_cache = audio_cache or get_audio_cache()
+    audio = audio_cache.get_audio(video_path)
     print("Transcribing the video...")
-    result = model.transcribe(video_path)
+    result = get_backend(backend).transcribe(audio, model_size or WHISPER_MODELS["final"])
     transcript = result['text']
     return transcript
 
 # -------------------- Step 2: Translate transcript to English if needed --------------------
-def translate_to_english(text):
+def detect_language(text):
     try:
-        lang = detect(text)
+        return detect(text)
     except:
-        lang = 'unknown'
+        return 'unknown'
+
+def translate_to_english(text, lang=None):
+    lang = lang or detect_language(text)
     if lang != 'en':
         logging.info(f"Translating from {lang} to English.")
         return GoogleTranslator(source=lang, target='en').translate(text) # changed source from 'auto' to lang
@@ -106,134 +144,658 @@ def translate_to_english(text):
         return text
 
 # -------------------- Step 3: Summarize translated transcript --------------------
-from transformers import pipeline
-def summarize_text(text):
-    cleaned_text = clean_transcription(text)
-    summarizer = pipeline("summarization", model="sshleifer/distilbart-cnn-6-6")
-    summarized = summarizer(cleaned_text, max_length=500, min_length=250, do_sample=False)
-    return summarized[0]['summary_text']
-
-import re
-def clean_transcription(text):
-    # Remove timestamps (e.g., [00:01:23]) and common filler words
-    text = re.sub(r'\[\d{2}:\d{2}:\d{2}\]', '', text)
-    text = re.sub(r'\b(um|uh|like|you know)\b', '', text, flags=re.IGNORECASE)
-    return text.strip()
-
-# Using Summa for extractive summarization rather than abstractive summarization
-# Abstractive summarization just finds important sentences, less exhaustive
-# abstractive summarization is more complex and requires more resources, generates a summary in its own words
-# In addition, it has no strict length limit, so it can generate longer summaries
-# from summa import summarizer
-# def summarize_text(text):
-#     cleaned_text = clean_transcription(text)
-#     return summarizer.summarize(cleaned_text, ratio=0.25) # Summarize to 25% of original length
+# Engines live in summarization.py (abstractive DistilBART, extractive TextRank, or "auto" by length).
+# Draft-tier ingests always take the extractive fast path; None means the configured SUMMARY_ENGINE.
+SUMMARY_ENGINES = {"draft": "extractive", "final": None}
 
 # -------------------- Step 4: Generate embedding using BGE --------------------
-class BGEEmbedder:
-    def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained("BAAI/bge-small-en")
-        self.model = AutoModel.from_pretrained("BAAI/bge-small-en")
+# Embeddings come from the shared batched service (embedding_service.py), also used by query_backend.py
 
-    def get_embedding(self, text):
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-        with torch.no_grad():
-            model_output = self.model(**inputs)
-        embedding = model_output.last_hidden_state[:, 0, :].squeeze().numpy()
-        return embedding.tolist()
+# Transcript windows embedded separately and mean-pooled into one vector per video
+TRANSCRIPT_CHUNK_SENTENCES = 10
 
-# -------------------- Step 5: Full processing pipeline --------------------
+def title_to_text(title):
+    """Turn an original filename into something an embedder can read."""
+    stem = os.path.splitext(title)[0]
+    return re.sub(r'[_\-.]+', ' ', stem).strip() or stem
 
-def split_into_sentences(text):
-    import re
-    # Split on period, exclamation, or question mark followed by space or end of string
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    return [s for s in sentences if s]
+def transcript_chunks(sentences, chunk_size=TRANSCRIPT_CHUNK_SENTENCES):
+    chunks = [" ".join(sentences[i:i + chunk_size]) for i in range(0, len(sentences), chunk_size)]
+    return chunks or [""]
 
-def process_video(video_path, base_save_dir, progress_callback=None):
-    # generate a unique GUID for this video processing
-    guid = str(uuid.uuid4())
-    logging.info(f"Processing started for video: {video_path} with GUID: {guid}")
+def mean_pool(vectors):
+    pooled = vectors.mean(axis=0)
+    norm = np.linalg.norm(pooled)
+    if norm > 0:
+        pooled = pooled / norm
+    return pooled
 
-    print(f"Processing video: {video_path} with GUID: {guid}")
-    # Prepare separate directories
-    dirs = {
+# -------------------- Step 5: Full processing pipeline --------------------
+
+def artifact_dirs(base_save_dir):
+    return {
         'video': os.path.join(base_save_dir, 'videos'),
         'transcripts': os.path.join(base_save_dir, 'transcripts'),
         'translations': os.path.join(base_save_dir, 'translations'),
         'summaries': os.path.join(base_save_dir, 'summaries'),
         'embeddings': os.path.join(base_save_dir, 'embeddings')
     }
+
+# Files a row points at; with MIRC_ARTIFACT_STORE=s3 they are published to MinIO once generated
+TEXT_ARTIFACT_FIELDS = ["transcript_path", "translation_path", "summary_path"]
+# Working folder for re-processing rows whose artifacts live in object storage
+WORK_DIR = os.environ.get("MIRC_WORK_DIR", os.path.abspath("processed_videos"))
+
+def publish_artifacts(row, dirs, move_video=False, store=None):
+    """Publish a finished row's files (and its embedding file) and point the row at them."""
+    store = store or get_artifact_store()
+    publish_row(row, TEXT_ARTIFACT_FIELDS + ["video_path"], move_video=move_video, store=store)
+    store.publish(os.path.join(dirs['embeddings'], f"{row['guid']}_embedding_vector.txt"))
+    return row
+
+# Every GUID process_video creates under a base_save_dir, with whether its row was stored. The
+# consistency sweeper only ever treats files of GUIDs recorded here without a "stored" entry as
+# orphans, so rows of older collections and of the other embedding mode are never touched.
+INGEST_MANIFEST_FILE = "ingest_manifest.jsonl"
+_manifest_lock = threading.Lock()
+
+def record_ingest(base_save_dir, guid, status):
+    entry = {"guid": guid, "status": status, "collection": MILVUS_COLLECTION_NAME, "at": int(time.time())}
+    with _manifest_lock:
+        with open(os.path.join(base_save_dir, INGEST_MANIFEST_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+def read_ingest_manifest(base_save_dir):
+    """GUID -> last recorded status ("started", "stored" or "failed")."""
+    statuses = {}
+    try:
+        with open(os.path.join(base_save_dir, INGEST_MANIFEST_FILE), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                statuses[entry["guid"]] = entry["status"]
+    except FileNotFoundError:
+        pass
+    return statuses
+
+def write_text(path, text):
+    # Write-then-rename so readers (reranker, downloads) never see a half-written upgrade
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# -------------------- Near-duplicate detection --------------------
+def find_duplicate(video_path, policy=DUPLICATE_POLICY):
+    """The already indexed lecture this file is a re-encoded/trimmed copy of (audio_fingerprint.py), or None."""
+    if policy == "off":
+        return None
+    try:
+        return get_fingerprint_index().find_duplicate(video_path)
+    except Exception as e:
+        logging.warning(f"Duplicate check failed for {video_path}, processing it normally: {e}")
+        return None
+
+def add_fingerprint(guid, read_path):
+    try:
+        get_fingerprint_index().add(guid, get_audio_cache().get_pcm16(read_path))
+    except Exception as e:
+        logging.warning(f"Could not fingerprint GUID {guid}: {e}")
+
+def _reuse_artifacts(guid, original_title, duplicate, dirs):
+    """Build a row for a near-duplicate from the existing lecture's artifacts instead of recomputing them.
+
+    Text files are copied under the new GUID, so deleting either video leaves the other intact.
+    Only the title embedding is recomputed. Returns None if the source row cannot be reused.
+    """
+    source = fetch_row(duplicate.guid, vectors=True)
+    if source is None or source["quality"] == "partial":
+        return None  # still being transcribed, its text is incomplete
+    row = {
+        "guid": guid,
+        "title": original_title,
+        "quality": source["quality"],
+        "language": source["language"],
+        "duration": float(duplicate.copy_duration or source["duration"]),
+        "embedding": list(source["embedding"]),
+        "title_embedding": get_embedding_service().embed(title_to_text(original_title)).tolist(),
+        "transcript_embedding": list(source["transcript_embedding"]),
+    }
+    for field_name, folder, suffix in [("transcript_path", "transcripts", "_transcript.txt"),
+                                       ("translation_path", "translations", "_translated_transcript.txt"),
+                                       ("summary_path", "summaries", "_summary.txt")]:
+        row[field_name] = os.path.join(dirs[folder], f"{guid}{suffix}")
+        if artifact_exists(source[field_name]):
+            write_text(row[field_name], read_artifact_text(source[field_name]))
+        elif field_name == "translation_path" and EMBEDDING_MODE == "multilingual" and row["language"] != "en":
+            # The source's translation is still queued; the copy gets its own
+            get_translation_worker().enqueue(row["transcript_path"], get_artifact_store().ref_for(row[field_name]),
+                                             row["language"])
+    write_text(os.path.join(dirs['embeddings'], f"{guid}_embedding_vector.txt"),
+               ",".join([str(x) for x in row["embedding"]]))
+    logging.info(f"Reused the artifacts of GUID {duplicate.guid} for GUID {guid}")
+    return row
+
+def process_video(video_path, base_save_dir, progress_callback=None, storage_mode=None, tier="final",
+                  summary_engine=None, streaming=None, duplicate_policy=None, return_details=False):
+    """Ingest one video and return its GUID.
+
+    tier="draft" indexes the video quickly (tiny Whisper model, extractive summary) and queues
+    a background upgrade that re-runs it at final quality under the same GUID.
+    summary_engine overrides the summarizer for final-tier jobs ("abstractive", "extractive" or "auto").
+    Videos longer than STREAMING_MIN_SECONDS are indexed window by window as "partial" rows while
+    they are still being transcribed (streaming=False turns that off).
+    duplicate_policy overrides MIRC_DUPLICATE_POLICY for re-encoded or trimmed copies of a lecture
+    that is already indexed: "link" returns the existing GUID, "reuse" copies its artifacts, "off".
+    With return_details=True the result is (guid, details): details["duplicate_of"] is the GUID
+    of the indexed lecture when the link or reuse path ran (None otherwise) and details["streamed"]
+    tells whether the windowed path ran. Callers timing ingest stages leave both kinds of job out,
+    their progress values do not mark the usual stage boundaries.
+    """
+    if tier not in WHISPER_MODELS:
+        raise ValueError(f"Unknown ingest tier '{tier}', expected one of {list(WHISPER_MODELS)}")
+
+    # A short audio sample is enough to recognise a copy of an indexed lecture
+    duplicate_policy = duplicate_policy or DUPLICATE_POLICY
+    duplicate = find_duplicate(video_path, duplicate_policy)
+    if duplicate is not None and duplicate_policy == "link":
+        get_fingerprint_index().link(video_path, duplicate)
+        print(f"{video_path} is a copy of GUID {duplicate.guid}, linked instead of processed")
+        if progress_callback: progress_callback.emit(100)
+        if return_details:
+            return duplicate.guid, {"duplicate_of": duplicate.guid, "streamed": False}
+        return duplicate.guid
+
+    # generate a unique GUID for this video processing
+    guid = str(uuid.uuid4())
+    logging.info(f"Processing started for video: {video_path} with GUID: {guid} (tier: {tier})")
+
+    print(f"Processing video: {video_path} with GUID: {guid}")
+    # Prepare separate directories
+    dirs = artifact_dirs(base_save_dir)
     for d in dirs.values():
         os.makedirs(d, exist_ok=True)
+    record_ingest(base_save_dir, guid, "started")
 
-    # Step 0: Save renamed video
-    print(f"Step 0: Renaming video to {guid}.mp4")
+    # Step 0: Save renamed video (hardlink/reflink/reference/background copy, see video_storage.py)
+    print(f"Step 0: Storing video as {guid}.mp4")
     original_title = os.path.basename(video_path)  # Capture original video title
-    new_video_path = os.path.join(dirs['video'], f"{guid}.mp4")
-    shutil.copyfile(video_path, new_video_path)
+    stored_video = store_video(video_path, os.path.join(dirs['video'], f"{guid}.mp4"), storage_mode)
+    new_video_path = stored_video.path
     if progress_callback: progress_callback.emit(20)
 
+    print(f"New video path: {new_video_path} (mode: {stored_video.mode})")
+    logging.info(f"Video stored at {new_video_path} using mode '{stored_video.mode}'")
+
+    ingested_at = int(time.time())
+    file_size = os.path.getsize(video_path)
+    partial_written = False
+
+    def upsert_partial(partial):
+        # Partial rows point at the readable original; the final row switches to the stored copy
+        nonlocal partial_written
+        partial.update(video_path=stored_video.read_path, ingested_at=ingested_at, file_size=file_size)
+        publish_row(partial, TEXT_ARTIFACT_FIELDS)
+        run_on_collection(lambda collection: (collection.upsert([partial]), collection.flush()))
+        notify_upsert(partial)
+        partial_written = True
+        logging.info(f"Upserted partial row for GUID {guid}")
+
+    # Tracked as in flight until the row exists, so the upgrade worker waits and the sweeper keeps its files
+    with _ingest_activity.track(guid):
+        try:
+            row = _reuse_artifacts(guid, original_title, duplicate, dirs) if duplicate is not None else None
+            reused = row is not None
+            # Decided once reuse has been tried: a copy whose artifacts could not be reused is a regular ingest
+            if reused:
+                streaming = False
+            elif streaming is None:
+                streaming = 0 < STREAMING_MIN_SECONDS < get_audio_cache().duration(stored_video.read_path)
+            if reused:
+                if progress_callback: progress_callback.emit(80)
+            elif streaming:
+                row = _generate_artifacts_streaming(guid, original_title, stored_video.read_path, dirs, tier,
+                                                    upsert_partial, progress_callback, summary_engine)
+            else:
+                row = _generate_artifacts(guid, original_title, stored_video.read_path, dirs, tier, progress_callback,
+                                          summary_engine)
+
+            # Background copies must be complete before the row points at them
+            stored_video.wait()
+        except BaseException:
+            stored_video.cancel()
+            record_ingest(base_save_dir, guid, "failed")
+            if partial_written:
+                run_on_collection(lambda collection: (collection.delete(f'guid == "{guid}"'), collection.flush()))
+                notify_delete(guid)
+            raise
+
+        # Step 5: Store all paths in Milvus (replaces the partial row of a streaming ingest)
+        print(f"Step 5: Storing GUID {guid} in Milvus")
+        row["video_path"] = stored_video.path
+        row["ingested_at"] = ingested_at
+        row["file_size"] = file_size
+        # With the S3 store our copy of the video becomes its cache entry; a referenced original stays put
+        publish_artifacts(row, dirs, move_video=stored_video.mode != "reference")
+        if partial_written:
+            run_on_collection(lambda collection: (collection.upsert([row]), collection.flush()))
+        else:
+            run_on_collection(lambda collection: (collection.insert([row]), collection.flush()))
+        notify_upsert(row)
+        record_ingest(base_save_dir, guid, "stored")
+        logging.info(f"Stored GUID {guid} in Milvus with all file paths.")
+        if not reused and duplicate_policy != "off":
+            add_fingerprint(guid, stored_video.read_path)
 
-    print(f"New video path: {new_video_path}")
-    print(f"File exists: {os.path.exists(new_video_path)}")
-    logging.info(f"Video saved at {new_video_path}")
+    logging.info(f"Processing completed for GUID: {guid}")
+    print(f"Processing completed for GUID: {guid}")
+
+    # Ensure index exists after new inserts
+    run_on_collection(ensure_index)
 
+    if tier == "draft" or row["quality"] == "draft":
+        get_upgrade_worker().enqueue(guid)
+
+    if return_details:
+        return guid, {"duplicate_of": duplicate.guid if reused else None, "streamed": streaming}
+    return guid
+
+def _generate_artifacts(guid, original_title, read_path, dirs, tier, progress_callback=None, summary_engine=None):
+    """Steps 1-4: write transcript, translation, summary and embedding files, return the Milvus row (minus video_path)."""
     # Step 1: Transcription
-    print(f"Step 1: Transcribing video {new_video_path}")
-    transcript = transcribe_video(new_video_path)
+    print(f"Step 1: Transcribing video {read_path}")
+    transcript = transcribe_video(read_path, model_size=WHISPER_MODELS[tier])
     transcript_sentences = split_into_sentences(transcript)
     transcript_path = os.path.join(dirs['transcripts'], f"{guid}_transcript.txt")
-    with open(transcript_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(transcript_sentences))
+    write_text(transcript_path, "\n".join(transcript_sentences))
     if progress_callback: progress_callback.emit(40)
 
     # Step 2: Translation
-    print(f"Step 2: Translating transcript for GUID {guid}")
-    translated = translate_to_english(transcript)
-    translation_sentences = split_into_sentences(translated)
+    language = detect_language(transcript)
     translation_path = os.path.join(dirs['translations'], f"{guid}_translated_transcript.txt")
-    with open(translation_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(translation_sentences))
+    if EMBEDDING_MODE == "multilingual" and language != "en":
+        # The source-language transcript is summarized and embedded directly; the English
+        # translation is an enrichment written later by the translation worker
+        print(f"Step 2: Queued translation for GUID {guid} (multilingual mode)")
+        get_translation_worker().enqueue(transcript_path, get_artifact_store().ref_for(translation_path), language)
+        index_text, index_sentences = transcript, transcript_sentences
+        summary_engine = "extractive"  # DistilBART only summarizes English
+    else:
+        print(f"Step 2: Translating transcript for GUID {guid}")
+        translated = translate_to_english(transcript, language)
+        index_sentences = split_into_sentences(translated)
+        write_text(translation_path, "\n".join(index_sentences))
+        index_text = translated
+        summary_engine = SUMMARY_ENGINES[tier] or summary_engine
     if progress_callback: progress_callback.emit(60)
 
     # Step 3: 
-    print(f"Step 3: Summarizing translated transcript for GUID {guid}")
-    summary = summarize_text(translated)
+    print(f"Step 3: Summarizing transcript for GUID {guid}")
+    summary = summarize_text(index_text, engine=summary_engine)
     summary_path = os.path.join(dirs['summaries'], f"{guid}_summary.txt")
-    with open(summary_path, "w", encoding="utf-8") as f:
-        f.write(summary)
+    write_text(summary_path, summary)
     if progress_callback: progress_callback.emit(80)
 
     # Step 4: Embedding
-    print(f"Step 4: Generating embedding for summary for GUID {guid}")
-    embedder = BGEEmbedder()
-    embedding = embedder.get_embedding(summary)
+    print(f"Step 4: Generating summary, title and transcript-chunk embeddings for GUID {guid}")
+    # Summary, title and every transcript chunk go through one length-bucketed batch call
+    chunks = transcript_chunks(index_sentences)
+    vectors = get_embedding_service().embed_many([summary, title_to_text(original_title)] + chunks)
+    embedding = vectors[0].tolist()
+    title_embedding = vectors[1].tolist()
+    transcript_embedding = mean_pool(vectors[2:]).tolist()
     embedding_path = os.path.join(dirs['embeddings'], f"{guid}_embedding_vector.txt")
-    with open(embedding_path, "w", encoding="utf-8") as f:
-        f.write(",".join([str(x) for x in embedding]))
-
-    # Step 5: Store all paths in Milvus
-    print(f"Step 5: Storing GUID {guid} in Milvus")
-    collection.insert([
-        [guid],
-        [original_title],  # Store the original title
-        [new_video_path],
-        [transcript_path],
-        [translation_path],
-        [summary_path],
-        [embedding]
-    ])
-    collection.flush()
-    logging.info(f"Stored GUID {guid} in Milvus with all file paths.")
+    write_text(embedding_path, ",".join([str(x) for x in embedding]))
+
+    return {
+        "guid": guid,
+        "title": original_title,  # Store the original title
+        "transcript_path": transcript_path,
+        "translation_path": translation_path,
+        "summary_path": summary_path,
+        "quality": tier,
+        "language": language,
+        "duration": float(get_audio_cache().duration(read_path)),
+        "embedding": embedding,
+        "title_embedding": title_embedding,
+        "transcript_embedding": transcript_embedding
+    }
 
-    logging.info(f"Processing completed for GUID: {guid}")
-    print(f"Processing completed for GUID: {guid}")
+# -------------------- Streaming ingest for long videos --------------------
+# Long videos are transcribed in windows; after each window the text so far is translated,
+# embedded and upserted as a "partial" row, so a lecture is searchable minutes after its ingest starts
+STREAMING_MIN_SECONDS = int(os.environ.get("MIRC_STREAMING_MIN_SECONDS", 20 * 60))  # 0 disables streaming
+STREAMING_WINDOW_SECONDS = 300
+PARTIAL_SUMMARY = "(Summary pending: this video is still being transcribed.)"
 
-    # Ensure index exists after new inserts
-    ensure_index(collection)
+def _generate_artifacts_streaming(guid, original_title, read_path, dirs, tier, on_partial, progress_callback=None,
+                                  summary_engine=None):
+    """Windowed version of _generate_artifacts; calls on_partial(row) after every window."""
+    transcript_path = os.path.join(dirs['transcripts'], f"{guid}_transcript.txt")
+    translation_path = os.path.join(dirs['translations'], f"{guid}_translated_transcript.txt")
+    summary_path = os.path.join(dirs['summaries'], f"{guid}_summary.txt")
+    write_text(summary_path, PARTIAL_SUMMARY)
+
+    pcm16 = get_audio_cache().get_pcm16(read_path)  # memory-mapped, only one window is converted at a time
+    duration = len(pcm16) / SAMPLE_RATE
+    backend = get_backend()
+    embedder = get_embedding_service()
+    title_embedding = embedder.embed(title_to_text(original_title))
+
+    transcript_sentences, index_sentences, chunk_vectors = [], [], []
+    language, whisper_language, translate_later = None, None, False
+    window = STREAMING_WINDOW_SECONDS * SAMPLE_RATE
+    for start in range(0, len(pcm16), window):
+        print(f"Step 1: Transcribing {start // SAMPLE_RATE}s-{min(start + window, len(pcm16)) // SAMPLE_RATE}s "
+              f"of {read_path}")
+        audio = pcm16[start:start + window].astype(np.float32) / 32768.0
+        # The end of the previous window keeps Whisper's spelling and style consistent across the cut
+        prompt = " ".join(transcript_sentences[-3:]) or None
+        result = backend.transcribe(audio, WHISPER_MODELS[tier], initial_prompt=prompt, language=whisper_language)
+        whisper_language = whisper_language or result.get("language")
+        window_sentences = split_into_sentences(result["text"])
+        if not window_sentences:
+            continue
+        transcript_sentences.extend(window_sentences)
+        write_text(transcript_path, "\n".join(transcript_sentences))
+
+        # Step 2: Translation, one window at a time
+        if language is None:
+            language = detect_language(" ".join(window_sentences))
+            translate_later = EMBEDDING_MODE == "multilingual" and language != "en"
+        if translate_later:
+            window_index_sentences = window_sentences
+        else:
+            window_index_sentences = split_into_sentences(translate_to_english(" ".join(window_sentences), language))
+        index_sentences.extend(window_index_sentences)
+        if not translate_later:
+            write_text(translation_path, "\n".join(index_sentences))
+
+        # Step 4 for this window: chunk vectors are kept, the final row pools all of them
+        chunk_vectors.extend(embedder.embed_many(transcript_chunks(window_index_sentences)))
+        pooled = mean_pool(np.asarray(chunk_vectors)).tolist()
+        on_partial({
+            "guid": guid,
+            "title": original_title,
+            "transcript_path": transcript_path,
+            "translation_path": translation_path,
+            "summary_path": summary_path,
+            "quality": "partial",
+            "language": language,
+            "duration": float(duration),
+            "embedding": pooled,  # stands in for the summary embedding until the summary exists
+            "title_embedding": title_embedding.tolist(),
+            "transcript_embedding": pooled
+        })
+        # Windows interleave transcription and translation, so progress moves through both bands
+        if progress_callback: progress_callback.emit(20 + int(39 * min(start + window, len(pcm16)) / len(pcm16)))
+
+    if progress_callback: progress_callback.emit(60)
 
+    language = language or "unknown"
+    if translate_later:
+        get_translation_worker().enqueue(transcript_path, get_artifact_store().ref_for(translation_path), language)
+        summary_engine = "extractive"  # DistilBART only summarizes English
+    else:
+        if not index_sentences:
+            write_text(translation_path, "")
+        summary_engine = SUMMARY_ENGINES[tier] or summary_engine
+    if not transcript_sentences:
+        write_text(transcript_path, "")
+
+    # Step 3: Summary of the whole transcript replaces the partial state
+    print(f"Step 3: Summarizing transcript for GUID {guid}")
+    summary = summarize_text(" ".join(index_sentences), engine=summary_engine)
+    write_text(summary_path, summary)
+    if progress_callback: progress_callback.emit(80)
+
+    print(f"Step 4: Generating summary embedding for GUID {guid}")
+    embedding = embedder.embed(summary).tolist()
+    if not chunk_vectors:
+        chunk_vectors = embedder.embed_many(transcript_chunks([]))
+    embedding_path = os.path.join(dirs['embeddings'], f"{guid}_embedding_vector.txt")
+    write_text(embedding_path, ",".join([str(x) for x in embedding]))
+
+    return {
+        "guid": guid,
+        "title": original_title,
+        "transcript_path": transcript_path,
+        "translation_path": translation_path,
+        "summary_path": summary_path,
+        "quality": tier,
+        "language": language,
+        "duration": float(duration),
+        "embedding": embedding,
+        "title_embedding": title_embedding.tolist(),
+        "transcript_embedding": mean_pool(np.asarray(chunk_vectors)).tolist()
+    }
+
+# -------------------- Background quality upgrade for draft rows --------------------
+class _IngestActivity:
+    """Tracks GUIDs of foreground ingests that have not reached Milvus yet.
+
+    The upgrade worker only runs when this is empty, and the consistency sweeper
+    never treats files of an in-flight GUID as orphans.
+    """
+
+    def __init__(self):
+        self._guids = set()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def track(self, guid):
+        with self._cond:
+            self._guids.add(guid)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._guids.discard(guid)
+                self._cond.notify_all()
+
+    def in_flight(self):
+        with self._cond:
+            return set(self._guids)
+
+    def wait_idle(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._guids)
+
+_ingest_activity = _IngestActivity()
+
+def fetch_row(guid, vectors=False):
+    output_fields = ["guid", "title", "video_path", "transcript_path", "translation_path", "summary_path", "quality",
+                     "ingested_at", "file_size"]
+    if vectors:
+        output_fields += ["language", "duration"] + VECTOR_FIELDS
+    rows = run_on_collection(lambda collection: collection.query(
+        expr=f'guid == "{guid}"',
+        output_fields=output_fields
+    ), load=True)
+    return rows[0] if rows else None
+
+def reprocess_video(guid, tier="final", row=None, summary_engine=None):
+    """Regenerate every artifact of an existing row from its stored video and upsert it under the same GUID.
+
+    Returns the GUID, or None when the row was deleted before the new artifacts were ready.
+    """
+    row = row or fetch_row(guid)
+    if row is None:
+        raise ValueError(f"GUID {guid} not found in Milvus")
+    print(f"Re-processing GUID {guid} at {tier} quality")
+    remote = is_remote(row["transcript_path"])
+    dirs = artifact_dirs(WORK_DIR if remote else os.path.dirname(os.path.dirname(row["transcript_path"])))
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+    updated = _generate_artifacts(guid, row["title"], fetch_local(row["video_path"]), dirs, tier,
+                                  summary_engine=summary_engine)
+    # The video may have been deleted while it was being transcribed; upserting would bring it back
+    if fetch_row(guid) is None:
+        for path in [updated["transcript_path"], updated["translation_path"], updated["summary_path"],
+                     os.path.join(dirs['embeddings'], f"{guid}_embedding_vector.txt")]:
+            if os.path.exists(path):
+                os.remove(path)
+        logging.info(f"Re-processing of GUID {guid} dropped, the video was deleted meanwhile")
+        return None
+    updated["video_path"] = row["video_path"]
+    updated["ingested_at"] = row["ingested_at"]
+    updated["file_size"] = row["file_size"]
+    publish_artifacts(updated, dirs, store=store_for(row["transcript_path"]))
+    run_on_collection(lambda collection: (collection.upsert([updated]), collection.flush()))
+    notify_upsert(updated)
+    logging.info(f"Re-processed GUID {guid} at {tier} quality")
     return guid
 
+def upgrade_video(guid):
+    """Re-run a draft row at final quality and upsert it under the same GUID."""
+    row = fetch_row(guid)
+    if row is None:
+        logging.warning(f"Upgrade skipped, GUID {guid} no longer exists")
+        return
+    if row["quality"] == "final":
+        return
+    reprocess_video(guid, "final", row)
+
+class QualityUpgradeWorker(threading.Thread):
+    """Low-priority queue that upgrades draft rows while no foreground ingest is running."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.queue = queue.Queue()
+        self._queued = set()
+        self._discarded = set()
+        self._lock = threading.Lock()
+
+    def enqueue(self, guid):
+        with self._lock:
+            self._discarded.discard(guid)
+            if guid in self._queued:
+                return
+            self._queued.add(guid)
+        self.queue.put(guid)
+
+    def discard(self, guid):
+        """Drop a queued GUID (its video was deleted); it is skipped when it reaches the front."""
+        with self._lock:
+            if guid in self._queued:
+                self._discarded.add(guid)
+
+    def enqueue_pending(self):
+        """Pick up drafts, and partial rows of interrupted streaming ingests, left over from a previous session."""
+        rows = run_on_collection(lambda collection: collection.query(
+            expr='quality in ["draft", "partial"]', output_fields=["guid"], limit=16384
+        ), load=True)
+        for row in rows:
+            self.enqueue(row["guid"])
+
+    def run(self):
+        try:
+            self.enqueue_pending()
+        except Exception as e:
+            logging.warning(f"Could not look up pending drafts: {e}")
+        while True:
+            guid = self.queue.get()
+            _ingest_activity.wait_idle()
+            with self._lock:
+                if guid in self._discarded:
+                    self._discarded.discard(guid)
+                    self._queued.discard(guid)
+                    continue
+            try:
+                upgrade_video(guid)
+            except Exception as e:
+                logging.error(f"Quality upgrade failed for GUID {guid}: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(guid)
+
+_upgrade_worker = None
+_upgrade_worker_lock = threading.Lock()
+
+def get_upgrade_worker():
+    global _upgrade_worker
+    with _upgrade_worker_lock:
+        if _upgrade_worker is None:
+            _upgrade_worker = QualityUpgradeWorker()
+            _upgrade_worker.start()
+        return _upgrade_worker
+
+def discard_upgrade(guid):
+    """Take a deleted GUID out of the upgrade queue, without starting the worker just for that."""
+    with _upgrade_worker_lock:
+        worker = _upgrade_worker
+    if worker is not None:
+        worker.discard(guid)
+
+# -------------------- Asynchronous translation (multilingual mode) --------------------
+TRANSLATION_RETRY_SECONDS = 300
+TRANSLATION_MAX_ATTEMPTS = 5
+
+class TranslationWorker(threading.Thread):
+    """Writes English translations of source-language transcripts off the ingest path.
+
+    Search does not depend on them in multilingual mode, so a slow or failing translation
+    service only delays the translation files; failed jobs are retried a few times.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.queue = queue.Queue()
+
+    def enqueue(self, transcript_path, translation_path, language, attempt=0):
+        """Paths or s3:// references (artifact_store.py); the translation is written to translation_path."""
+        self.queue.put((transcript_path, translation_path, language, attempt))
+
+    def enqueue_pending(self):
+        """Pick up translations still missing from a previous session."""
+        rows = run_on_collection(lambda collection: collection.query(
+            expr='language != "en"', output_fields=["transcript_path", "translation_path", "language"], limit=16384
+        ), load=True)
+        for row in rows:
+            if not artifact_exists(row["translation_path"]) and artifact_exists(row["transcript_path"]):
+                self.enqueue(row["transcript_path"], row["translation_path"], row["language"])
+
+    def _retry_later(self, job):
+        transcript_path, translation_path, language, attempt = job
+        if attempt + 1 >= TRANSLATION_MAX_ATTEMPTS:
+            logging.error(f"Giving up on translating {transcript_path}")
+            return
+        timer = threading.Timer(TRANSLATION_RETRY_SECONDS, self.enqueue,
+                                args=(transcript_path, translation_path, language, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
+    def run(self):
+        try:
+            self.enqueue_pending()
+        except Exception as e:
+            logging.warning(f"Could not look up pending translations: {e}")
+        while True:
+            job = self.queue.get()
+            transcript_path, translation_path, language, _ = job
+            try:
+                transcript = read_artifact_text(transcript_path).replace("\n", " ")
+                translated = translate_to_english(transcript, language)
+                write_artifact_text(translation_path, "\n".join(split_into_sentences(translated)), write_text)
+                logging.info(f"Translated {transcript_path} from {language}")
+            except FileNotFoundError:
+                pass  # the video was deleted meanwhile
+            except Exception as e:
+                logging.warning(f"Translation of {transcript_path} failed: {e}")
+                self._retry_later(job)
+
+_translation_worker = None
+_translation_worker_lock = threading.Lock()
+
+def get_translation_worker():
+    global _translation_worker
+    with _translation_worker_lock:
+        if _translation_worker is None:
+            _translation_worker = TranslationWorker()
+            _translation_worker.start()
+        return _translation_worker
+
 # Example usage:
-# process_video("sample.mp4", "processed")
\ No newline at end of file
+# process_video("sample.mp4", "processed")
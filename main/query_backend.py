@@ -4,66 +4,169 @@
 # File: query_backend.py
 # Backend logic for Part B: Accept user query, embed, search Milvus, return results
 
-from pymilvus import connections, Collection
-from transformers import AutoTokenizer, AutoModel
-import torch
-import numpy as np
 import os
+from pymilvus import AnnSearchRequest, WeightedRanker
+from milvus_client import get_milvus, MILVUS_COLLECTION_NAME
+from embedding_service import get_embedding_service
+from local_index import get_local_index
 
-# Connect to Milvus
-# connections.connect("default", host="localhost", port="19530")
-connections.connect("default", host="127.0.0.1", port="19530")
-collection = Collection("video_embeddings_v8")
-collection.load()
-
-# Load BGE embedding model
-class BGEQueryEmbedder:
-    def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained("BAAI/bge-small-en")
-        self.model = AutoModel.from_pretrained("BAAI/bge-small-en", trust_remote_code=True, from_tf=False)
-
-    def embed(self, query):
-        inputs = self.tokenizer(query, return_tensors="pt", truncation=True, padding=True)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        embedding = outputs.last_hidden_state[:, 0, :].squeeze().numpy()
-
-        # Normalize for cosine
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        
-        return embedding.astype(np.float32).tolist()
-
-embedder = BGEQueryEmbedder()
-
-def search_similar(query, top_k=10):
-    vector = embedder.embed(query)
+# Milvus connection is shared and opened lazily on the first search (see milvus_client.py)
+milvus = get_milvus()
+
+# BGE embedding model, shared with the ingest pipeline (normalized CLS embeddings)
+embedder = get_embedding_service()
+
+# In-RAM mirror of the collection (local_index.py), built in the background; None when MIRC_LOCAL_INDEX=off
+local_index = get_local_index()
+
+# Weight of each vector field in the fused score (Milvus WeightedRanker)
+SEARCH_FIELD_WEIGHTS = {
+    "embedding": 0.5,             # summary
+    "title_embedding": 0.2,       # original filename
+    "transcript_embedding": 0.3   # pooled transcript chunks
+}
+
+# -------------------- Adaptive candidate depth --------------------
+# Easy queries have a clear winner and a steep drop in fused score, hard ones a flat tail of
+# near-ties; the candidate list handed to the reranker is sized from that shape. Off by default
+# until benchmarks on the real archive show it keeps recall
+ADAPTIVE_RETRIEVAL = os.environ.get("MIRC_ADAPTIVE_RETRIEVAL", "0") == "1"
+ADAPTIVE_MIN_CANDIDATES = 3
+ADAPTIVE_MAX_CANDIDATES = int(os.environ.get("MIRC_ADAPTIVE_MAX_CANDIDATES", "50"))
+ADAPTIVE_SCORE_MARGIN = float(os.environ.get("MIRC_ADAPTIVE_MARGIN", "0.08"))  # keep hits this close to the best
+ADAPTIVE_SCORE_GAP = float(os.environ.get("MIRC_ADAPTIVE_GAP", "0.03"))        # a drop this large ends the list
+
+OUTPUT_FIELDS = ["guid", "title", "video_path", "transcript_path", "translation_path", "summary_path", "quality",
+                 "language", "duration", "ingested_at", "file_size"]
+
+def _quote(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def build_filter_expr(filters):
+    """Turn a filter dict into a Milvus boolean expression.
+
+    Supported keys: language (code or list of codes), quality, min_duration / max_duration
+    (seconds), ingested_after / ingested_before (unix timestamps), min_file_size / max_file_size (bytes).
+    Language filters let Milvus skip every partition that cannot match.
+    """
+    if not filters:
+        return ""
+    clauses = []
+    language = filters.get("language")
+    if isinstance(language, (list, tuple, set)):
+        clauses.append(f"language in [{', '.join(_quote(l) for l in language)}]")
+    elif language:
+        clauses.append(f"language == {_quote(language)}")
+    if filters.get("quality"):
+        clauses.append(f"quality == {_quote(filters['quality'])}")
+    ranges = [
+        ("min_duration", "duration", ">="), ("max_duration", "duration", "<="),
+        ("ingested_after", "ingested_at", ">="), ("ingested_before", "ingested_at", "<="),
+        ("min_file_size", "file_size", ">="), ("max_file_size", "file_size", "<="),
+    ]
+    for key, field_name, op in ranges:
+        if filters.get(key) is not None:
+            value = filters[key]
+            clauses.append(f"{field_name} {op} {int(value) if field_name != 'duration' else float(value)}")
+    return " and ".join(clauses)
+
+def _result(item, score):
+    return {
+        "guid": item.get("guid"),
+        "title": item.get("title"),
+        "video_path": item.get("video_path"),
+        "transcript_path": item.get("transcript_path"),
+        "translation_path": item.get("translation_path"),
+        "summary_path": item.get("summary_path"),
+        "quality": item.get("quality"),  # "draft" until the background upgrade has run
+        "language": item.get("language"),
+        "duration": item.get("duration"),
+        "ingested_at": item.get("ingested_at"),
+        "file_size": item.get("file_size"),
+        "vector_score": score  # fused similarity, higher is better
+    }
+
+def _search_milvus(vector, top_k, field_weights, expr, collection_name=MILVUS_COLLECTION_NAME):
     search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
 
-    print("Performing search with query:", query)
-    results = collection.search(
-        data=[vector],
-        anns_field="embedding",
-        param=search_params,
+    # Milvus runs the per-field sub-searches in parallel and fuses them server-side
+    requests = [
+        AnnSearchRequest(data=[vector.tolist()], anns_field=field_name, param=search_params, limit=top_k,
+                         expr=expr or None)
+        for field_name in field_weights
+    ]
+    ranker = WeightedRanker(*field_weights.values())
+    results = milvus.run(collection_name, lambda collection: collection.hybrid_search(
+        requests,
+        ranker,
         limit=top_k,
-        output_fields=["guid", "title", "video_path", "transcript_path", "translation_path", "summary_path"]
-    )
-
-    output = []
-    for hit in results[0]:
-        item = hit.entity
-        output.append({
-            "guid": item["guid"],
-            "title": item["title"],
-            "video_path": item["video_path"],
-            "transcript_path": item["transcript_path"],
-            "translation_path": item["translation_path"],
-            "summary_path": item["summary_path"],
-            "L2_score": hit.distance
-        })
-    
+        output_fields=OUTPUT_FIELDS
+    ), load=True)
+    return [_result(hit.entity, hit.distance) for hit in results[0]]
+
+def _search(vector, top_k, field_weights, filters, expr):
+    """Fused hits for an embedded query and the name of the backend that answered."""
+    if local_index is not None and local_index.ready and not expr:
+        return [_result(row, score) for row, score in local_index.search(vector, top_k, field_weights, filters)], \
+            "local index"
+    filter_expr = " and ".join(f"({e})" for e in (build_filter_expr(filters), expr) if e)
+    return _search_milvus(vector, top_k, field_weights, filter_expr), "Milvus"
+
+def search_similar(query, top_k=10, field_weights=None, filters=None, expr=None):
+    """Search the summary, title and transcript vectors and merge them by weight.
+
+    Narrow the search with a `filters` dict (see build_filter_expr) and/or a raw Milvus `expr`.
+    Once the local mirror is built it answers every search without a raw `expr` in-process;
+    Milvus stays the source of truth and answers the rest.
+    """
+    vector = embedder.embed(query)
+    field_weights = field_weights or SEARCH_FIELD_WEIGHTS
+    filter_expr = " and ".join(f"({e})" for e in (build_filter_expr(filters), expr) if e)
+    print("Performing search with query:", query, f"(filter: {filter_expr})" if filter_expr else "")
+    output, source = _search(vector, top_k, field_weights, filters, expr)
+
     for item in output:
-        print(f"Found item: {item['title']} with score: {item['L2_score']:.4f}")
-    print(f"Total results found: {len(output)}")
-    return output
\ No newline at end of file
+        print(f"Found item: {item['title']} with score: {item['vector_score']:.4f}")
+    print(f"Total results found: {len(output)} ({source})")
+    return output
+
+def candidate_depth(scores, min_k=ADAPTIVE_MIN_CANDIDATES, margin=ADAPTIVE_SCORE_MARGIN, gap=ADAPTIVE_SCORE_GAP):
+    """How many of the descending fused `scores` are worth reranking.
+
+    Hits more than `margin` below the best one are dropped, and past the first `min_k` the
+    list is cut at the first drop of more than `gap` between neighbours.
+    """
+    if not scores:
+        return 0
+    depth = min(min_k, len(scores))
+    while depth < len(scores):
+        if scores[depth] < scores[0] - margin or scores[depth - 1] - scores[depth] > gap:
+            break
+        depth += 1
+    return depth
+
+def search_adaptive(query, top_k=10, max_k=ADAPTIVE_MAX_CANDIDATES, field_weights=None, filters=None, expr=None,
+                    stats=None):
+    """search_similar with the candidate count chosen from the score distribution.
+
+    Starts with `top_k` hits. While the last hit is still within the margin of the best one
+    (a flat, hard query) the search is repeated twice as wide, up to `max_k`; the result is
+    then cut to candidate_depth(). `stats`, if given, receives searched/kept/searches counts.
+    """
+    vector = embedder.embed(query)
+    field_weights = field_weights or SEARCH_FIELD_WEIGHTS
+    max_k = max(max_k, top_k)
+    fetch, searches = top_k, 0
+    while True:
+        output, source = _search(vector, fetch, field_weights, filters, expr)
+        searches += 1
+        scores = [item["vector_score"] for item in output]
+        if len(output) < fetch or fetch >= max_k or scores[-1] < scores[0] - ADAPTIVE_SCORE_MARGIN:
+            break
+        fetch = min(fetch * 2, max_k)
+
+    depth = candidate_depth(scores)
+    print(f"Adaptive search for '{query}': kept {depth} of {len(output)} hits after {searches} search(es) ({source})")
+    if stats is not None:
+        stats.update(searched=len(output), kept=depth, searches=searches)
+    return output[:depth]
@@ -0,0 +1,320 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: results_view.py
+# Virtualized search results for the query tab: list model, painted card delegate, async thumbnails
+
+import os
+import cv2
+import logging
+from PyQt5.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QRect, QSize, QEvent, pyqtSignal
+)
+from PyQt5.QtGui import QImage, QPixmap, QColor, QPen, QFont, QFontMetrics, QPainter
+from PyQt5.QtWidgets import QStyledItemDelegate, QListView, QStyle, QAbstractItemView
+from artifact_store import is_remote, fetch_local
+
+THUMBNAIL_SIZE = QSize(120, 80)
+CARD_HEIGHT = 120
+THUMBNAIL_WORKERS = 4
+
+# Result badges for rows that are not at final quality yet
+QUALITY_BADGES = {
+    "draft": ("Draft", "Quick draft transcript and summary; a full-quality version is being prepared."),
+    "partial": ("Partial", "Still being transcribed; only the part processed so far is searchable."),
+}
+
+
+# -------------------- Thumbnails --------------------
+def extract_video_thumbnail(video_path):
+    """A representative frame scaled to THUMBNAIL_SIZE, or None. Runs on pool threads, so QImage only.
+
+    Remote videos are read through the artifact cache, so a result that is opened, reranked or
+    shown again does not download the video a second time.
+    """
+    if not is_remote(video_path) and not os.path.exists(video_path):
+        return None
+    try:
+        video_path = fetch_local(video_path)
+    except Exception as e:
+        logging.warning(f"Thumbnail: could not fetch {video_path}: {e}")
+        return None
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return None
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        # Seek to 10% into the video (max 5 s in), the very beginning is often black or a logo
+        cap.set(cv2.CAP_PROP_POS_FRAMES, min(int(total_frames * 0.1), int(fps * 5)))
+        ret, frame = cap.read()
+    finally:
+        cap.release()
+    if not ret or frame is None:
+        return None
+    # Convert BGR to RGB (OpenCV uses BGR, Qt uses RGB); scaled() copies, so the frame buffer can go
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width, channels = frame_rgb.shape
+    image = QImage(frame_rgb.data, width, height, channels * width, QImage.Format_RGB888)
+    return image.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+class _ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    def __init__(self, video_path, signals):
+        super().__init__()
+        self.video_path = video_path
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = extract_video_thumbnail(self.video_path)
+        except Exception as e:
+            print(f"Error extracting thumbnail from {self.video_path}: {str(e)}")
+            image = None
+        self.signals.loaded.emit(self.video_path, image if image is not None else QImage())
+
+
+class ThumbnailLoader(QObject):
+    """Extracts thumbnails on a small thread pool; callers get a placeholder until the frame is ready."""
+    thumbnail_ready = pyqtSignal(str)  # video_path
+
+    def __init__(self, parent=None, max_workers=THUMBNAIL_WORKERS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.cache = {}     # video_path -> QPixmap, kept across queries
+        self.pending = set()
+        self.placeholder = QPixmap(THUMBNAIL_SIZE)
+        self.placeholder.fill(Qt.lightGray)
+        self._signals = _ThumbnailSignals()
+        self._signals.loaded.connect(self._on_loaded)
+
+    def thumbnail(self, video_path):
+        pixmap = self.cache.get(video_path)
+        if pixmap is not None:
+            return pixmap
+        if video_path not in self.pending:
+            self.pending.add(video_path)
+            self.pool.start(_ThumbnailTask(video_path, self._signals))
+        return self.placeholder
+
+    def cancel_pending(self):
+        """Drop queued extractions (e.g. rows of a superseded query); running ones still finish."""
+        self.pool.clear()
+        self.pending.clear()
+
+    def _on_loaded(self, video_path, image):
+        self.pending.discard(video_path)
+        self.cache[video_path] = self.placeholder if image.isNull() else QPixmap.fromImage(image)
+        self.thumbnail_ready.emit(video_path)
+
+
+# -------------------- Model --------------------
+class ResultListModel(QAbstractListModel):
+    """Search results as plain dicts (search_similar / rerank output)."""
+    ItemRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.items[index.row()]
+        if role == self.ItemRole:
+            return item
+        if role == Qt.DisplayRole:
+            return item['title']
+        if role == Qt.ToolTipRole:
+            return item.get('sentence') or item['video_path']
+        return None
+
+    def set_items(self, items):
+        self.beginResetModel()
+        self.items = [dict(item, best_score=item.get('score', float('-inf'))) for item in items]
+        self.endResetModel()
+
+    def clear(self):
+        self.set_items([])
+
+    def update_ranked(self, guid, chunks):
+        """Refine one streamed result with its best sentence and move it to its place by score."""
+        for item in self.items:
+            if item['guid'] != guid:
+                continue
+            if chunks:
+                item.update(score=chunks[0]['score'], sentence=chunks[0]['sentence'], best_score=chunks[0]['score'])
+            else:
+                item.update(sentence="No matching sentences.", best_score=float('-inf'), ranked=True)
+        self.layoutAboutToBeChanged.emit()
+        self.items.sort(key=lambda x: x['best_score'], reverse=True)
+        self.layoutChanged.emit()
+
+    def thumbnail_changed(self, video_path):
+        for row, item in enumerate(self.items):
+            if item['video_path'] == video_path:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [])
+
+
+# -------------------- Delegate --------------------
+class ResultCardDelegate(QStyledItemDelegate):
+    """Paints the result card; no widgets are created per row, so only visible rows cost anything."""
+    open_requested = pyqtSignal(str)  # video_path
+
+    def __init__(self, thumbnails, parent=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), CARD_HEIGHT)
+
+    def _rects(self, rect):
+        card = rect.adjusted(4, 4, -4, -4)
+        inner = card.adjusted(10, 10, -10, -10)
+        thumbnail = QRect(inner.left(), inner.top(), THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+        left = thumbnail.right() + 15
+        content = QRect(left, inner.top(), inner.right() - left, inner.height())
+        score = QRect(content.right() - 80, content.top(), 80, 20)
+        return {
+            "card": card,
+            "thumbnail": thumbnail,
+            "title": QRect(content.left(), content.top(), content.width() - 150, 20),
+            "badge": QRect(content.right() - 140, content.top() + 2, 55, 16),
+            "score": score,
+            "match": QRect(content.left(), content.top() + 24, content.width(), 14),
+            "sentence": QRect(content.left(), content.top() + 40, content.width(), 34),
+            "path": QRect(content.left(), content.bottom() - 18, content.width() - 70, 18),
+            "play": QRect(content.right() - 60, content.bottom() - 20, 60, 20),
+        }
+
+    def _font(self, base, pixel_size, bold=False):
+        font = QFont(base)
+        font.setPixelSize(pixel_size)
+        font.setBold(bold)
+        return font
+
+    def paint(self, painter, option, index):
+        item = index.data(ResultListModel.ItemRole)
+        r = self._rects(option.rect)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        painter.setPen(QPen(QColor("#3498db"), 2) if hovered else QPen(QColor("#ddd"), 1))
+        painter.setBrush(QColor("#f8f9fa") if hovered else QColor("white"))
+        painter.drawRoundedRect(r["card"], 8, 8)
+
+        pixmap = self.thumbnails.thumbnail(item['video_path'])
+        scaled = pixmap.scaled(r["thumbnail"].size(), Qt.KeepAspectRatio)
+        painter.drawPixmap(r["thumbnail"].left() + (r["thumbnail"].width() - scaled.width()) // 2,
+                           r["thumbnail"].top() + (r["thumbnail"].height() - scaled.height()) // 2, scaled)
+        painter.setPen(QPen(QColor("#ccc"), 1))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRoundedRect(r["thumbnail"], 4, 4)
+
+        # Title and score
+        title_font = self._font(option.font, 14, bold=True)
+        painter.setFont(title_font)
+        painter.setPen(QColor("#2c3e50"))
+        title = QFontMetrics(title_font).elidedText(item['title'], Qt.ElideRight, r["title"].width())
+        painter.drawText(r["title"], Qt.AlignLeft | Qt.AlignVCenter, title)
+
+        if item.get('quality') in QUALITY_BADGES:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor("#f39c12"))
+            painter.drawRoundedRect(r["badge"], 3, 3)
+            painter.setFont(self._font(option.font, 10, bold=True))
+            painter.setPen(QColor("white"))
+            painter.drawText(r["badge"], Qt.AlignCenter, QUALITY_BADGES[item['quality']][0])
+
+        if 'score' in item:
+            score_text = f"Score: {item['score']:.2f}"
+        else:
+            score_text = "Score: –" if item.get('ranked') else "Ranking…"
+        painter.setFont(self._font(option.font, 12, bold=True))
+        painter.setPen(QColor("#e74c3c"))
+        painter.drawText(r["score"], Qt.AlignRight | Qt.AlignVCenter, score_text)
+
+        # Best match text
+        painter.setFont(self._font(option.font, 11, bold=True))
+        painter.setPen(QColor("#7f8c8d"))
+        painter.drawText(r["match"], Qt.AlignLeft | Qt.AlignVCenter, "Best Match:")
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#ecf0f1"))
+        painter.drawRoundedRect(r["sentence"], 3, 3)
+        painter.setFont(self._font(option.font, 11))
+        painter.setPen(QColor("#34495e"))
+        painter.drawText(r["sentence"].adjusted(5, 2, -5, -2), Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap,
+                         item.get('sentence', "Scoring transcript sentences…"))
+
+        # Video file name and play button
+        path_font = self._font(option.font, 10)
+        painter.setFont(path_font)
+        painter.setPen(QColor("#95a5a6"))
+        path_text = QFontMetrics(path_font).elidedText(f"📁 {os.path.basename(item['video_path'])}", Qt.ElideMiddle,
+                                                       r["path"].width())
+        painter.drawText(r["path"], Qt.AlignLeft | Qt.AlignVCenter, path_text)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor("#3498db"))
+        painter.drawRoundedRect(r["play"], 3, 3)
+        painter.setFont(self._font(option.font, 10, bold=True))
+        painter.setPen(QColor("white"))
+        painter.drawText(r["play"], Qt.AlignCenter, "▶ Play")
+
+        painter.restore()
+
+    def is_clickable(self, rect, pos):
+        r = self._rects(rect)
+        return any(r[name].contains(pos) for name in ("thumbnail", "title", "play"))
+
+    def editorEvent(self, event, model, option, index):
+        # Thumbnail, title and play button open the video, like the old card widgets
+        if (event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton
+                and self.is_clickable(option.rect, event.pos())):
+            self.open_requested.emit(index.data(ResultListModel.ItemRole)['video_path'])
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+# -------------------- View --------------------
+class ResultListView(QListView):
+    """QListView over ResultListModel; rows are painted on demand and thumbnails load in the background."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.thumbnails = ThumbnailLoader(self)
+        self.results = ResultListModel(self)
+        self.delegate = ResultCardDelegate(self.thumbnails, self)
+        self.open_requested = self.delegate.open_requested
+        self.setModel(self.results)
+        self.setItemDelegate(self.delegate)
+        self.setUniformItemSizes(True)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setMouseTracking(True)
+        self.viewport().setAttribute(Qt.WA_Hover)
+        self.thumbnails.thumbnail_ready.connect(self.results.thumbnail_changed)
+
+    def mouseMoveEvent(self, event):
+        index = self.indexAt(event.pos())
+        clickable = index.isValid() and self.delegate.is_clickable(self.visualRect(index), event.pos())
+        self.viewport().setCursor(Qt.PointingHandCursor if clickable else Qt.ArrowCursor)
+        super().mouseMoveEvent(event)
+
+    def show_results(self, items):
+        self.thumbnails.cancel_pending()
+        self.results.set_items(items)
+        self.scrollToTop()
+
+    def clear(self):
+        self.thumbnails.cancel_pending()
+        self.results.clear()
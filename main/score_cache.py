@@ -0,0 +1,96 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: score_cache.py
+# Persistent (query hash, sentence hash) -> score cache for the cross-encoder rerank stage
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+RERANK_CACHE_PATH = os.environ.get("MIRC_RERANK_CACHE", os.path.abspath("rerank_cache.sqlite"))
+# Least recently used scores are evicted beyond this many rows (~100 bytes each)
+RERANK_CACHE_MAX_ROWS = int(os.environ.get("MIRC_RERANK_CACHE_MAX_ROWS", 1_000_000))
+EVICT_TO = 0.9  # fraction of the cap left after an eviction, so it does not run on every insert
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    def __init__(self, path=RERANK_CACHE_PATH, max_rows=RERANK_CACHE_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(scores)")]
+        if columns and "used_at" not in columns:
+            self._conn.execute("DROP TABLE scores")  # cache from before eviction existed, rebuilt on demand
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " query_hash TEXT NOT NULL,"
+            " sentence_hash TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " used_at INTEGER NOT NULL,"
+            " PRIMARY KEY (query_hash, sentence_hash)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_used_at ON scores (used_at)")
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, query_hash, sentence_hashes):
+        """Return {sentence_hash: score} for the hashes that are cached, marking them as used."""
+        if not sentence_hashes:
+            return {}
+        found = {}
+        hashes = list(sentence_hashes)
+        now = int(time.time())
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT sentence_hash, score FROM scores WHERE query_hash = ? AND sentence_hash IN ({placeholders})",
+                    [query_hash] + batch
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE scores SET used_at = ? WHERE query_hash = ? AND sentence_hash IN ({placeholders})",
+                        [now, query_hash] + batch
+                    )
+                found.update(rows)
+            if found:
+                self._conn.commit()
+        return found
+
+    def put_many(self, query_hash, scores):
+        """Store {sentence_hash: score} for one query, evicting the least recently used rows past max_rows."""
+        if not scores:
+            return
+        now = int(time.time())
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO scores (query_hash, sentence_hash, score, used_at) VALUES (?, ?, ?, ?)",
+                [(query_hash, h, float(s), now) for h, s in scores.items()]
+            )
+            self._rows += self._conn.total_changes - before
+            self._conn.executemany(
+                "UPDATE scores SET score = ?, used_at = ? WHERE query_hash = ? AND sentence_hash = ?",
+                [(float(s), now, query_hash, h) for h, s in scores.items()]
+            )
+            if self._rows > self.max_rows:
+                excess = self._rows - int(self.max_rows * EVICT_TO)
+                self._conn.execute(
+                    "DELETE FROM scores WHERE (query_hash, sentence_hash) IN"
+                    " (SELECT query_hash, sentence_hash FROM scores ORDER BY used_at LIMIT ?)",
+                    (excess,)
+                )
+                self._rows = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+            self._conn.commit()
@@ -0,0 +1,451 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: snapshot.py
+# Export the collection + text artifacts to a Parquet snapshot, and restore it with Milvus bulk insert
+#
+# Usage:
+#   python main/snapshot.py export snapshots/2025-07-03
+#   python main/snapshot.py import snapshots/2025-07-03 --base-dir processed_videos [--replace]
+#   python main/snapshot.py migrate --list
+#   python main/snapshot.py migrate video_embeddings_v8
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pymilvus import utility
+from milvus_client import get_milvus, MILVUS_COLLECTION_NAME, EMBEDDING_MODE
+from pipeline import (
+    build_schema, run_on_collection, artifact_dirs, write_text, publish_artifacts, detect_language, title_to_text,
+    transcript_chunks, mean_pool
+)
+from artifact_store import (
+    MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MILVUS_BUCKET, is_remote, read_artifact_text, fetch_local,
+    artifact_size
+)
+from audio_cache import probe_duration
+from embedding_service import get_embedding_service
+from local_index import notify_upsert, notify_delete, notify_resync
+from audio_fingerprint import get_fingerprint_index, backfill
+
+# -------------------- Snapshot Configuration --------------------
+EXPORT_BATCH_SIZE = 1000
+ROWS_FILE = "rows.parquet"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+# Artifact columns: Milvus path field -> (snapshot text column, artifact folder, file name suffix)
+TEXT_ARTIFACTS = {
+    "transcript_path": ("transcript_text", "transcripts", "_transcript.txt"),
+    "translation_path": ("translation_text", "translations", "_translated_transcript.txt"),
+    "summary_path": ("summary_text", "summaries", "_summary.txt"),
+}
+
+
+def read_text(path):
+    try:
+        return read_artifact_text(path)  # local path or s3:// reference
+    except Exception:
+        logging.warning(f"Snapshot: artifact {path} is missing")
+        return None
+
+
+def video_file_name(guid, video_path):
+    """`<guid><ext>`, keeping the container of the source video (.mkv, .webm, ...)."""
+    return f"{guid}{os.path.splitext(video_path or '')[1] or '.mp4'}"
+
+
+def field_names():
+    return [field.name for field in build_schema().fields]
+
+
+def current_guids():
+    def collect(collection):
+        guids = set()
+        iterator = collection.query_iterator(batch_size=EXPORT_BATCH_SIZE, expr="", output_fields=["guid"])
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                guids.update(row["guid"] for row in batch)
+        finally:
+            iterator.close()
+        return guids
+    return run_on_collection(collect, load=True)
+
+
+# -------------------- Export --------------------
+def export_snapshot(out_dir, include_videos=False, batch_size=EXPORT_BATCH_SIZE):
+    """Stream every row (vectors included) plus its text artifacts into a zstd-compressed Parquet file."""
+    os.makedirs(out_dir, exist_ok=True)
+    names = field_names()
+    rows_path = os.path.join(out_dir, ROWS_FILE)
+    video_dir = os.path.join(out_dir, "videos")
+    if include_videos:
+        os.makedirs(video_dir, exist_ok=True)
+
+    def export(collection):
+        writer = None
+        total = 0
+        iterator = collection.query_iterator(batch_size=batch_size, expr="", output_fields=names)
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                columns = {name: [row[name] for row in batch] for name in names}
+                for path_field, (text_column, _, _) in TEXT_ARTIFACTS.items():
+                    columns[text_column] = [read_text(row[path_field]) for row in batch]
+                if include_videos:
+                    for row in batch:
+                        try:
+                            shutil.copyfile(fetch_local(row["video_path"]),
+                                            os.path.join(video_dir, video_file_name(row["guid"], row["video_path"])))
+                        except Exception as e:
+                            logging.warning(f"Snapshot: video for {row['guid']} not copied: {e}")
+                table = pa.table(columns)
+                if writer is None:
+                    writer = pq.ParquetWriter(rows_path, table.schema, compression="zstd")
+                writer.write_table(table)  # one row group per batch
+                total += len(batch)
+                print(f"Exported {total} rows...")
+        finally:
+            iterator.close()
+            if writer is not None:
+                writer.close()
+        return total
+
+    total = run_on_collection(export, load=True)
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump({
+            "snapshot_version": SNAPSHOT_VERSION,
+            "collection": MILVUS_COLLECTION_NAME,
+            "rows": total,
+            "fields": names,
+            "includes_videos": include_videos,
+            "created_at": int(time.time()),
+        }, f, indent=2)
+    print(f"Snapshot of {total} rows written to {out_dir}")
+    return total
+
+
+# -------------------- Import --------------------
+def snapshot_guids(snapshot_dir):
+    return pq.read_table(os.path.join(snapshot_dir, ROWS_FILE), columns=["guid"]).column("guid").to_pylist()
+
+
+def delete_rows(guids, batch_size=EXPORT_BATCH_SIZE):
+    """Remove rows that an import replaces; their artifact files are overwritten by the restore."""
+    guids = sorted(guids)
+    for start in range(0, len(guids), batch_size):
+        expr = f"guid in {json.dumps(guids[start:start + batch_size])}"
+        run_on_collection(lambda collection: collection.delete(expr))
+    run_on_collection(lambda collection: collection.flush())
+    index = get_fingerprint_index()
+    for guid in guids:
+        notify_delete(guid)
+        index.remove(guid)  # re-added from the restored video below
+
+
+def restore_rows(snapshot_dir, base_save_dir, skip=()):
+    """Yield Milvus rows from the snapshot, writing their artifacts under base_save_dir.
+
+    GUIDs in `skip` are left out before anything is written, and a GUID that occurs more
+    than once in the snapshot is only restored the first time.
+    """
+    names = field_names()
+    seen = set(skip)
+    dirs = artifact_dirs(base_save_dir)
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+    video_dir = os.path.join(snapshot_dir, "videos")
+
+    parquet = pq.ParquetFile(os.path.join(snapshot_dir, ROWS_FILE))
+    for record_batch in parquet.iter_batches(batch_size=EXPORT_BATCH_SIZE):
+        for record in record_batch.to_pylist():
+            guid = record["guid"]
+            if guid in seen:
+                continue
+            seen.add(guid)
+            for path_field, (text_column, folder, suffix) in TEXT_ARTIFACTS.items():
+                path = os.path.join(base_save_dir, folder, f"{guid}{suffix}")
+                if record[text_column] is not None:
+                    write_text(path, record[text_column])
+                record[path_field] = path
+            embedding_path = os.path.join(dirs['embeddings'], f"{guid}_embedding_vector.txt")
+            write_text(embedding_path, ",".join(str(x) for x in record["embedding"]))
+
+            # video_path is still the exported one, so it names the file the export wrote
+            video_name = video_file_name(guid, record["video_path"])
+            snapshot_video = os.path.join(video_dir, video_name)
+            if not os.path.exists(snapshot_video):
+                video_name = f"{guid}.mp4"  # snapshots written before the extension was kept
+                snapshot_video = os.path.join(video_dir, video_name)
+            if os.path.exists(snapshot_video):
+                record["video_path"] = os.path.join(dirs['video'], video_name)
+                shutil.copyfile(snapshot_video, record["video_path"])
+            elif not is_remote(record["video_path"]) and not os.path.exists(record["video_path"]):
+                logging.warning(f"Snapshot: video for {guid} not found at {record['video_path']}")
+            row = {name: record[name] for name in names}
+            # With MIRC_ARTIFACT_STORE=s3 the restored files are published like fresh ingests
+            yield publish_artifacts(row, dirs, move_video=os.path.exists(snapshot_video))
+
+
+def bulk_insert(rows):
+    """Stage rows as Parquet in the Milvus bucket and run server-side bulk insert jobs."""
+    from pymilvus.bulk_writer import RemoteBulkWriter, BulkFileType
+    connect_param = RemoteBulkWriter.S3ConnectParam(
+        endpoint=MINIO_ENDPOINT, access_key=MINIO_ACCESS_KEY, secret_key=MINIO_SECRET_KEY,
+        bucket_name=MILVUS_BUCKET, secure=False
+    )
+    count = 0
+    with RemoteBulkWriter(schema=build_schema(), remote_path="/snapshot_import", connect_param=connect_param,
+                          file_type=BulkFileType.PARQUET) as writer:
+        for row in rows:
+            writer.append_row(row)
+            count += 1
+        writer.commit()
+        batch_files = writer.batch_files
+
+    run_on_collection(lambda collection: None)  # make sure the collection and its indexes exist
+    with get_milvus().connection() as alias:
+        task_ids = [utility.do_bulk_insert(collection_name=MILVUS_COLLECTION_NAME, files=files, using=alias)
+                    for files in batch_files]
+        pending = set(task_ids)
+        while pending:
+            time.sleep(2)
+            for task_id in list(pending):
+                state = utility.get_bulk_insert_state(task_id, using=alias)
+                if state.state_name in ("Completed", "Failed"):
+                    pending.discard(task_id)
+                    if state.state_name == "Failed":
+                        raise RuntimeError(f"Bulk insert task {task_id} failed: {state.failed_reason}")
+                    print(f"Bulk insert task {task_id} completed ({state.row_count} rows)")
+    return count
+
+
+def insert_in_batches(rows, batch_size=EXPORT_BATCH_SIZE):
+    """Fallback when MinIO is not reachable from this machine: regular inserts."""
+    count, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            run_on_collection(lambda collection, b=batch: collection.insert(b))
+            for inserted in batch:
+                notify_upsert(inserted)
+            count += len(batch)
+            batch = []
+            print(f"Inserted {count} rows...")
+    if batch:
+        run_on_collection(lambda collection: collection.insert(batch))
+        for inserted in batch:
+            notify_upsert(inserted)
+        count += len(batch)
+    run_on_collection(lambda collection: collection.flush())
+    return count
+
+
+def import_snapshot(snapshot_dir, base_save_dir, use_bulk_insert=True, replace=False, fingerprints=True):
+    """Restore a snapshot into the current collection.
+
+    Milvus does not enforce unique primary keys on insert, so GUIDs that are already in the
+    collection are skipped (replace=True deletes those rows first and restores the snapshot's
+    version). The local index mirror and the fingerprint index are brought up to date afterwards.
+    """
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest["fields"] != field_names():
+        raise ValueError(f"Snapshot schema {manifest['fields']} does not match the current collection schema")
+    existing = current_guids() & set(snapshot_guids(snapshot_dir))
+    if existing and replace:
+        print(f"Replacing {len(existing)} rows that are already in '{MILVUS_COLLECTION_NAME}'")
+        delete_rows(existing)
+    elif existing:
+        print(f"Skipping {len(existing)} rows that are already in '{MILVUS_COLLECTION_NAME}' (--replace overwrites them)")
+    rows = restore_rows(snapshot_dir, os.path.abspath(base_save_dir), skip=() if replace else existing)
+    if use_bulk_insert:
+        count = bulk_insert(rows)
+        notify_resync()  # bulk-inserted rows never pass through this process
+    else:
+        count = insert_in_batches(rows)
+    print(f"Imported {count} rows from {snapshot_dir} into '{MILVUS_COLLECTION_NAME}'")
+    if fingerprints and count:
+        backfill()
+    return count
+
+
+# -------------------- Migrate --------------------
+# Every schema change bumps the collection name (v8 -> v11, "_multilingual" per embedding mode), which
+# leaves the rows of the previous collection behind. `migrate` copies them into the current one.
+COLLECTION_PREFIX = "video_embeddings_"
+# Rows the first schema already had; everything else is rebuilt from the row's own artifacts
+LEGACY_FIELDS = ["guid", "title", "video_path", "transcript_path", "translation_path", "summary_path"]
+
+
+def legacy_collections():
+    with get_milvus().connection() as alias:
+        names = utility.list_collections(using=alias)
+    return sorted(name for name in names if name.startswith(COLLECTION_PREFIX) and name != MILVUS_COLLECTION_NAME)
+
+
+def migrate_row(record):
+    """Build a current-schema row from an older one without re-transcribing.
+
+    Scalar fields the old schema lacked come from the artifacts (language detection,
+    ffprobe, file sizes). All three vectors are re-embedded with the current model from
+    the stored summary, title and transcript, since the old collection may hold vectors
+    of the other embedding mode. Returns None when the summary file is gone.
+    """
+    summary = read_text(record["summary_path"])
+    if summary is None:
+        return None
+    transcript = read_text(record["transcript_path"]) or ""
+    translation = read_text(record["translation_path"])
+    language = record.get("language") or detect_language(transcript)
+    # Same choice as _generate_artifacts: multilingual mode indexes the source-language transcript
+    if (EMBEDDING_MODE == "multilingual" and language != "en") or translation is None:
+        index_text = transcript
+    else:
+        index_text = translation
+    sentences = [line for line in index_text.splitlines() if line.strip()]
+    vectors = get_embedding_service().embed_many([summary, title_to_text(record["title"])] + transcript_chunks(sentences))
+
+    duration = record.get("duration")
+    if duration is None:
+        try:
+            duration = probe_duration(fetch_local(record["video_path"]))
+        except Exception as e:
+            logging.warning(f"Migrate: no duration for {record['guid']}: {e}")
+            duration = 0.0
+    file_size = record.get("file_size")
+    if file_size is None:
+        try:
+            file_size = artifact_size(record["video_path"])
+        except Exception:
+            file_size = 0
+    ingested_at = record.get("ingested_at")
+    if ingested_at is None:
+        path = record["transcript_path"]
+        ingested_at = int(os.path.getmtime(path)) if not is_remote(path) and os.path.exists(path) else int(time.time())
+
+    embedding = vectors[0].tolist()
+    if not is_remote(record["transcript_path"]):
+        embeddings_dir = artifact_dirs(os.path.dirname(os.path.dirname(record["transcript_path"])))['embeddings']
+        os.makedirs(embeddings_dir, exist_ok=True)
+        write_text(os.path.join(embeddings_dir, f"{record['guid']}_embedding_vector.txt"),
+                   ",".join(str(x) for x in embedding))
+    row = {name: record[name] for name in LEGACY_FIELDS}
+    row.update(
+        quality=record.get("quality") or "final",
+        language=language,
+        duration=float(duration),
+        ingested_at=int(ingested_at),
+        file_size=int(file_size),
+        embedding=embedding,
+        title_embedding=vectors[1].tolist(),
+        transcript_embedding=mean_pool(vectors[2:]).tolist(),
+    )
+    return row
+
+
+def migrate_collection(source, drop=False, batch_size=EXPORT_BATCH_SIZE):
+    """Copy every row of an older collection into the current one; GUIDs already there are kept as they are."""
+    if source == MILVUS_COLLECTION_NAME:
+        raise ValueError(f"'{source}' is the current collection")
+    milvus = get_milvus()
+    with milvus.connection() as alias:
+        if not utility.has_collection(source, using=alias):
+            raise ValueError(f"Collection '{source}' does not exist")
+    existing = current_guids()
+    migrated, skipped, missing = 0, 0, []
+
+    def store(rows):
+        run_on_collection(lambda collection: collection.upsert(rows))
+        for row in rows:
+            notify_upsert(row)
+
+    def copy(collection):
+        nonlocal migrated, skipped
+        wanted = set(field_names()) - {"embedding", "title_embedding", "transcript_embedding"}
+        output_fields = [field.name for field in collection.schema.fields if field.name in wanted]
+        iterator = collection.query_iterator(batch_size=batch_size, expr="", output_fields=output_fields)
+        pending = []
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                for record in batch:
+                    if record["guid"] in existing:
+                        skipped += 1
+                        continue
+                    row = migrate_row(record)
+                    if row is None:
+                        missing.append(record["guid"])
+                        continue
+                    pending.append(row)
+                    if len(pending) >= batch_size:
+                        store(pending)
+                        migrated += len(pending)
+                        pending = []
+                print(f"Migrated {migrated} rows...")
+        finally:
+            iterator.close()
+        if pending:
+            store(pending)
+            migrated += len(pending)
+
+    milvus.run(source, copy, load=True)
+    run_on_collection(lambda collection: collection.flush())
+    print(f"Migrated {migrated} rows from '{source}' into '{MILVUS_COLLECTION_NAME}' "
+          f"({skipped} already present, {len(missing)} without a summary file)")
+    for guid in missing:
+        print(f"  not migrated: {guid}")
+    if drop and not missing:
+        milvus.run(source, lambda collection: collection.drop())
+        milvus.invalidate(source)
+        print(f"Dropped '{source}'")
+    elif drop:
+        print(f"'{source}' kept because some rows were not migrated")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import snapshots of the video collection")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write a snapshot")
+    exp.add_argument("out_dir")
+    exp.add_argument("--include-videos", action="store_true", help="also copy the video files")
+    imp = sub.add_parser("import", help="restore a snapshot")
+    imp.add_argument("snapshot_dir")
+    imp.add_argument("--base-dir", default="processed_videos", help="where to restore the artifact files")
+    imp.add_argument("--no-bulk", action="store_true", help="use regular inserts instead of Milvus bulk insert")
+    imp.add_argument("--replace", action="store_true", help="overwrite rows whose GUID is already in the collection")
+    imp.add_argument("--no-fingerprints", action="store_true", help="do not fingerprint the restored videos")
+    mig = sub.add_parser("migrate", help="copy the rows of an older collection into the current one")
+    mig.add_argument("source", nargs="?", help="collection to migrate, e.g. video_embeddings_v8")
+    mig.add_argument("--list", action="store_true", help="list the older collections that still exist")
+    mig.add_argument("--drop", action="store_true", help="drop the source collection once every row is migrated")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.out_dir, include_videos=args.include_videos)
+    elif args.command == "import":
+        import_snapshot(args.snapshot_dir, args.base_dir, use_bulk_insert=not args.no_bulk, replace=args.replace,
+                        fingerprints=not args.no_fingerprints)
+    elif args.list or not args.source:
+        for name in legacy_collections():
+            print(name)
+    else:
+        migrate_collection(args.source, drop=args.drop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: summarization.py
+# Summarization engines: abstractive (DistilBART) and extractive (TextRank), selectable per job or by length
+
+import os
+import re
+import threading
+import numpy as np
+from collections import Counter
+from scipy import sparse
+
+# "abstractive", "extractive" or "auto" (extractive once a transcript is longer than AUTO_EXTRACTIVE_WORDS)
+SUMMARY_ENGINE = os.environ.get("MIRC_SUMMARY_ENGINE", "abstractive")
+# DistilBART only reads the first ~1024 tokens, so beyond this the extractive engine covers more of the lecture
+AUTO_EXTRACTIVE_WORDS = 3000
+
+
+def clean_transcription(text):
+    # Remove timestamps (e.g., [00:01:23]) and common filler words
+    text = re.sub(r'\[\d{2}:\d{2}:\d{2}\]', '', text)
+    text = re.sub(r'\b(um|uh|like|you know)\b', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+def split_into_sentences(text):
+    # Split on period, exclamation, or question mark (incl. Urdu "۔" and Arabic "؟") followed by space or end of string
+    sentences = re.split(r'(?<=[.!?۔؟])\s+', text.strip())
+    return [s for s in sentences if s]
+
+
+class SummarizationEngine:
+    name = None
+
+    def summarize(self, text):
+        raise NotImplementedError
+
+
+class AbstractiveSummarizer(SummarizationEngine):
+    """DistilBART beam search; best summaries, slowest stage on CPU."""
+    name = "abstractive"
+
+    def __init__(self, model_name="sshleifer/distilbart-cnn-6-6", min_length=250, max_length=500):
+        self.model_name = model_name
+        self.min_length = min_length
+        self.max_length = max_length
+        self._summarizer = None
+        self._lock = threading.Lock()
+
+    def summarize(self, text):
+        from transformers import pipeline
+        with self._lock:
+            if self._summarizer is None:
+                self._summarizer = pipeline("summarization", model=self.model_name)
+            cleaned_text = clean_transcription(text)
+            summarized = self._summarizer(cleaned_text, max_length=self.max_length, min_length=self.min_length,
+                                          do_sample=False, truncation=True)
+        return summarized[0]['summary_text']
+
+
+class ExtractiveSummarizer(SummarizationEngine):
+    """TextRank over TF-IDF sentence similarity.
+
+    Abstractive summarization generates a summary in its own words; extractive
+    summarization just picks the most central sentences, which is orders of magnitude
+    cheaper and sees the whole transcript rather than the first 1024 tokens.
+
+    This engine gets the longest transcripts (auto, draft and multilingual mode), so the
+    sentence x word matrix stays sparse and the sentence similarity graph is never built:
+    every PageRank step multiplies through the TF-IDF matrix instead, O(words) per step
+    rather than O(sentences^2) memory.
+    """
+    name = "extractive"
+
+    def __init__(self, ratio=0.25, max_sentences=40, damping=0.85, iterations=50):
+        self.ratio = ratio
+        self.max_sentences = max_sentences
+        self.damping = damping
+        self.iterations = iterations
+
+    def summarize(self, text):
+        sentences = split_into_sentences(clean_transcription(text))
+        if len(sentences) <= 2:
+            return " ".join(sentences)
+        keep = min(self.max_sentences, max(1, int(len(sentences) * self.ratio)))
+
+        n = len(sentences)
+        tokens = [re.findall(r'\w+', s.lower()) for s in sentences]
+        vocab = {w: i for i, w in enumerate({w for t in tokens for w in t})}
+        doc_freq = Counter(w for t in tokens for w in set(t))
+        idf = np.zeros(len(vocab))
+        for w, i in vocab.items():
+            idf[i] = np.log(n / doc_freq[w]) + 1.0
+        rows, cols, values = [], [], []
+        for row, t in enumerate(tokens):
+            for w, count in Counter(t).items():
+                rows.append(row)
+                cols.append(vocab[w])
+                values.append(count * idf[vocab[w]])
+        tfidf = sparse.csr_matrix((values, (rows, cols)), shape=(n, len(vocab)))
+        norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        tfidf = sparse.diags(1.0 / norms) @ tfidf
+
+        # similarity = tfidf @ tfidf.T with a zero diagonal, applied as a product instead of stored
+        tfidf_t = tfidf.T.tocsr()
+        self_similarity = np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel()  # 1, or 0 for empty sentences
+
+        def similarity_times(v):
+            return tfidf @ (tfidf_t @ v) - self_similarity * v
+
+        out_weight = similarity_times(np.ones(n))
+        out_weight[out_weight < 1e-12] = 1.0  # no shared words: the row of the graph is empty anyway
+
+        # PageRank on the row-normalized graph; similarity is symmetric, so transition.T @ scores
+        # is similarity @ (scores / out_weight)
+        scores = np.full(n, 1.0 / n)
+        for _ in range(self.iterations):
+            scores = (1 - self.damping) / n + self.damping * similarity_times(scores / out_weight)
+
+        # Keep the chosen sentences in the order they were spoken
+        chosen = sorted(np.argsort(-scores)[:keep])
+        return " ".join(sentences[i] for i in chosen)
+
+
+ENGINES = {
+    "abstractive": AbstractiveSummarizer,
+    "extractive": ExtractiveSummarizer,
+}
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown summarization engine '{name}', expected one of {list(ENGINES)} or 'auto'")
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name]()
+        return _engines[name]
+
+def select_engine(text, engine=None):
+    """Resolve an engine name (or "auto") for this text."""
+    engine = engine or SUMMARY_ENGINE
+    if engine == "auto":
+        engine = "extractive" if len(text.split()) > AUTO_EXTRACTIVE_WORDS else "abstractive"
+    return get_engine(engine)
+
+def summarize_text(text, engine=None):
+    return select_engine(text, engine).summarize(text)
@@ -0,0 +1,119 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: transcription.py
+# Transcription backends: openai-whisper (PyTorch fp32) and faster-whisper (CTranslate2 int8, batched)
+
+import os
+import threading
+
+# "openai" or "faster-whisper"
+TRANSCRIPTION_BACKEND = os.environ.get("MIRC_TRANSCRIPTION_BACKEND", "openai")
+# CTranslate2 weight type for faster-whisper; int8 is the fast path on CPU-only ingest nodes
+WHISPER_COMPUTE_TYPE = os.environ.get("MIRC_WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_BATCH_SIZE = int(os.environ.get("MIRC_WHISPER_BATCH_SIZE", "8"))
+
+
+class TranscriptionBackend:
+    """Turns 16 kHz mono float32 audio into {"text", "segments": [{"start", "end", "text"}], "language"}."""
+    name = None
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def load_model(self, model_size):
+        with self._lock:
+            if model_size not in self._models:
+                print(f"Loading Whisper model '{model_size}' ({self.name})...")
+                self._models[model_size] = self._load(model_size)
+            return self._models[model_size]
+
+    def _load(self, model_size):
+        raise NotImplementedError
+
+    def transcribe(self, audio, model_size, initial_prompt=None, language=None):
+        raise NotImplementedError
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """The reference openai-whisper implementation, fp32 PyTorch.
+
+    A loaded model is not safe to share between threads: decoding installs kv-cache hooks
+    on the model itself, so two concurrent transcribe() calls corrupt each other. Calls on
+    the same model size are serialized; the other ingest stages still overlap.
+    """
+    name = "openai"
+
+    def __init__(self):
+        super().__init__()
+        self._transcribe_locks = {}
+
+    def _load(self, model_size):
+        import whisper
+        self._transcribe_locks[model_size] = threading.Lock()
+        return whisper.load_model(model_size)
+
+    def transcribe(self, audio, model_size, initial_prompt=None, language=None):
+        model = self.load_model(model_size)
+        with self._transcribe_locks[model_size]:
+            result = model.transcribe(audio, initial_prompt=initial_prompt, language=language)
+        return {
+            "text": result["text"],
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]],
+            "language": result.get("language"),
+        }
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """Whisper on CTranslate2 with int8 weights.
+
+    Same models and output, several times faster on CPU. When the installed faster-whisper
+    has BatchedInferencePipeline, VAD-split chunks of the audio are decoded in batches.
+    """
+    name = "faster-whisper"
+
+    def __init__(self, compute_type=WHISPER_COMPUTE_TYPE, batch_size=WHISPER_BATCH_SIZE):
+        super().__init__()
+        self.compute_type = compute_type
+        self.batch_size = batch_size
+
+    def _load(self, model_size):
+        from faster_whisper import WhisperModel
+        model = WhisperModel(model_size, device="cpu", compute_type=self.compute_type,
+                             cpu_threads=os.cpu_count() or 4)
+        try:
+            from faster_whisper import BatchedInferencePipeline
+            return BatchedInferencePipeline(model=model), True
+        except ImportError:
+            return model, False
+
+    def transcribe(self, audio, model_size, initial_prompt=None, language=None):
+        model, batched = self.load_model(model_size)
+        options = {"initial_prompt": initial_prompt, "language": language, "beam_size": 5}
+        if batched:
+            options["batch_size"] = self.batch_size
+        segments, info = model.transcribe(audio, **options)
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]  # decoding happens here
+        return {
+            "text": "".join(s["text"] for s in segments),
+            "segments": segments,
+            "language": info.language,
+        }
+
+
+BACKENDS = {
+    "openai": OpenAIWhisperBackend,
+    "faster-whisper": FasterWhisperBackend,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_backend(name=None):
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}', expected one of {list(BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
@@ -0,0 +1,140 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: video_storage.py
+# Places an ingested video under base_save_dir/videos without duplicating its bytes where possible
+
+import os
+import sys
+import errno
+import logging
+import threading
+
+# -------------------- Storage Configuration --------------------
+# "auto"      -> hardlink, then reflink, then background copy (first one that works)
+# "hardlink"  -> hardlink only (source and destination must be on the same filesystem)
+# "reflink"   -> copy-on-write clone only (btrfs, xfs, APFS ...)
+# "reference" -> do not touch videos/, keep pointing at the original file
+# "copy"      -> chunked copy in the background while transcription reads the original
+INGEST_STORAGE_MODE = os.environ.get("MIRC_INGEST_STORAGE_MODE", "auto")
+COPY_CHUNK_SIZE = 64 * 1024 * 1024  # 64 MB per read/write
+
+STORAGE_MODES = ("auto", "hardlink", "reflink", "reference", "copy")
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+
+class StoredVideo:
+    """Result of placing a video into storage.
+
+    `path` is what gets recorded in Milvus, `read_path` is what the pipeline should
+    read right now (the original while a background copy is still running).
+    """
+
+    def __init__(self, path, read_path, mode, copy_thread=None):
+        self.path = path
+        self.read_path = read_path
+        self.mode = mode
+        self._copy_thread = copy_thread
+
+    def wait(self):
+        """Block until the stored file is complete, re-raising any copy error."""
+        if self._copy_thread is not None:
+            self._copy_thread.join()
+            if self._copy_thread.error is not None:
+                raise self._copy_thread.error
+            self.read_path = self.path
+
+    def cancel(self):
+        """Stop a background copy and remove the partial file."""
+        if self._copy_thread is not None:
+            self._copy_thread.cancel_event.set()
+            self._copy_thread.join()
+
+
+class _BackgroundCopy(threading.Thread):
+    def __init__(self, src, dst, chunk_size=COPY_CHUNK_SIZE):
+        super().__init__(daemon=True)
+        self.src = src
+        self.dst = dst
+        self.chunk_size = chunk_size
+        self.cancel_event = threading.Event()
+        self.error = None
+
+    def run(self):
+        part_path = self.dst + ".part"
+        try:
+            with open(self.src, "rb") as fsrc, open(part_path, "wb") as fdst:
+                while not self.cancel_event.is_set():
+                    chunk = fsrc.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    fdst.write(chunk)
+            if self.cancel_event.is_set():
+                os.remove(part_path)
+                return
+            os.replace(part_path, self.dst)
+            logging.info(f"Background copy finished: {self.dst}")
+        except Exception as e:
+            self.error = e
+            logging.error(f"Background copy of {self.src} failed: {e}")
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+
+def same_filesystem(src, dst_dir):
+    return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+
+
+def try_hardlink(src, dst):
+    try:
+        os.link(src, dst)
+        return True
+    except OSError as e:
+        logging.info(f"Hardlink {src} -> {dst} not possible: {e}")
+        return False
+
+
+def try_reflink(src, dst):
+    """Copy-on-write clone via the FICLONE ioctl (Linux only)."""
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError as e:
+        if os.path.exists(dst):
+            os.remove(dst)
+        if e.errno not in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY):
+            logging.warning(f"Reflink {src} -> {dst} failed: {e}")
+        return False
+
+
+def store_video(video_path, dest_path, mode=None):
+    """Place `video_path` at `dest_path` using the configured storage mode."""
+    mode = mode or INGEST_STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown ingest storage mode '{mode}', expected one of {STORAGE_MODES}")
+
+    src = os.path.abspath(video_path)
+    if mode == "reference":
+        return StoredVideo(src, src, "reference")
+
+    dest_dir = os.path.dirname(dest_path)
+    on_same_fs = same_filesystem(src, dest_dir)
+
+    if mode in ("auto", "hardlink") and on_same_fs and try_hardlink(src, dest_path):
+        return StoredVideo(dest_path, dest_path, "hardlink")
+    if mode == "hardlink":
+        raise OSError(f"Cannot hardlink {src} into {dest_dir} (different filesystem or not supported)")
+
+    if mode in ("auto", "reflink") and on_same_fs and try_reflink(src, dest_path):
+        return StoredVideo(dest_path, dest_path, "reflink")
+    if mode == "reflink":
+        raise OSError(f"Cannot reflink {src} into {dest_dir} (filesystem does not support cloning)")
+
+    copy_thread = _BackgroundCopy(src, dest_path)
+    copy_thread.start()
+    return StoredVideo(dest_path, src, "copy", copy_thread)
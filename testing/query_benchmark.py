@@ -0,0 +1,452 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: query_benchmark.py
+# Recall vs latency of the query path (embed -> vector search -> rerank) across index settings and corpus sizes
+#
+# Examples:
+#   python testing/query_benchmark.py --sizes 10000,100000                          # local_index.search
+#   python testing/query_benchmark.py --sizes 100000 --backend hybrid               # query_backend._search_milvus
+#   python testing/query_benchmark.py --sizes 1000000 --backend milvus --threads 1,8
+#   python testing/query_benchmark.py --sizes 10000 --embed --rerank
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+# Importing query_backend would otherwise start mirroring the real collection in the background
+os.environ.setdefault("MIRC_LOCAL_INDEX", "off")
+
+DIM = 384
+NUM_TOPICS = 256
+
+# The "local" and "hybrid" backends run the production search functions over all three vector
+# fields; "numpy" and "milvus" sweep single-field index settings.
+LOCAL_MODES = ["numpy", "hnsw"]
+
+# Index configurations per backend. The numpy stand-in mirrors the Milvus index families we use.
+NUMPY_INDEXES = [
+    ("FLAT", {}),
+    ("IVF_FLAT", {"nlist": 128, "nprobe": 1}),
+    ("IVF_FLAT", {"nlist": 128, "nprobe": 10}),   # production setting in query_backend.py
+    ("IVF_FLAT", {"nlist": 128, "nprobe": 32}),
+    ("IVF_SQ8", {"nlist": 128, "nprobe": 10}),
+]
+MILVUS_INDEXES = [
+    ("FLAT", {}, {}),
+    ("IVF_FLAT", {"nlist": 128}, {"nprobe": 10}),
+    ("IVF_FLAT", {"nlist": 1024}, {"nprobe": 32}),
+    ("IVF_SQ8", {"nlist": 1024}, {"nprobe": 32}),
+    ("HNSW", {"M": 16, "efConstruction": 200}, {"ef": 64}),
+    ("HNSW", {"M": 16, "efConstruction": 200}, {"ef": 256}),
+]
+
+WORDS = ("prayer fasting charity pilgrimage scholar hadith verse mosque community history law ethics family "
+         "knowledge patience gratitude justice mercy trade contract inheritance marriage worship night "
+         "morning lecture question answer student teacher book chapter meaning tradition").split()
+
+
+# -------------------- Synthetic corpus --------------------
+def normalize(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+class SyntheticCorpus:
+    """BGE-like vectors: unit length, a strong shared component and topic clusters.
+
+    Real BGE embeddings have high baseline cosine similarity (~0.7) between unrelated
+    texts, which is what makes nprobe/ef matter; pure Gaussian vectors would be too easy.
+    """
+
+    def __init__(self, size, dim=DIM, topics=NUM_TOPICS, seed=0):
+        rng = np.random.default_rng(seed)
+        self.size = size
+        self.common = normalize(rng.standard_normal(dim)).astype(np.float32)
+        self.centers = normalize(rng.standard_normal((topics, dim))).astype(np.float32)
+        self.topics = rng.integers(0, topics, size)
+        self.vectors = np.empty((size, dim), dtype=np.float32)
+        for start in range(0, size, 100_000):
+            end = min(start + 100_000, size)
+            noise = rng.standard_normal((end - start, dim)).astype(np.float32) / np.sqrt(dim)
+            v = 0.75 * self.common + 0.5 * self.centers[self.topics[start:end]] + 0.45 * noise
+            self.vectors[start:end] = normalize(v)
+        self.guids = [str(uuid.UUID(int=int(i) + 1)) for i in range(size)]
+        self.rng = rng
+
+    def queries(self, count):
+        """Queries drawn near random corpus topics, like a user asking about an existing lecture."""
+        topics = self.rng.integers(0, len(self.centers), count)
+        noise = self.rng.standard_normal((count, self.vectors.shape[1])).astype(np.float32) / np.sqrt(self.vectors.shape[1])
+        q = 0.75 * self.common + 0.5 * self.centers[topics] + 0.6 * noise
+        texts = [" ".join(WORDS[(t + j * 7) % len(WORDS)] for j in range(6)) for t in topics]
+        return normalize(q).astype(np.float32), texts, topics
+
+    def field_vectors(self):
+        """Summary, title and transcript vectors per row, like the three fields of the production schema.
+
+        Titles are short and noisy, pooled transcripts sit closer to the topic than summaries.
+        """
+        if not hasattr(self, "_fields"):
+            rng = np.random.default_rng(1)  # separate stream, so queries() stays reproducible
+            dim = self.vectors.shape[1]
+            self._fields = {"embedding": self.vectors}
+            for field_name, noise_scale in (("title_embedding", 0.7), ("transcript_embedding", 0.35)):
+                vectors = np.empty_like(self.vectors)
+                for start in range(0, self.size, 100_000):
+                    end = min(start + 100_000, self.size)
+                    noise = rng.standard_normal((end - start, dim)).astype(np.float32) / np.sqrt(dim)
+                    vectors[start:end] = normalize(0.75 * self.common + 0.5 * self.centers[self.topics[start:end]]
+                                                   + noise_scale * noise)
+                self._fields[field_name] = vectors
+        return self._fields
+
+    def rows(self, start, end):
+        """Rows in the shape Milvus returns them, for the local index and the hybrid collection."""
+        fields = self.field_vectors()
+        return [{
+            "guid": self.guids[i], "title": f"video {i}", "video_path": "", "transcript_path": "",
+            "translation_path": "", "summary_path": "", "quality": "final", "language": "en",
+            "duration": 600.0, "ingested_at": 0, "file_size": 0,
+            **{field_name: vectors[i] for field_name, vectors in fields.items()},
+        } for i in range(start, end)]
+
+    def sentences(self, index, count=120):
+        """Deterministic transcript sentences for one synthetic video."""
+        r = random.Random(index)
+        topic = int(self.topics[index])
+        out = []
+        for _ in range(count):
+            words = [WORDS[(topic + r.randint(0, 5) * 7) % len(WORDS)] if r.random() < 0.5 else r.choice(WORDS)
+                     for _ in range(r.randint(8, 20))]
+            out.append(" ".join(words).capitalize() + ".")
+        return out
+
+
+def exact_topk(vectors, queries, k):
+    """Brute-force ground truth (L2 on unit vectors == max inner product)."""
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), 64):
+        scores = queries[start:start + 64] @ vectors.T
+        part = np.argpartition(-scores, k, axis=1)[:, :k]
+        order = np.take_along_axis(scores, part, axis=1).argsort(axis=1)[:, ::-1]
+        result[start:start + 64] = np.take_along_axis(part, order, axis=1)
+    return result
+
+
+def exact_fused_topk(fields, field_weights, queries, k):
+    """Ground truth for the multi-field search: the weighted fused score over every row, no per-field cut-off."""
+    from local_index import l2_to_similarity
+    result = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), 64):
+        q = queries[start:start + 64]
+        fused = 0.0
+        for field_name, weight in field_weights.items():
+            distances = np.maximum(2.0 - 2.0 * (q @ fields[field_name].T), 0.0)  # squared L2 of unit vectors
+            fused = fused + weight * l2_to_similarity(distances)
+        part = np.argpartition(-fused, k, axis=1)[:, :k]
+        order = np.take_along_axis(fused, part, axis=1).argsort(axis=1)[:, ::-1]
+        result[start:start + 64] = np.take_along_axis(part, order, axis=1)
+    return result
+
+
+def recall_at_k(found, truth):
+    hits = [len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+
+def percentiles(latencies_ms):
+    a = np.asarray(latencies_ms)
+    return {"p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95)), "p99": float(np.percentile(a, 99))}
+
+
+# -------------------- In-process stand-in indexes --------------------
+def kmeans(vectors, nlist, iterations=10, sample=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = normalize(centroids)
+    return centroids.astype(np.float32)
+
+class NumpyIndex:
+    """FLAT / IVF_FLAT / IVF_SQ8 stand-in for running without a Milvus server."""
+
+    def __init__(self, vectors, index_type, params):
+        self.index_type = index_type
+        self.params = params
+        self.vectors = vectors
+        if index_type == "FLAT":
+            return
+        self.centroids = kmeans(vectors, params["nlist"])
+        assign = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), 100_000):
+            assign[start:start + 100_000] = np.argmax(vectors[start:start + 100_000] @ self.centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assign == c) for c in range(params["nlist"])]
+        if index_type == "IVF_SQ8":
+            self.lo = vectors.min(axis=0)
+            self.scale = (vectors.max(axis=0) - self.lo) / 255.0
+            self.codes = np.round((vectors - self.lo) / self.scale).astype(np.uint8)
+
+    def search(self, query, k):
+        if self.index_type == "FLAT":
+            scores = self.vectors @ query
+            top = np.argpartition(-scores, k)[:k]
+            return top[np.argsort(-scores[top])]
+        probes = np.argsort(-(self.centroids @ query))[:self.params["nprobe"]]
+        ids = np.concatenate([self.lists[p] for p in probes])
+        if self.index_type == "IVF_SQ8":
+            candidates = self.codes[ids].astype(np.float32) * self.scale + self.lo
+        else:
+            candidates = self.vectors[ids]
+        scores = candidates @ query
+        kk = min(k, len(ids))
+        if kk == 0:
+            return ids
+        top = np.argpartition(-scores, kk - 1)[:kk]
+        return ids[top[np.argsort(-scores[top])]]
+
+
+# -------------------- Milvus backend --------------------
+class MilvusBench:
+    def __init__(self, corpus):
+        from pymilvus import FieldSchema, CollectionSchema, DataType, utility
+        from milvus_client import get_milvus
+        self.milvus = get_milvus()
+        self.name = f"bench_{corpus.size}"
+        schema = CollectionSchema([
+            FieldSchema(name="idx", dtype=DataType.INT64, is_primary=True, auto_id=False),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=corpus.vectors.shape[1]),
+        ])
+        with self.milvus.connection() as alias:
+            if utility.has_collection(self.name, using=alias):
+                utility.drop_collection(self.name, using=alias)
+        def load(collection):
+            for start in range(0, corpus.size, 10_000):
+                end = min(start + 10_000, corpus.size)
+                collection.insert([list(range(start, end)), corpus.vectors[start:end]])
+            collection.flush()
+        print(f"Inserting {corpus.size} vectors into Milvus collection '{self.name}'...")
+        self.milvus.run(self.name, load, schema=schema)
+
+    def build(self, index_type, build_params):
+        def rebuild(collection):
+            collection.release()
+            if collection.has_index():
+                collection.drop_index()
+            collection.create_index("embedding", {"metric_type": "L2", "index_type": index_type, "params": build_params})
+            collection.load()
+        self.milvus.invalidate(self.name)
+        self.milvus.run(self.name, rebuild)
+
+    def search(self, query, k, search_params):
+        results = self.milvus.run(self.name, lambda collection: collection.search(
+            data=[query.tolist()], anns_field="embedding",
+            param={"metric_type": "L2", "params": search_params}, limit=k
+        ))
+        return [hit.id for hit in results[0]]
+
+    def drop(self):
+        self.milvus.run(self.name, lambda collection: collection.drop())
+
+
+# -------------------- Production search paths --------------------
+class LocalBench:
+    """local_index.LocalVectorIndex.search, what answers queries once the mirror is built."""
+
+    def __init__(self, corpus, mode):
+        from local_index import LocalVectorIndex
+        self.index = LocalVectorIndex(mode)
+        for start in range(0, corpus.size, 10_000):
+            self.index.upsert_many(corpus.rows(start, min(start + 10_000, corpus.size)), rebuild_graph=False)
+        self.index._build_graphs()  # what build_from_collection does after loading
+        self.positions = {guid: i for i, guid in enumerate(corpus.guids)}
+
+    def search(self, query, k, field_weights):
+        return [self.positions[row["guid"]] for row, _ in self.index.search(query, k, field_weights)]
+
+
+class HybridBench:
+    """query_backend._search_milvus (hybrid search over three fields, WeightedRanker) on a
+    collection with the production schema and indexes."""
+
+    def __init__(self, corpus):
+        from pymilvus import utility
+        from milvus_client import get_milvus
+        from pipeline import build_schema, ensure_index
+        self.milvus = get_milvus()
+        self.name = f"bench_hybrid_{corpus.size}"
+        with self.milvus.connection() as alias:
+            if utility.has_collection(self.name, using=alias):
+                utility.drop_collection(self.name, using=alias)
+        def load(collection):
+            for start in range(0, corpus.size, 10_000):
+                collection.insert(corpus.rows(start, min(start + 10_000, corpus.size)))
+            collection.flush()
+            ensure_index(collection)
+        print(f"Inserting {corpus.size} rows into Milvus collection '{self.name}'...")
+        self.milvus.run(self.name, load, schema=build_schema())
+        self.positions = {guid: i for i, guid in enumerate(corpus.guids)}
+
+    def search(self, query, k, field_weights):
+        from query_backend import _search_milvus
+        return [self.positions[hit["guid"]] for hit in _search_milvus(query, k, field_weights, "", self.name)]
+
+    def drop(self):
+        self.milvus.run(self.name, lambda collection: collection.drop())
+        self.milvus.invalidate(self.name)
+
+
+# -------------------- Measurement --------------------
+def run_queries(search_fn, queries, threads):
+    """Per-query latency in ms and the ids found, optionally under concurrent load."""
+    latencies = [0.0] * len(queries)
+    found = [None] * len(queries)
+
+    def one(i):
+        t0 = time.perf_counter()
+        found[i] = list(search_fn(queries[i]))
+        latencies[i] = (time.perf_counter() - t0) * 1000
+
+    wall = time.perf_counter()
+    if threads <= 1:
+        for i in range(len(queries)):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(one, range(len(queries))))
+    wall = time.perf_counter() - wall
+    return latencies, found, len(queries) / wall
+
+
+def bench_embedding(texts, thread_counts):
+    """BGE query embedding latency, under the same thread sweep as the search stage."""
+    from query_backend import embedder
+    embedder.embed(texts[0])  # warm-up
+    results = []
+    for threads in thread_counts:
+        latencies, _, qps = run_queries(embedder.embed, texts, threads)
+        results.append({"threads": threads, "qps": qps, **percentiles(latencies)})
+    return results
+
+
+def bench_rerank(corpus, texts, found, k, workdir, thread_counts):
+    """rerank_top_matches latency on synthetic transcripts, under the same thread sweep as the search stage."""
+    from chat_handler_service import rerank_top_matches
+    requests = []
+    for text, ids in zip(texts, found):
+        matches = []
+        for idx in ids[:k]:
+            path = os.path.join(workdir, f"{corpus.guids[idx]}_translated_transcript.txt")
+            if not os.path.exists(path):
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(corpus.sentences(idx)))
+            matches.append({"guid": corpus.guids[idx], "title": f"video {idx}", "video_path": "",
+                            "transcript_path": path, "translation_path": path})
+        requests.append((text, matches))
+    results = []
+    for threads in thread_counts:
+        latencies, _, qps = run_queries(lambda request: rerank_top_matches(*request), requests, threads)
+        results.append({"threads": threads, "qps": qps, **percentiles(latencies)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency benchmark for the query path")
+    parser.add_argument("--sizes", default="10000,100000", help="comma separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10, help="top_k, as requested by the query tab")
+    parser.add_argument("--threads", default="1,8", help="comma separated client thread counts")
+    parser.add_argument("--backend", choices=["local", "hybrid", "numpy", "milvus"], default="local",
+                        help="local: local_index.search (NumPy and HNSW); hybrid: query_backend._search_milvus "
+                             "against the server from docker-compose; numpy / milvus: single-field index sweeps")
+    parser.add_argument("--embed", action="store_true", help="also time BGE query embedding")
+    parser.add_argument("--rerank", action="store_true", help="also time rerank_top_matches on synthetic transcripts")
+    parser.add_argument("--rerank-queries", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(",")]
+    report = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        print(f"\n=== Corpus size {size} ===")
+        corpus = SyntheticCorpus(size)
+        queries, texts, _ = corpus.queries(args.queries)
+        stage_results = {}
+
+        if args.backend in ("local", "hybrid"):
+            from query_backend import SEARCH_FIELD_WEIGHTS
+            truth = exact_fused_topk(corpus.field_vectors(), SEARCH_FIELD_WEIGHTS, queries, args.k)
+        else:
+            truth = exact_topk(corpus.vectors, queries, args.k)
+        if args.backend == "local":
+            configs = [(f"local/{mode}", mode, SEARCH_FIELD_WEIGHTS) for mode in LOCAL_MODES]
+        elif args.backend == "hybrid":
+            bench = HybridBench(corpus)
+            configs = [("hybrid", None, SEARCH_FIELD_WEIGHTS)]
+        elif args.backend == "milvus":
+            bench = MilvusBench(corpus)
+            configs = [(t, bp, sp) for t, bp, sp in MILVUS_INDEXES]
+        else:
+            configs = [(t, p, p) for t, p in NUMPY_INDEXES]
+
+        best_found = None
+        for index_type, build_params, search_params in configs:
+            if args.backend == "local":
+                index = LocalBench(corpus, build_params)
+                search_fn = lambda q, index=index: index.search(q, args.k, SEARCH_FIELD_WEIGHTS)
+            elif args.backend == "hybrid":
+                search_fn = lambda q: bench.search(q, args.k, SEARCH_FIELD_WEIGHTS)
+            elif args.backend == "milvus":
+                bench.build(index_type, build_params)
+                search_fn = lambda q, sp=search_params: bench.search(q, args.k, sp)
+            else:
+                index = NumpyIndex(corpus.vectors, index_type, build_params)
+                search_fn = lambda q, index=index: index.search(q, args.k)
+            for threads in thread_counts:
+                latencies, found, qps = run_queries(search_fn, queries, threads)
+                row = {"size": size, "stage": "search", "backend": args.backend, "index": index_type,
+                       "params": search_params, "threads": threads, "qps": qps,
+                       "recall@k": recall_at_k(found, truth), **percentiles(latencies)}
+                report.append(row)
+                print(f"{index_type:11s} {json.dumps(search_params):32s} threads={threads:<3d} "
+                      f"recall@{args.k}={row['recall@k']:.3f}  p50={row['p50']:.2f}ms  "
+                      f"p95={row['p95']:.2f}ms  p99={row['p99']:.2f}ms  qps={qps:.0f}")
+                if index_type == "FLAT" or (args.backend in ("local", "hybrid") and best_found is None):
+                    best_found = found
+
+        if args.backend in ("milvus", "hybrid"):
+            bench.drop()
+
+        if args.embed:
+            stage_results["embed"] = bench_embedding(texts, thread_counts)
+        if args.rerank:
+            with tempfile.TemporaryDirectory() as workdir:
+                n = args.rerank_queries
+                stage_results["rerank"] = bench_rerank(corpus, texts[:n], (best_found or truth)[:n], args.k, workdir,
+                                                       thread_counts)
+        for stage, rows in stage_results.items():
+            for stats in rows:
+                report.append({"size": size, "stage": stage, **stats})
+                print(f"{stage:9s} threads={stats['threads']:<3d} p50={stats['p50']:.2f}ms  p95={stats['p95']:.2f}ms  "
+                      f"p99={stats['p99']:.2f}ms  qps={stats['qps']:.0f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: summarization_benchmark.py
+# Speed and retrieval quality of the summarization engines on real transcripts
+#
+# For every transcript a few sentences are held out as queries, the rest is summarized
+# by each engine, and the summary embeddings are searched with the held-out sentences.
+# A good summary for retrieval puts its own transcript at the top (recall@1, MRR).
+#
+# Example:
+#   python testing/summarization_benchmark.py processed_videos/translations --limit 50
+
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from summarization import get_engine, split_into_sentences, ENGINES
+from embedding_service import get_embedding_service
+
+
+def load_transcripts(folder, limit, min_sentences=20):
+    docs = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(folder, name), encoding="utf-8") as f:
+            sentences = split_into_sentences(f.read().replace("\n", " "))
+        if len(sentences) >= min_sentences:
+            docs.append((name, sentences))
+        if len(docs) >= limit:
+            break
+    return docs
+
+
+def hold_out(sentences, count, rng):
+    """Split off `count` reasonably long sentences to use as queries."""
+    candidates = [i for i, s in enumerate(sentences) if len(s.split()) >= 8]
+    chosen = set(rng.sample(candidates, min(count, len(candidates))))
+    queries = [sentences[i] for i in sorted(chosen)]
+    body = " ".join(s for i, s in enumerate(sentences) if i not in chosen)
+    return queries, body
+
+
+def retrieval_metrics(query_vectors, query_doc, summary_vectors):
+    scores = query_vectors @ summary_vectors.T
+    ranks = []
+    for row, doc in enumerate(query_doc):
+        ranks.append(int((scores[row] > scores[row, doc]).sum()) + 1)
+    ranks = np.asarray(ranks)
+    return {
+        "recall@1": float((ranks <= 1).mean()),
+        "recall@5": float((ranks <= 5).mean()),
+        "mrr": float((1.0 / ranks).mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare summarization engines on speed and retrieval quality")
+    parser.add_argument("folder", help="folder of transcript .txt files (e.g. processed_videos/translations)")
+    parser.add_argument("--limit", type=int, default=50, help="number of transcripts to use")
+    parser.add_argument("--queries-per-doc", type=int, default=3)
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = load_transcripts(args.folder, args.limit)
+    if len(docs) < 2:
+        print("Need at least two transcripts with 20+ sentences.")
+        return
+    print(f"Loaded {len(docs)} transcripts from {args.folder}")
+
+    queries, query_doc, bodies = [], [], []
+    for doc_index, (_, sentences) in enumerate(docs):
+        held_out, body = hold_out(sentences, args.queries_per_doc, rng)
+        queries.extend(held_out)
+        query_doc.extend([doc_index] * len(held_out))
+        bodies.append(body)
+
+    embedder = get_embedding_service()
+    query_vectors = embedder.embed_many(queries)
+    total_words = sum(len(b.split()) for b in bodies)
+
+    print(f"\n{'engine':12s} {'s/doc':>8s} {'words/s':>9s} {'recall@1':>9s} {'recall@5':>9s} {'mrr':>6s}")
+    for name in args.engines.split(","):
+        engine = get_engine(name)
+        engine.summarize(bodies[0])  # warm-up, loads the model if there is one
+        started = time.perf_counter()
+        summaries = [engine.summarize(body) for body in bodies]
+        elapsed = time.perf_counter() - started
+        metrics = retrieval_metrics(query_vectors, query_doc, embedder.embed_many(summaries))
+        print(f"{name:12s} {elapsed / len(bodies):8.2f} {total_words / elapsed:9.0f} "
+              f"{metrics['recall@1']:9.3f} {metrics['recall@5']:9.3f} {metrics['mrr']:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: test_ingest_scheduler.py
+# Stage accounting of IngestScheduler: which jobs feed ThroughputHistory, and with what stage seconds
+#
+# Usage:
+#   python -m unittest testing/test_ingest_scheduler.py
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+import ingest_scheduler
+from ingest_scheduler import IngestScheduler, ThroughputHistory, STAGES
+
+STEP_SECONDS = 0.05
+
+
+class RecordingHistory(ThroughputHistory):
+    def __init__(self, path):
+        super().__init__(path)
+        self.recorded = []
+
+    def record(self, tier, stage_seconds, duration):
+        self.recorded.append(dict(stage_seconds))
+        super().record(tier, stage_seconds, duration)
+
+
+def fake_process(emits, details):
+    """A process_fn that emits the given progress values STEP_SECONDS apart."""
+    def process(video_path, base_dir, progress_callback, tier, return_details):
+        for value in emits:
+            time.sleep(STEP_SECONDS)
+            progress_callback.emit(value)
+        time.sleep(STEP_SECONDS)
+        return "guid", details
+    return process
+
+
+class StageAccountingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = RecordingHistory(os.path.join(self.tmp.name, "history.json"))
+        self.video = os.path.join(self.tmp.name, "lecture.mp4")
+        with open(self.video, "wb") as f:
+            f.write(b"\0" * 1024)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_job(self, process_fn):
+        scheduler = IngestScheduler(self.tmp.name, ram_budget=1, history=self.history, process_fn=process_fn)
+        with mock.patch.object(ingest_scheduler, "probe_duration", return_value=3600.0):
+            job = scheduler.submit(self.video)
+        scheduler.run()
+        return job
+
+    def test_regular_job_records_one_step_per_stage(self):
+        job = self.run_job(fake_process([20, 40, 60, 80], {"duplicate_of": None, "streamed": False}))
+        self.assertEqual(len(self.history.recorded), 1)
+        stage_seconds = self.history.recorded[0]
+        self.assertEqual(set(stage_seconds), {name for name, _ in STAGES})
+        for name, seconds in stage_seconds.items():
+            self.assertAlmostEqual(seconds, STEP_SECONDS, delta=STEP_SECONDS * 0.8, msg=name)
+        self.assertEqual(job.guid, "guid")
+
+    def test_streaming_job_is_not_recorded(self):
+        # What _generate_artifacts_streaming emits for a long video: one value per window through the
+        # transcribe and translate bands, then 60 after the last window and 80 after the summary
+        emits = [20, 24, 28, 32, 36, 40, 44, 48, 52, 56, 59, 60, 80]
+        rates_before = {tier: dict(rates) for tier, rates in self.history.rates.items()}
+        job = self.run_job(fake_process(emits, {"duplicate_of": None, "streamed": True}))
+        self.assertTrue(job.streamed)
+        self.assertEqual(self.history.recorded, [])
+        self.assertEqual(self.history.rates, rates_before)
+        self.assertFalse(os.path.exists(self.history.path))
+        # Without the streamed flag this run would have booked half the window time as "translate"
+        self.assertGreater(job.stage_seconds["translate"], 3 * STEP_SECONDS)
+
+    def test_duplicate_job_is_not_recorded(self):
+        job = self.run_job(fake_process([100], {"duplicate_of": "other", "streamed": False}))
+        self.assertEqual(job.duplicate_of, "other")
+        self.assertEqual(self.history.recorded, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
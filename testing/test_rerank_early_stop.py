@@ -0,0 +1,65 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: test_rerank_early_stop.py
+# Early stopping in rerank_top_matches is a heuristic: a video with a lower vector score can still hold the best sentence
+#
+# Usage:
+#   python -m unittest testing/test_rerank_early_stop.py
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+import chat_handler_service
+from chat_handler_service import rerank_top_matches, RESULT_COUNT
+
+# Best sentence score of each video, in the order the vector search returned them
+BEST_SENTENCE = [0.8, 0.8, 0.8, 0.8, 0.8, 0.3, 0.3, 0.95]
+
+
+def fake_rerank_single(user_query, item):
+    score = BEST_SENTENCE[item["index"]]
+    return [{"guid": item["guid"], "sentence": f"sentence of {item['guid']}", "score": score,
+             "score_source": "bi_encoder"}]
+
+
+def matches(vector_scores):
+    return [{"guid": f"video-{i}", "index": i, "vector_score": vector_score}
+            for i, vector_score in enumerate(vector_scores)]
+
+
+class EarlyStopTradeoffTest(unittest.TestCase):
+    def rerank(self, vector_scores):
+        stats = {}
+        with mock.patch.object(chat_handler_service, "rerank_single", side_effect=fake_rerank_single):
+            top = rerank_top_matches("query", matches(vector_scores), use_cross_encoder=False,
+                                     early_stop=True, stats=stats)
+        return top, stats
+
+    def test_near_tied_vector_scores_are_all_reranked(self):
+        # The vector search cannot tell these videos apart, so the last one is still reranked
+        top, stats = self.rerank([0.70, 0.70, 0.69, 0.69, 0.69, 0.68, 0.68, 0.68])
+        self.assertEqual(stats["skipped"], 0)
+        self.assertEqual(top[0]["guid"], "video-7")
+        self.assertEqual(len(top), RESULT_COUNT)
+
+    def test_clear_vector_drop_stops_and_can_miss_the_best_sentence(self):
+        # Once the vector scores fall away, the stop trusts the recent weak videos and skips the
+        # last one, even though it holds the best sentence: the documented cost of early stopping
+        top, stats = self.rerank([0.90, 0.89, 0.88, 0.87, 0.86, 0.80, 0.79, 0.60])
+        self.assertGreater(stats["skipped"], 0)
+        self.assertNotIn("video-7", [c["guid"] for c in top])
+
+    def test_without_early_stop_the_best_sentence_is_found(self):
+        with mock.patch.object(chat_handler_service, "rerank_single", side_effect=fake_rerank_single):
+            top = rerank_top_matches("query", matches([0.90, 0.89, 0.88, 0.87, 0.86, 0.80, 0.79, 0.60]),
+                                     use_cross_encoder=False)
+        self.assertEqual(top[0]["guid"], "video-7")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# Bismillah
+# Starting project on 07-01-1447 - 03-07-2025
+
+# File: transcription_benchmark.py
+# Speed (real-time factor) and accuracy (word error rate) of the transcription backends
+#
+# The sample folder holds media files next to reference transcripts with the same name
+# (lecture01.mp4 + lecture01.txt). Audio is decoded once through the audio cache, so
+# every backend transcribes exactly the same samples and only model time is measured.
+# RTF = transcription seconds / audio seconds; below 1 is faster than real time.
+#
+# Example:
+#   python testing/transcription_benchmark.py samples/ --model base --backends openai,faster-whisper
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from transcription import get_backend, BACKENDS
+from audio_cache import get_audio_cache, SAMPLE_RATE
+
+MEDIA_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm", ".mp3", ".wav", ".m4a")
+
+
+def load_samples(folder, limit):
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        reference_path = os.path.join(folder, stem + ".txt")
+        if ext.lower() not in MEDIA_EXTENSIONS or not os.path.exists(reference_path):
+            continue
+        with open(reference_path, encoding="utf-8") as f:
+            samples.append((os.path.join(folder, name), f.read()))
+        if len(samples) >= limit:
+            break
+    return samples
+
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance (substitutions + deletions + insertions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription backends on RTF and WER")
+    parser.add_argument("folder", help="folder of media files with reference <name>.txt transcripts")
+    parser.add_argument("--model", default="base", help="Whisper model size for every backend")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--limit", type=int, default=20, help="number of samples to use")
+    args = parser.parse_args()
+
+    samples = load_samples(args.folder, args.limit)
+    if not samples:
+        print("No media files with a matching reference .txt found.")
+        return
+    audio_cache = get_audio_cache()
+    audios = [audio_cache.get_audio(path) for path, _ in samples]
+    audio_seconds = sum(len(audio) for audio in audios) / SAMPLE_RATE
+    references = [normalize_words(text) for _, text in samples]
+    print(f"Loaded {len(samples)} samples ({audio_seconds / 60:.1f} min of audio) from {args.folder}")
+
+    print(f"\n{'backend':16s} {'seconds':>9s} {'RTF':>7s} {'WER':>7s}")
+    for name in args.backends.split(","):
+        backend = get_backend(name)
+        backend.load_model(args.model)  # model loading is not part of the RTF
+        errors, started = 0, time.perf_counter()
+        hypotheses = [backend.transcribe(audio, args.model)["text"] for audio in audios]
+        elapsed = time.perf_counter() - started
+        for reference, hypothesis in zip(references, hypotheses):
+            errors += word_errors(reference, normalize_words(hypothesis))
+        wer = errors / max(1, sum(len(r) for r in references))
+        print(f"{name:16s} {elapsed:9.1f} {elapsed / audio_seconds:7.3f} {wer:7.3f}")
+
+
+if __name__ == "__main__":
+    main()